@@ -216,6 +216,50 @@ MEDIA_ROOT = BASE_DIR / "media"
 DOMJUDGE_API_URL = os.getenv('DOMJUDGE_API_URL', 'http://localhost:8080/api/v4')
 DOMJUDGE_USERNAME = os.getenv('DOMJUDGE_USERNAME', 'admin')
 DOMJUDGE_PASSWORD = os.getenv('DOMJUDGE_PASSWORD', '12345')
+# Verdict được đồng bộ bởi background worker (poll_judgings / django-q).
+# Bật để list/detail tự sync trong request khi không chạy worker (dev)
+DOMJUDGE_SYNC_IN_REQUEST = os.getenv('DOMJUDGE_SYNC_IN_REQUEST', 'False').lower() == 'true'
+# Nguồn verdict: 'poll' (poll bảng judging) hoặc 'event-feed' (consume_event_feed, không poll DB DOMjudge)
+DOMJUDGE_VERDICT_SOURCE = os.getenv('DOMJUDGE_VERDICT_SOURCE', 'poll')
+# Chế độ event-feed: vẫn poll (mỗi phút) các submission judging lâu hơn N giây
+# mà feed chưa trả verdict (judgement đến trước khi lưu domjudge_submission_id, restart consumer...)
+DOMJUDGE_RECONCILE_AFTER_SECONDS = int(os.getenv('DOMJUDGE_RECONCILE_AFTER_SECONDS', '120'))
+
+# HTTP client dùng chung cho DOMjudge API (common/domjudge_client.py)
+DOMJUDGE_HTTP_POOL_SIZE = int(os.getenv('DOMJUDGE_HTTP_POOL_SIZE', '10'))
+DOMJUDGE_CONNECT_TIMEOUT = float(os.getenv('DOMJUDGE_CONNECT_TIMEOUT', '5'))
+DOMJUDGE_READ_TIMEOUT = float(os.getenv('DOMJUDGE_READ_TIMEOUT', '30'))
+DOMJUDGE_MAX_RETRIES = int(os.getenv('DOMJUDGE_MAX_RETRIES', '3'))  # chỉ áp dụng cho method idempotent
+DOMJUDGE_RETRY_BACKOFF = float(os.getenv('DOMJUDGE_RETRY_BACKOFF', '0.5'))
+DOMJUDGE_SLOW_CALL_MS = int(os.getenv('DOMJUDGE_SLOW_CALL_MS', '2000'))
+
+# Outbox: SubmissionCreateView lưu submission `queued` và trả về 202,
+# consumer (problems.tasks.dispatch_queued_submissions / poll_judgings) gửi lên DOMjudge
+SUBMISSION_ASYNC_DISPATCH = os.getenv('SUBMISSION_ASYNC_DISPATCH', 'True').lower() == 'true'
+SUBMISSION_DISPATCH_CONCURRENCY = int(os.getenv('SUBMISSION_DISPATCH_CONCURRENCY', '4'))
+SUBMISSION_DISPATCH_MAX_ATTEMPTS = int(os.getenv('SUBMISSION_DISPATCH_MAX_ATTEMPTS', '8'))
+# Gửi lỗi: chờ BASE * 2^(lần thử - 1) giây (tối đa MAX) trước lần gửi lại,
+# mặc định 5s, 10s, ..., 300s: khoảng 10 phút trước khi đánh dấu `error`
+SUBMISSION_DISPATCH_RETRY_BASE_SECONDS = int(os.getenv('SUBMISSION_DISPATCH_RETRY_BASE_SECONDS', '5'))
+SUBMISSION_DISPATCH_RETRY_MAX_SECONDS = int(os.getenv('SUBMISSION_DISPATCH_RETRY_MAX_SECONDS', '300'))
+
+# Cache dùng chung giữa các worker process / service (leaderboard, delta stream,
+# chỉ mục rating...). Không có REDIS_URL (dev): LocMem riêng từng process
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Snapshot leaderboard contest (cache key theo standings_version, ETag/304 cho client poll)
+LEADERBOARD_CACHE_SECONDS = int(os.getenv('LEADERBOARD_CACHE_SECONDS', '3600'))
+# Chỉ mục rank toàn cục theo rating (dựng lại khi rating thay đổi, hoặc sau N giây cho user mới)
+RATING_INDEX_CACHE_SECONDS = int(os.getenv('RATING_INDEX_CACHE_SECONDS', '300'))
+# Chờ tối đa N giây cho verdict của submission nộp trước freeze trước khi chụp bảng xếp hạng công khai
+FREEZE_SNAPSHOT_GRACE_SECONDS = int(os.getenv('FREEZE_SNAPSHOT_GRACE_SECONDS', '300'))
 
 # VNPay Configuration
 VNPAY_TMN_CODE = os.getenv('VNPAY_TMN_CODE', '')  # Mã website tại VNPay
@@ -11,6 +11,9 @@ class CustomJWTAuthentication(BaseAuthentication):
             return None
 
         token_str = auth_header.split(" ")[1]
+        return self.authenticate_token(token_str)
+
+    def authenticate_token(self, token_str):
         try:
             token = AccessToken(token_str)
         except Exception:
@@ -26,3 +29,19 @@ class CustomJWTAuthentication(BaseAuthentication):
             raise exceptions.AuthenticationFailed("User not found")
 
         return (user, token)
+
+
+class QueryParamJWTAuthentication(CustomJWTAuthentication):
+    """
+    JWT qua header hoặc query param `?token=`
+    Dùng cho các endpoint SSE (EventSource của trình duyệt không gửi được header Authorization)
+    """
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            return result
+
+        token_str = request.query_params.get("token")
+        if not token_str:
+            return None
+        return self.authenticate_token(token_str)
@@ -0,0 +1,153 @@
+"""
+HTTP client dùng chung cho DOMjudge API
+
+- Một requests.Session cho mỗi thread của mỗi worker process (keep-alive, connection pool)
+- Timeout connect/read cấu hình trong settings
+- Retry có backoff cho các method idempotent (GET/PUT/DELETE/HEAD/OPTIONS)
+- Đo latency từng call (log + metrics trong process)
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+
+class DOMjudgeClient:
+    """Client HTTP có connection pooling cho DOMjudge"""
+
+    _local = threading.local()
+    _metrics = {}
+    _metrics_lock = threading.Lock()
+
+    def __init__(self):
+        self.api_url = getattr(settings, 'DOMJUDGE_API_URL', 'http://localhost:8080/api/v4').rstrip('/')
+        self.username = getattr(settings, 'DOMJUDGE_USERNAME', 'admin')
+        self.password = getattr(settings, 'DOMJUDGE_PASSWORD', '12345')
+        self.timeout = (
+            getattr(settings, 'DOMJUDGE_CONNECT_TIMEOUT', 5),
+            getattr(settings, 'DOMJUDGE_READ_TIMEOUT', 30),
+        )
+        self.slow_call_ms = getattr(settings, 'DOMJUDGE_SLOW_CALL_MS', 2000)
+
+    @classmethod
+    def _build_session(cls):
+        retry = Retry(
+            total=getattr(settings, 'DOMJUDGE_MAX_RETRIES', 3),
+            backoff_factor=getattr(settings, 'DOMJUDGE_RETRY_BACKOFF', 0.5),
+            status_forcelist=(502, 503, 504),
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False,
+        )
+        pool_size = getattr(settings, 'DOMJUDGE_HTTP_POOL_SIZE', 10)
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @property
+    def session(self):
+        """Session của thread hiện tại (tạo lại sau khi gunicorn fork worker)"""
+        local = self._local
+        pid = os.getpid()
+        if getattr(local, 'session', None) is None or getattr(local, 'pid', None) != pid:
+            local.session = self._build_session()
+            local.pid = pid
+        return local.session
+
+    def request(self, method, path, timeout=None, **kwargs):
+        """
+        Gửi request đến DOMjudge API
+
+        Args:
+            method: HTTP method
+            path: đường dẫn tương đối so với DOMJUDGE_API_URL (vd: '/contests/abc')
+            timeout: override timeout (connect, read) cho call này
+
+        Returns:
+            requests.Response
+        """
+        method = method.upper()
+        url = f"{self.api_url}/{path.lstrip('/')}"
+        kwargs.setdefault('auth', (self.username, self.password))
+
+        start = time.monotonic()
+        failed = False
+        try:
+            response = self.session.request(
+                method,
+                url,
+                timeout=timeout or self.timeout,
+                **kwargs
+            )
+            failed = response.status_code >= 500
+            return response
+        except requests.exceptions.RequestException:
+            failed = True
+            raise
+        finally:
+            elapsed_ms = (time.monotonic() - start) * 1000
+            self._record(method, path, elapsed_ms, failed)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def _record(self, method, path, elapsed_ms, failed):
+        # Gom các path theo endpoint: /contests/abc/submissions/12 -> /contests/:id/submissions/:id
+        endpoint = f"{method} " + re.sub(r'/[^/]+(?=/|$)', self._normalize_segment, '/' + path.lstrip('/'))
+        with self._metrics_lock:
+            stats = self._metrics.setdefault(endpoint, {
+                'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0
+            })
+            stats['count'] += 1
+            stats['errors'] += 1 if failed else 0
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+        if elapsed_ms >= self.slow_call_ms:
+            logger.warning(f"[DOMjudge] Slow call {endpoint}: {elapsed_ms:.0f}ms")
+        else:
+            logger.debug(f"[DOMjudge] {endpoint}: {elapsed_ms:.0f}ms")
+
+    @staticmethod
+    def _normalize_segment(match):
+        segment = match.group(0)
+        if segment[1:] in ('api', 'v4', 'contests', 'problems', 'submissions',
+                           'judgements', 'teams', 'languages', 'event-feed'):
+            return segment
+        return '/:id'
+
+    @classmethod
+    def get_metrics(cls):
+        """Metrics latency theo endpoint của process hiện tại"""
+        with cls._metrics_lock:
+            return {
+                endpoint: {
+                    **stats,
+                    'avg_ms': round(stats['total_ms'] / stats['count'], 2) if stats['count'] else 0.0,
+                }
+                for endpoint, stats in cls._metrics.items()
+            }
@@ -8,7 +8,7 @@ from django_q.models import Schedule
 
 
 class Command(BaseCommand):
-    help = 'Setup scheduled tasks for recommendation model training'
+    help = 'Setup scheduled tasks (recommendation training, judging sync, submission outbox, scoreboard freeze, ranking jobs)'
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('\n' + '='*70))
@@ -33,8 +33,65 @@ class Command(BaseCommand):
         self.stdout.write(f'   - Status: Active')
         self.stdout.write(f'   - Next run: {schedule.next_run}')
         
+        # Đồng bộ verdict từ DOMjudge mỗi phút (fallback khi không chạy poll_judgings)
+        Schedule.objects.filter(name='sync_judging_submissions').delete()
+        Schedule.objects.create(
+            name='sync_judging_submissions',
+            func='problems.tasks.sync_judging_submissions',
+            schedule_type=Schedule.MINUTES,
+            minutes=1,
+            repeats=-1,
+        )
+        
+        self.stdout.write(self.style.SUCCESS('✓ Created schedule: sync_judging_submissions'))
+        self.stdout.write(f'   - Function: problems.tasks.sync_judging_submissions')
+        self.stdout.write(f'   - Schedule: Every minute')
+        
+        # Retry các submission còn nằm trong outbox
+        Schedule.objects.filter(name='dispatch_queued_submissions').delete()
+        Schedule.objects.create(
+            name='dispatch_queued_submissions',
+            func='problems.tasks.dispatch_queued_submissions',
+            schedule_type=Schedule.MINUTES,
+            minutes=1,
+            repeats=-1,
+        )
+        
+        self.stdout.write(self.style.SUCCESS('✓ Created schedule: dispatch_queued_submissions'))
+        self.stdout.write(f'   - Function: problems.tasks.dispatch_queued_submissions')
+        self.stdout.write(f'   - Schedule: Every minute')
+        
+        # Snapshot bảng xếp hạng lúc freeze / mở băng khi contest kết thúc
+        Schedule.objects.filter(name='freeze_contest_scoreboards').delete()
+        Schedule.objects.create(
+            name='freeze_contest_scoreboards',
+            func='contests.tasks.freeze_contest_scoreboards',
+            schedule_type=Schedule.MINUTES,
+            minutes=1,
+            repeats=-1,
+        )
+        
+        self.stdout.write(self.style.SUCCESS('✓ Created schedule: freeze_contest_scoreboards'))
+        self.stdout.write(f'   - Function: contests.tasks.freeze_contest_scoreboards')
+        self.stdout.write(f'   - Schedule: Every minute')
+        
+        # Job tính lại ranking còn queued (không enqueue được lúc tạo)
+        Schedule.objects.filter(name='run_queued_ranking_jobs').delete()
+        Schedule.objects.create(
+            name='run_queued_ranking_jobs',
+            func='contests.tasks.run_queued_ranking_jobs',
+            schedule_type=Schedule.MINUTES,
+            minutes=1,
+            repeats=-1,
+        )
+        
+        self.stdout.write(self.style.SUCCESS('✓ Created schedule: run_queued_ranking_jobs'))
+        self.stdout.write(f'   - Function: contests.tasks.run_queued_ranking_jobs')
+        self.stdout.write(f'   - Schedule: Every minute')
+        
         self.stdout.write(self.style.SUCCESS('\n✅ Setup completed!'))
         self.stdout.write('\n📝 Notes:')
         self.stdout.write('   - Đảm bảo Django-Q cluster đang chạy: python manage.py qcluster')
         self.stdout.write('   - Xem tasks: python manage.py qmonitor')
-        self.stdout.write('   - Manual run: python manage.py train_recommendation --update-ratings\n')
+        self.stdout.write('   - Manual run: python manage.py train_recommendation --update-ratings')
+        self.stdout.write('   - Verdict realtime: python manage.py poll_judgings --interval 2\n')
@@ -0,0 +1,30 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+
+from common.authentication import CustomJWTAuthentication
+from common.domjudge_client import DOMjudgeClient
+from common.model_registry import RecommendationModelRegistry
+
+
+class SystemMetricsView(APIView):
+    """
+    GET: Metrics nội bộ của worker process hiện tại (admin only)
+    - domjudge_http: số call, lỗi, latency trung bình/max theo endpoint DOMjudge
+    - recommendation_model: version model đang dùng, số lần / thời gian load
+    """
+    authentication_classes = [CustomJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_staff:
+            return Response(
+                {"detail": "Only admin can view metrics"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        return Response({
+            'domjudge_http': DOMjudgeClient.get_metrics(),
+            'recommendation_model': RecommendationModelRegistry.get_metrics(),
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,117 @@
+"""
+Registry model gợi ý bài toán trong mỗi worker process
+
+Model (NearestNeighbors, DataFrame, sparse matrix) chỉ được unpickle một lần
+mỗi process, khi có request đầu tiên. Mỗi request chỉ os.stat file model; khi
+file đổi (train_recommendation ghi file mới bằng os.replace) model mới được
+load rồi thay bằng một phép gán, request đang chạy vẫn dùng model cũ.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationModelRegistry:
+    """Giữ ProductionRecommender đã load của process hiện tại"""
+
+    MODEL_NAME = 'recommendation_model.pkl'
+
+    _state = None
+    _failed_stamp = None
+    _load_lock = threading.Lock()
+    _metrics = {
+        'loads': 0,
+        'load_errors': 0,
+        'last_load_ms': None,
+        'total_load_ms': 0.0,
+        'last_error': None,
+    }
+
+    @classmethod
+    def model_path(cls):
+        return os.path.join(settings.BASE_DIR, 'media', 'models', cls.MODEL_NAME)
+
+    @classmethod
+    def get(cls):
+        """
+        Recommender hiện tại, load lại nếu file model đã đổi
+
+        Returns: ProductionRecommender hoặc None nếu chưa có model
+        """
+        try:
+            stat = os.stat(cls.model_path())
+        except FileNotFoundError:
+            return cls._state['recommender'] if cls._state else None
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        state = cls._state
+        if state is not None and state['stamp'] == stamp:
+            return state['recommender']
+        if stamp == cls._failed_stamp:
+            # File hỏng: không thử load lại cho tới khi file đổi
+            return state['recommender'] if state else None
+
+        with cls._load_lock:
+            # Thread khác có thể đã load xong trong lúc chờ lock
+            state = cls._state
+            if state is not None and state['stamp'] == stamp:
+                return state['recommender']
+            try:
+                cls._state = cls._load(stamp)
+            except Exception as e:
+                cls._failed_stamp = stamp
+                cls._metrics['load_errors'] += 1
+                cls._metrics['last_error'] = str(e)
+                logger.exception('[Recommendation] Failed to load model')
+                # Giữ model cũ nếu có
+                return state['recommender'] if state else None
+            return cls._state['recommender']
+
+    @classmethod
+    def _load(cls, stamp):
+        from common.recommender import ProductionRecommender
+
+        start = time.monotonic()
+        with open(cls.model_path(), 'rb') as f:
+            model_data = pickle.load(f)
+        version = model_data.pop('version', None)
+        trained_at = model_data.pop('trained_at', None)
+
+        recommender = ProductionRecommender()
+        recommender.__dict__.update(model_data)
+        load_ms = (time.monotonic() - start) * 1000
+
+        cls._metrics['loads'] += 1
+        cls._metrics['last_load_ms'] = round(load_ms, 2)
+        cls._metrics['total_load_ms'] += load_ms
+        cls._metrics['last_error'] = None
+        logger.info(f"[Recommendation] Loaded model version {version} in {load_ms:.0f}ms")
+
+        return {
+            'recommender': recommender,
+            'stamp': stamp,
+            # Model cũ chưa có version: dùng mtime của file
+            'version': version or str(stamp[0]),
+            'trained_at': trained_at,
+            'loaded_at': timezone.now(),
+        }
+
+    @classmethod
+    def get_metrics(cls):
+        """Trạng thái model của process hiện tại"""
+        state = cls._state
+        return {
+            'loaded': state is not None,
+            'version': state['version'] if state else None,
+            'trained_at': state['trained_at'] if state else None,
+            'loaded_at': state['loaded_at'] if state else None,
+            **cls._metrics,
+            'total_load_ms': round(cls._metrics['total_load_ms'], 2),
+        }
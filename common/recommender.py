@@ -189,7 +189,10 @@ class ProductionRecommender:
             'interaction_matrix': self.interaction_matrix,
             'problems_snapshot': self.problems_snapshot,
             'problem_id_map': self.problem_id_map,
-            'reverse_map': self.reverse_map
+            'reverse_map': self.reverse_map,
+            # Worker nhận biết model mới (RecommendationModelRegistry)
+            'version': time.strftime('%Y%m%d-%H%M%S'),
+            'trained_at': time.time()
         }
         
         # Lưu vào thư mục media
@@ -199,8 +202,11 @@ class ProductionRecommender:
         
         model_path = os.path.join(model_dir, self.model_path)
         
-        with open(model_path, 'wb') as f:
+        # Ghi ra file tạm rồi os.replace: worker không bao giờ đọc file đang ghi dở
+        tmp_path = f"{model_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
             pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, model_path)
         
         file_size = os.path.getsize(model_path) / (1024 * 1024)  # MB
         print(f"\n[✓] Model đã lưu: {model_path}")
@@ -0,0 +1,180 @@
+"""
+Helpers cho Server-Sent Events
+
+Stream chỉ giữ kết nối trên ASGI (service django_stream: gunicorn + uvicorn
+worker, xem docker-entrypoint.sh): async generator không chiếm thread trong lúc
+chờ, poll chạy trong thread pool. Trên WSGI (gunicorn gthread, mỗi request giữ
+một thread) response chỉ chạy poll một lần rồi đóng kèm `retry` để EventSource
+tự kết nối lại sau WSGI_RETRY_SECONDS - tương đương short-poll, không thread
+nào bị giữ.
+
+Sau event kết thúc (done=True) gửi `retry` dài (DONE_RETRY_MS): client nên gọi
+EventSource.close(), nếu không thì cũng không kết nối lại ngay.
+
+Stream có nhiều người xem cùng dữ liệu (leaderboard contest) dùng BroadcastHub:
+mỗi process chỉ có một task poll cho mỗi kênh, các kết nối chỉ đọc message.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger(__name__)
+
+# Thời gian EventSource chờ trước khi kết nối lại
+WSGI_RETRY_SECONDS = 5
+DONE_RETRY_MS = 10 * 60 * 1000
+# Comment giữ kết nối (nginx proxy_read_timeout)
+HEARTBEAT_SECONDS = 15
+HEARTBEAT = ": heartbeat\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Cho phép DRF chấp nhận header `Accept: text/event-stream` của EventSource"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Chỉ dùng cho response lỗi (403/404...) trước khi stream bắt đầu
+        return format_event('error', data).encode('utf-8')
+
+
+def format_event(event, data, event_id=None):
+    """Định dạng một event SSE"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    payload = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+    lines.extend(f"data: {line}" for line in payload.splitlines())
+    return "\n".join(lines) + "\n\n"
+
+
+def format_retry(milliseconds):
+    return f"retry: {int(milliseconds)}\n\n"
+
+
+def is_asgi(request):
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def run_in_thread(func):
+    """
+    Chạy hàm đồng bộ (truy cập DB) từ async generator trong thread pool
+    (không dùng thread_sensitive: các stream không phải chờ nhau trên một thread)
+    """
+    def call():
+        try:
+            return func()
+        finally:
+            # Như cuối mỗi request: đóng connection quá CONN_MAX_AGE / bị lỗi
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False)
+
+
+def stream_response(stream):
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tắt buffering của nginx cho response này
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def event_stream_response(request, poll, interval=1.0, max_seconds=300, heartbeat_seconds=HEARTBEAT_SECONDS):
+    """
+    Tạo StreamingHttpResponse cho SSE, mỗi kết nối poll riêng
+
+    Args:
+        request: request gốc (Django hoặc DRF)
+        poll: hàm đồng bộ không tham số, trả về (list[str] các event đã format, done: bool)
+        interval: số giây giữa hai lần poll (ASGI)
+        max_seconds: thời lượng tối đa của một kết nối (ASGI)
+        heartbeat_seconds: gửi comment giữ kết nối
+    """
+    if not is_asgi(request):
+        def single_poll():
+            events, done = poll()
+            yield from events
+            yield format_retry(DONE_RETRY_MS if done else WSGI_RETRY_SECONDS * 1000)
+
+        return stream_response(single_poll())
+
+    async def async_stream():
+        yield format_retry(interval * 1000)
+        async_poll = run_in_thread(poll)
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < max_seconds:
+            events, done = await async_poll()
+            for chunk in events:
+                yield chunk
+                last_sent = time.monotonic()
+            if done:
+                yield format_retry(DONE_RETRY_MS)
+                return
+            if time.monotonic() - last_sent >= heartbeat_seconds:
+                yield HEARTBEAT
+                last_sent = time.monotonic()
+            await asyncio.sleep(interval)
+
+    return stream_response(async_stream())
+
+
+class BroadcastHub:
+    """
+    Một task poll cho mỗi kênh trong process (ASGI), phát message mới nhất cho mọi kết nối
+
+    poll(previous) là hàm đồng bộ, trả về message mới hoặc chính `previous` nếu
+    không đổi. Mỗi kết nối chỉ giữ message mới nhất (kết nối chậm bỏ qua các
+    message cũ). Task dừng khi kênh không còn kết nối nào.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._channels = {}
+
+    def subscribe(self, key, poll):
+        """Gọi trong event loop. Returns: (channel, asyncio.Queue)"""
+        channel = self._channels.get(key)
+        if channel is None or channel['task'].done():
+            channel = {'subscribers': set(), 'latest': None}
+            channel['task'] = asyncio.get_running_loop().create_task(self._run(key, channel, poll))
+            self._channels[key] = channel
+
+        queue = asyncio.Queue(maxsize=1)
+        if channel['latest'] is not None:
+            queue.put_nowait(channel['latest'])
+        channel['subscribers'].add(queue)
+        return channel, queue
+
+    def unsubscribe(self, channel, queue):
+        channel['subscribers'].discard(queue)
+
+    async def _run(self, key, channel, poll):
+        async_poll = run_in_thread(lambda: poll(channel['latest']))
+        try:
+            while channel['subscribers']:
+                try:
+                    message = await async_poll()
+                except Exception:
+                    logger.exception(f"[SSE] Poll failed for channel {key}")
+                    message = channel['latest']
+
+                if message is not None and message is not channel['latest']:
+                    channel['latest'] = message
+                    for queue in channel['subscribers']:
+                        if queue.full():
+                            queue.get_nowait()
+                        queue.put_nowait(message)
+                await asyncio.sleep(self.interval)
+        finally:
+            if self._channels.get(key) is channel:
+                del self._channels[key]
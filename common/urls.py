@@ -1,6 +1,8 @@
 from django.urls import path
 from .media_views import media_proxy
+from .metrics_views import SystemMetricsView
 
 urlpatterns = [
     path('media-proxy/', media_proxy, name='media-proxy'),
+    path('metrics/', SystemMetricsView.as_view(), name='system-metrics'),
 ]
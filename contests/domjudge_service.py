@@ -1,10 +1,10 @@
 import requests
-from requests.auth import HTTPBasicAuth
 from django.conf import settings
 import json
 from io import BytesIO
 from datetime import timedelta
 from common.connection import execute_raw_query
+from common.domjudge_client import DOMjudgeClient
 
 class DOMjudgeContestService:
     """Service to interact with DOMjudge Contest API"""
@@ -13,6 +13,7 @@ class DOMjudgeContestService:
         self.api_url = getattr(settings, 'DOMJUDGE_API_URL', 'http://localhost:8088/api/v4')
         self.username = getattr(settings, 'DOMJUDGE_USERNAME', 'admin')
         self.password = getattr(settings, 'DOMJUDGE_PASSWORD', 'admin')
+        self.client = DOMjudgeClient()
     
     def create_contest(self, contest_data):
         """
@@ -31,7 +32,7 @@ class DOMjudgeContestService:
         Returns:
             contest_id: string - ID of created contest
         """
-        url = f"{self.api_url}/contests"
+        path = "contests"
         
         # Convert contest data to JSON format expected by DOMjudge
         domjudge_data = {
@@ -56,11 +57,9 @@ class DOMjudgeContestService:
         }
         
         try:
-            response = requests.post(
-                url,
-                files=files,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=30
+            response = self.client.post(
+                path,
+                files=files
             )
             
             if response.status_code == 200:
@@ -75,14 +74,10 @@ class DOMjudgeContestService:
     
     def get_contest(self, contest_id):
         """Get contest details from DOMjudge"""
-        url = f"{self.api_url}/contests/{contest_id}"
+        path = f"contests/{contest_id}"
         
         try:
-            response = requests.get(
-                url,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=30
-            )
+            response = self.client.get(path)
             
             if response.status_code == 200:
                 return response.json()
@@ -94,7 +89,7 @@ class DOMjudgeContestService:
     
     def update_contest(self, contest_id, contest_data):
         """Update contest in DOMjudge"""
-        url = f"{self.api_url}/contests/{contest_id}"
+        path = f"contests/{contest_id}"
         
         # Convert to JSON file for multipart upload
         json_content = json.dumps(contest_data, indent=2)
@@ -105,11 +100,9 @@ class DOMjudgeContestService:
         }
         
         try:
-            response = requests.put(
-                url,
-                files=files,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=30
+            response = self.client.put(
+                path,
+                files=files
             )
             
             if response.status_code == 200:
@@ -122,14 +115,10 @@ class DOMjudgeContestService:
     
     def delete_contest(self, contest_id):
         """Delete contest from DOMjudge"""
-        url = f"{self.api_url}/contests/{contest_id}"
+        path = f"contests/{contest_id}"
         
         try:
-            response = requests.delete(
-                url,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=30
-            )
+            response = self.client.delete(path)
             
             if response.status_code in [200, 204]:
                 return True
@@ -141,14 +130,10 @@ class DOMjudgeContestService:
     
     def list_contests(self):
         """List all contests from DOMjudge"""
-        url = f"{self.api_url}/contests"
+        path = "contests"
         
         try:
-            response = requests.get(
-                url,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=30
-            )
+            response = self.client.get(path)
             
             if response.status_code == 200:
                 return response.json()
@@ -175,14 +160,12 @@ class DOMjudgeContestService:
         Returns:
             dict - DOMjudge response with problem details
         """
-        url = f"{self.api_url}/contests/{contest_id}/problems/{problem_id}"
+        path = f"contests/{contest_id}/problems/{problem_id}"
         
         try:
-            response = requests.put(
-                url,
-                json=problem_data,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=30
+            response = self.client.put(
+                path,
+                json=problem_data
             )
             
             if response.status_code == 200:
@@ -204,14 +187,10 @@ class DOMjudgeContestService:
         Returns:
             bool - True if successful
         """
-        url = f"{self.api_url}/contests/{contest_id}/problems/{problem_id}"
+        path = f"contests/{contest_id}/problems/{problem_id}"
         
         try:
-            response = requests.delete(
-                url,
-                auth=HTTPBasicAuth(self.username, self.password),
-                timeout=30
-            )
+            response = self.client.delete(path)
             
             if response.status_code in [200, 204]:
                 return True
@@ -0,0 +1,145 @@
+"""
+Export bảng xếp hạng / submissions của contest (CSV, NDJSON)
+
+Các row được sinh dần (generator) từ cursor của queryset (.iterator(chunk_size=...)),
+không dựng toàn bộ danh sách trong bộ nhớ; response bắt đầu gửi ngay row đầu tiên.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import ContestProblemResult
+from .ranking_service import ContestRankingService
+from .scoreboard import ScoreboardEngine
+from problems.models import Submissions
+
+
+class _Echo:
+    """File-like object cho csv.writer: trả lại dòng thay vì ghi vào buffer"""
+
+    def write(self, value):
+        return value
+
+
+class ContestExportService:
+    """Sinh row export cho StreamingHttpResponse"""
+
+    CHUNK_SIZE = 1000
+    FORMATS = ('csv', 'ndjson')
+
+    STANDING_FIELDS = (
+        'rank', 'position', 'user_id', 'username', 'full_name',
+        'solved_count', 'total_score', 'penalty_seconds', 'last_submission_at',
+    )
+    CELL_FIELDS = ('status', 'attempts', 'time_minutes', 'penalty', 'score', 'test_passed', 'test_total')
+    SUBMISSION_FIELDS = (
+        'id', 'user_id', 'username', 'problem_id', 'problem_label', 'language',
+        'status', 'score', 'test_passed', 'test_total', 'submitted_at',
+    )
+
+    @staticmethod
+    def standings(contest):
+        """
+        Bảng xếp hạng cuối cùng (không freeze) kèm ô từng bài
+
+        Yields: dict theo STANDING_FIELDS + 'problems' {label: cell}
+        Ô bài được đọc theo từng nhóm CHUNK_SIZE participant (một query mỗi nhóm)
+        """
+        engine = ScoreboardEngine(contest, now=contest.end_at)
+        participants = ContestRankingService.get_contest_leaderboard(contest.id).values(
+            'rank', 'position', 'user_id', 'user__username', 'user__full_name',
+            'solved_count', 'total_score', 'penalty_seconds', 'last_submission_at',
+        )
+
+        chunk = []
+        for row in participants.iterator(chunk_size=ContestExportService.CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) >= ContestExportService.CHUNK_SIZE:
+                yield from ContestExportService._standing_rows(contest, engine, chunk)
+                chunk = []
+        if chunk:
+            yield from ContestExportService._standing_rows(contest, engine, chunk)
+
+    @staticmethod
+    def _standing_rows(contest, engine, chunk):
+        results_by_user = {}
+        for result in ContestProblemResult.objects.filter(
+            contest=contest,
+            participant__user_id__in=[row['user_id'] for row in chunk]
+        ).annotate(user_id=F('participant__user_id')):
+            results_by_user.setdefault(result.user_id, {})[result.problem_id] = result
+
+        for row in chunk:
+            cells = engine.problem_cells(results_by_user.get(row['user_id'], {}))
+            yield {
+                'rank': row['rank'],
+                'position': row['position'],
+                'user_id': row['user_id'],
+                'username': row['user__username'],
+                'full_name': row['user__full_name'] or row['user__username'],
+                'solved_count': row['solved_count'],
+                'total_score': row['total_score'],
+                'penalty_seconds': row['penalty_seconds'],
+                'last_submission_at': row['last_submission_at'],
+                'problems': {cell['problem_label']: cell for cell in cells.values()},
+            }
+
+    @staticmethod
+    def standings_header(contest):
+        labels = list(ContestExportService._labels(contest).values())
+        return list(ContestExportService.STANDING_FIELDS) + [
+            f"{label}_{field}" for label in labels for field in ContestExportService.CELL_FIELDS
+        ]
+
+    @staticmethod
+    def standings_csv_row(row):
+        values = [row[field] for field in ContestExportService.STANDING_FIELDS]
+        for cell in row['problems'].values():
+            values.extend(cell.get(field) for field in ContestExportService.CELL_FIELDS)
+        return values
+
+    @staticmethod
+    def submissions(contest):
+        """Yields: mọi submission của contest (theo thứ tự nộp) theo SUBMISSION_FIELDS"""
+        labels = ContestExportService._labels(contest)
+        queryset = Submissions.objects.filter(contest=contest).order_by('submitted_at', 'id').values(
+            'id', 'user_id', 'user__username', 'problem_id', 'language__name',
+            'status', 'score', 'test_passed', 'test_total', 'submitted_at',
+        )
+        for row in queryset.iterator(chunk_size=ContestExportService.CHUNK_SIZE):
+            yield {
+                'id': row['id'],
+                'user_id': row['user_id'],
+                'username': row['user__username'],
+                'problem_id': row['problem_id'],
+                'problem_label': labels.get(row['problem_id']),
+                'language': row['language__name'],
+                'status': row['status'],
+                'score': row['score'],
+                'test_passed': row['test_passed'],
+                'test_total': row['test_total'],
+                'submitted_at': row['submitted_at'],
+            }
+
+    @staticmethod
+    def _labels(contest):
+        return {
+            problem_id: problem['label']
+            for problem_id, problem in ScoreboardEngine(contest).problems.items()
+        }
+
+    @staticmethod
+    def as_csv(header, rows, to_values=None):
+        """Yields: các dòng CSV (header trước)"""
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(to_values(row) if to_values else [row[field] for field in header])
+
+    @staticmethod
+    def as_ndjson(rows):
+        """Yields: mỗi row một dòng JSON"""
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
@@ -0,0 +1,331 @@
+"""
+Đóng băng bảng xếp hạng và resolver
+
+- Khi freeze bắt đầu, leaderboard công khai được chụp một lần (ContestFrozenScoreboard)
+  và phục vụ cho user thường tới khi contest kết thúc.
+- Khi contest kết thúc, ranking được tính lại một lần không freeze bởi task
+  định kỳ hoặc job nền; request trong lúc chờ vẫn xem snapshot lúc freeze.
+- Resolver: lần lượt mở các ô pending (nộp trong thời gian freeze) từ đội
+  xếp cuối lên, tính từ ContestProblemResult trong một lần đọc.
+"""
+import bisect
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Contest, ContestParticipant, ContestProblemResult, ContestFrozenScoreboard
+from .scoreboard import ScoreboardEngine
+from problems.models import Submissions
+from problems.judging_service import IN_FLIGHT_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class ContestFreezeService:
+    """Snapshot công khai lúc freeze, mở băng khi kết thúc và resolver"""
+
+    UNFREEZE_LOCK_SECONDS = 60
+    # Retry-After cho request cần ranking cuối khi mở băng chưa xong
+    UNFREEZE_RETRY_SECONDS = 5
+
+    @staticmethod
+    def is_frozen(contest, now=None):
+        now = now or timezone.now()
+        return bool(contest.freeze_rankings_at and contest.freeze_rankings_at <= now < contest.end_at)
+
+    @staticmethod
+    def get_public_snapshot(contest):
+        """
+        Snapshot công khai của contest đang freeze (tạo nếu chưa có)
+
+        Contest đã kết thúc nhưng chưa mở băng xong: trả về snapshot lúc freeze
+        (và đưa job mở băng vào hàng đợi) thay vì tính lại trong request
+
+        Returns: ContestFrozenScoreboard hoặc None (không freeze / chưa sẵn sàng / đã mở băng)
+        """
+        if not ContestFreezeService.is_frozen(contest):
+            if not ContestFreezeService.request_unfreeze(contest):
+                return None
+            return ContestFrozenScoreboard.objects.filter(
+                contest=contest,
+                frozen_at=contest.freeze_rankings_at
+            ).first()
+
+        snapshot = ContestFrozenScoreboard.objects.filter(
+            contest=contest,
+            frozen_at=contest.freeze_rankings_at
+        ).first()
+        if snapshot is None and ContestFreezeService._ready_to_freeze(contest):
+            snapshot = ContestFreezeService.create_snapshot(contest)
+        return snapshot
+
+    @staticmethod
+    def _ready_to_freeze(contest):
+        """Chờ các submission nộp trước freeze có verdict (tối đa FREEZE_SNAPSHOT_GRACE_SECONDS)"""
+        grace = timedelta(seconds=settings.FREEZE_SNAPSHOT_GRACE_SECONDS)
+        if timezone.now() >= contest.freeze_rankings_at + grace:
+            return True
+        return not Submissions.objects.filter(
+            contest=contest,
+            status__in=IN_FLIGHT_STATUSES,
+            submitted_at__gte=contest.start_at,
+            submitted_at__lt=contest.freeze_rankings_at
+        ).exists()
+
+    @staticmethod
+    def create_snapshot(contest):
+        """Chụp leaderboard hiện tại (đã ẩn kết quả sau freeze) làm snapshot công khai"""
+        from .ranking_service import ContestRankingService
+
+        payload = ContestRankingService.build_leaderboard(contest)
+        snapshot, _ = ContestFrozenScoreboard.objects.update_or_create(
+            contest=contest,
+            defaults={'frozen_at': contest.freeze_rankings_at, 'payload': payload}
+        )
+        logger.info(f"[Freeze] Snapshot created for contest {contest.slug}")
+        return snapshot
+
+    @staticmethod
+    def invalidate(contest_id):
+        """Bỏ snapshot (vd: verdict muộn của submission nộp trước freeze, đổi cấu hình contest)"""
+        ContestFrozenScoreboard.objects.filter(contest_id=contest_id).delete()
+
+    @staticmethod
+    def unfreeze_pending(contest):
+        """Contest có freeze đã kết thúc nhưng chưa được tính lại không freeze (rankings_unfrozen_at)"""
+        if not contest.freeze_rankings_at or timezone.now() < contest.end_at:
+            return False
+        return contest.rankings_unfrozen_at is None
+
+    @staticmethod
+    def mark_unfrozen(contest_id, recalculated_at):
+        """
+        Ghi rankings_unfrozen_at sau khi tính lại toàn bộ ranking bắt đầu lúc recalculated_at
+        (chỉ khi lần tính đó bắt đầu sau end_at, tức không còn freeze)
+        """
+        Contest.objects.filter(
+            id=contest_id,
+            freeze_rankings_at__isnull=False,
+            end_at__lte=recalculated_at
+        ).update(rankings_unfrozen_at=recalculated_at)
+
+    @staticmethod
+    def _unfreeze_lock_key(contest_id):
+        return f"contest_unfreeze:{contest_id}"
+
+    @staticmethod
+    def request_unfreeze(contest):
+        """
+        Dùng trong request: đưa job tính lại ranking (ContestRankingJob) vào hàng đợi
+        nếu chưa mở băng, không tính lại trong request. Chỉ request giữ được khóa
+        mới enqueue, job đang chờ/chạy của contest được dùng lại
+
+        Returns: True nếu ranking vẫn chưa mở băng
+        """
+        from .ranking_jobs import RankingJobService
+
+        if not ContestFreezeService.unfreeze_pending(contest):
+            return False
+        lock_key = ContestFreezeService._unfreeze_lock_key(contest.id)
+        if cache.add(lock_key, 1, ContestFreezeService.UNFREEZE_LOCK_SECONDS):
+            RankingJobService.enqueue(contest)
+        return True
+
+    @staticmethod
+    def ensure_unfrozen(contest):
+        """
+        Contest có freeze đã kết thúc: tính lại ranking một lần (không freeze)
+        nếu tổng của participant vẫn là giá trị lúc freeze. Chỉ gọi từ task nền
+        (process_due_contests); bỏ qua nếu request khác vừa enqueue job mở băng
+
+        Returns: True nếu đã tính lại
+        """
+        from .ranking_service import ContestRankingService
+
+        if not ContestFreezeService.unfreeze_pending(contest):
+            return False
+        lock_key = ContestFreezeService._unfreeze_lock_key(contest.id)
+        if not cache.add(lock_key, 1, ContestFreezeService.UNFREEZE_LOCK_SECONDS):
+            return False
+        try:
+            started = timezone.now()
+            ContestRankingService.recalculate_all_rankings(contest.id)
+            ContestFreezeService.mark_unfrozen(contest.id, started)
+        finally:
+            cache.delete(lock_key)
+        logger.info(f"[Freeze] Rankings unfrozen for contest {contest.slug}")
+        return True
+
+    @staticmethod
+    def process_due_contests():
+        """Tạo snapshot cho contest vừa freeze, mở băng contest vừa kết thúc"""
+        now = timezone.now()
+        frozen = 0
+        unfrozen = 0
+
+        for contest in Contest.objects.filter(
+            freeze_rankings_at__lte=now,
+            end_at__gt=now
+        ).exclude(frozen_scoreboard__frozen_at=F('freeze_rankings_at')):
+            if ContestFreezeService._ready_to_freeze(contest):
+                ContestFreezeService.create_snapshot(contest)
+                frozen += 1
+
+        for contest in Contest.objects.filter(
+            freeze_rankings_at__isnull=False,
+            rankings_unfrozen_at__isnull=True,
+            end_at__lte=now,
+            end_at__gte=now - timedelta(days=1)
+        ):
+            if ContestFreezeService.ensure_unfrozen(contest):
+                unfrozen += 1
+
+        return {'frozen': frozen, 'unfrozen': unfrozen}
+
+    @staticmethod
+    def slice_payload(payload, page=None, page_size=None, around_user=None, window=None):
+        """Cắt snapshot theo page / around_user (cùng format với leaderboard API)"""
+        entries = payload['leaderboard']
+        total = len(entries)
+        result = dict(payload, total_participants=total)
+
+        if around_user is not None:
+            index = next((i for i, entry in enumerate(entries) if entry['user_id'] == around_user), None)
+            rows = [] if index is None else entries[max(0, index - window):index + window + 1]
+            result.update({
+                'leaderboard': rows,
+                'around_user': around_user,
+                'window': window,
+                'user_rank': entries[index]['rank'] if index is not None else None,
+                'user_position': entries[index]['position'] if index is not None else None
+            })
+        elif page is not None:
+            offset = (page - 1) * page_size
+            result.update({
+                'leaderboard': entries[offset:offset + page_size],
+                'page': page,
+                'page_size': page_size,
+                'total_pages': (total + page_size - 1) // page_size if total > 0 else 0
+            })
+        return result
+
+    @staticmethod
+    def resolver_events(contest):
+        """
+        Các bước resolver sau khi contest kết thúc (generator)
+
+        - 'init': bảng xếp hạng lúc freeze, kèm ô từng bài
+        - 'reveal': mở một ô pending của đội thấp nhất còn ô pending
+        - 'final': bảng xếp hạng cuối cùng
+        """
+        frozen_view = ScoreboardEngine(contest, now=contest.freeze_rankings_at)
+        final_view = ScoreboardEngine(contest, now=contest.end_at)
+        labels = {problem_id: problem['label'] for problem_id, problem in final_view.problems.items()}
+
+        participants = ContestParticipant.objects.filter(
+            contest=contest,
+            is_active=True
+        ).values('id', 'user_id', 'user__username', 'user__full_name')
+        results_by_user = {}
+        for result in ContestProblemResult.objects.filter(
+            contest=contest,
+            problem_id__in=list(labels)
+        ).annotate(user_id=F('participant__user_id')):
+            results_by_user.setdefault(result.user_id, {})[result.problem_id] = result
+
+        states = []
+        for participant in participants:
+            results = results_by_user.get(participant['user_id'], {})
+            totals = frozen_view.standing(results.values())
+            cells = frozen_view.problem_cells(results)
+            states.append({
+                'participant_id': participant['id'],
+                'user_id': participant['user_id'],
+                'username': participant['user__username'],
+                'full_name': participant['user__full_name'] or participant['user__username'],
+                'solved': totals['solved_count'],
+                'penalty_seconds': totals['penalty_seconds'],
+                'last_submission_at': totals['last_submission_at'],
+                'problems': cells,
+                'pending': [
+                    problem_id for problem_id, cell in cells.items()
+                    if cell['status'] != 'AC' and cell['frozen_attempts']
+                ],
+                'results': results,
+            })
+
+        def sort_key(state):
+            # Cùng thứ tự với leaderboard: last_submission_at tăng dần (NULL trước), rồi participant id
+            last_at = state['last_submission_at']
+            return (-state['solved'], state['penalty_seconds'], last_at is not None, last_at or 0,
+                    state['participant_id'])
+
+        states.sort(key=sort_key)
+        keys = [sort_key(state) for state in states]
+
+        def standings():
+            return [{
+                'rank': index + 1,
+                'user_id': state['user_id'],
+                'username': state['username'],
+                'full_name': state['full_name'],
+                'solved': state['solved'],
+                'penalty_seconds': state['penalty_seconds'],
+            } for index, state in enumerate(states)]
+
+        yield {
+            'type': 'init',
+            'contest_id': contest.id,
+            'problems': [{'id': problem_id, 'label': label} for problem_id, label in labels.items()],
+            'standings': [dict(row, problems=state['problems']) for row, state in zip(standings(), states)],
+        }
+
+        step = 0
+        while True:
+            # Đội thấp nhất còn ô pending
+            index = next((i for i in range(len(states) - 1, -1, -1) if states[i]['pending']), None)
+            if index is None:
+                break
+
+            state = states.pop(index)
+            keys.pop(index)
+            problem_id = state['pending'].pop(0)
+            result = state['results'][problem_id]
+            cell = final_view.problem_cell(final_view.problems[problem_id], result)
+            solved, _, penalty, last_at = final_view.contribution(result)
+            if cell['status'] == 'AC':
+                state['solved'] += solved
+                state['penalty_seconds'] += penalty
+            if last_at and (not state['last_submission_at'] or last_at > state['last_submission_at']):
+                state['last_submission_at'] = last_at
+
+            key = sort_key(state)
+            new_index = bisect.bisect_left(keys, key)
+            states.insert(new_index, state)
+            keys.insert(new_index, key)
+
+            step += 1
+            yield {
+                'type': 'reveal',
+                'step': step,
+                'user_id': state['user_id'],
+                'problem_id': problem_id,
+                'problem_label': labels[problem_id],
+                'cell': cell,
+                'solved': state['solved'],
+                'penalty_seconds': state['penalty_seconds'],
+                'rank_before': index + 1,
+                'rank_after': new_index + 1,
+            }
+
+        # Bài không pending nhưng có submission sau freeze (vd: nộp lại sau khi AC) chỉ đổi
+        # last_submission_at: dùng giá trị cuối để bảng cuối trùng leaderboard sau mở băng
+        for state in states:
+            state['last_submission_at'] = final_view.standing(state['results'].values())['last_submission_at']
+        states.sort(key=sort_key)
+
+        yield {'type': 'final', 'steps': step, 'standings': standings()}
@@ -0,0 +1,200 @@
+"""
+Leaderboard trực tiếp: chỉ gửi các dòng thay đổi
+
+Mọi kết nối của cùng một contest dùng chung:
+- ETag hiện tại (cache LIVE_ETAG_SECONDS, ~1 query / giây cho cả contest)
+- payload snapshot (cache theo ETag, xem get_leaderboard_snapshot)
+- delta giữa hai ETag (tính một lần cho mọi process: khóa cache.add, cache theo cặp ETag)
+- trong mỗi process ASGI: một task poll cho mỗi (contest, admin/public)
+  (leaderboard_hub), event snapshot/delta được format một lần cho mỗi phiên bản
+"""
+import time
+from functools import cached_property
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Contest
+from .ranking_service import ContestRankingService
+from .freeze_service import ContestFreezeService
+from common.sse import BroadcastHub, format_event
+
+
+class LeaderboardMessage:
+    """Một phiên bản leaderboard đã format sẵn, dùng chung cho mọi kết nối"""
+
+    def __init__(self, etag, payload=None, from_etag=None, delta=None, error=None):
+        self.etag = etag
+        self.payload = payload
+        self.from_etag = from_etag
+        self.delta_event = format_event('delta', delta, event_id=etag) if delta else None
+        self.error_event = format_event('error', {'error': error}) if error else None
+
+    @cached_property
+    def snapshot_event(self):
+        return format_event('snapshot', self.payload, event_id=self.etag)
+
+    def events_for(self, etag):
+        """Event cần gửi cho kết nối đang ở phiên bản `etag`"""
+        if self.error_event:
+            return [self.error_event]
+        if etag == self.etag:
+            return []
+        if self.delta_event and etag == self.from_etag:
+            return [self.delta_event]
+        return [self.snapshot_event]
+
+
+class LeaderboardDeltaService:
+    """Snapshot / delta leaderboard cho stream"""
+
+    LIVE_ETAG_SECONDS = 1
+    DELTA_LOCK_SECONDS = 10
+    DELTA_WAIT_SECONDS = 2
+
+    @staticmethod
+    def current(contest_id, include_frozen=False):
+        """
+        ETag leaderboard mà viewer đang thấy (snapshot freeze với user thường)
+
+        Returns: etag hoặc None nếu contest không tồn tại
+        """
+        cache_key = f"contest_leaderboard_live:{contest_id}:{'admin' if include_frozen else 'public'}"
+        etag = cache.get(cache_key)
+        if etag is None:
+            contest = Contest.objects.filter(id=contest_id).first()
+            if contest is None:
+                return None
+            etag = LeaderboardDeltaService._resolve(contest, include_frozen)[1]
+            cache.set(cache_key, etag, LeaderboardDeltaService.LIVE_ETAG_SECONDS)
+        return etag
+
+    @staticmethod
+    def _resolve(contest, include_frozen):
+        """(snapshot freeze hoặc None, etag)"""
+        snapshot = None if include_frozen else ContestFreezeService.get_public_snapshot(contest)
+        if snapshot is not None:
+            return snapshot, f"{contest.id}-frozen-{snapshot.id}"
+        return None, ContestRankingService.leaderboard_etag(contest)
+
+    @staticmethod
+    def payload(contest_id, include_frozen=False):
+        """Returns: (payload, etag) hoặc (None, None) nếu contest không tồn tại"""
+        contest = Contest.objects.filter(id=contest_id).first()
+        if contest is None:
+            return None, None
+        snapshot, etag = LeaderboardDeltaService._resolve(contest, include_frozen)
+        if snapshot is not None:
+            return snapshot.payload, etag
+        return ContestRankingService.get_leaderboard_snapshot(contest)
+
+    @staticmethod
+    def poll(contest_id, include_frozen=False, previous=None):
+        """
+        Phiên bản leaderboard hiện tại (hàm poll của leaderboard_hub)
+
+        Returns: `previous` nếu không đổi, hoặc LeaderboardMessage mới
+        """
+        etag = LeaderboardDeltaService.current(contest_id, include_frozen)
+        if etag is None:
+            return LeaderboardMessage(None, error='Contest not found')
+        if previous is not None and previous.etag == etag:
+            return previous
+
+        payload, etag = LeaderboardDeltaService.payload(contest_id, include_frozen)
+        if payload is None:
+            return LeaderboardMessage(None, error='Contest not found')
+        if previous is not None and previous.etag == etag:
+            return previous
+
+        delta = None
+        if previous is not None and previous.payload is not None:
+            delta = LeaderboardDeltaService.delta(previous.etag, etag, payload, previous.payload)
+        return LeaderboardMessage(
+            etag, payload, from_etag=previous.etag if previous else None, delta=delta
+        )
+
+    @staticmethod
+    def resume(old_etag, message):
+        """Event cho kết nối lại với Last-Event-ID = old_etag: delta nếu còn payload cũ trong cache"""
+        if message.payload is None or old_etag in (None, message.etag, message.from_etag):
+            return message.events_for(old_etag)
+        delta = LeaderboardDeltaService.delta(old_etag, message.etag, message.payload)
+        if delta is None:
+            return message.events_for(old_etag)
+        return [format_event('delta', delta, event_id=message.etag)]
+
+    @staticmethod
+    def delta(old_etag, new_etag, new_payload, old_payload=None):
+        """
+        Các dòng thay đổi từ phiên bản old_etag sang new_payload (cache theo cặp ETag)
+
+        Chỉ một process tính delta cho mỗi cặp ETag, các process khác chờ kết quả.
+        old_payload mặc định đọc từ cache snapshot (get_leaderboard_snapshot).
+
+        Returns: dict delta, hoặc None nếu phải gửi lại toàn bộ (đổi danh sách bài,
+        payload cũ đã hết hạn...)
+        """
+        cache_key = f"contest_leaderboard_delta:{old_etag}:{new_etag}"
+        delta = cache.get(cache_key)
+        if delta is not None:
+            return delta or None
+
+        lock_key = f"{cache_key}:lock"
+        locked = cache.add(lock_key, 1, LeaderboardDeltaService.DELTA_LOCK_SECONDS)
+        if not locked:
+            deadline = time.monotonic() + LeaderboardDeltaService.DELTA_WAIT_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                delta = cache.get(cache_key)
+                if delta is not None:
+                    return delta or None
+
+        try:
+            if old_payload is None:
+                old_payload = cache.get(f"contest_leaderboard:{old_etag}")
+            if old_payload is None:
+                return None
+            delta = LeaderboardDeltaService.diff(old_payload, new_payload)
+            if delta is not None:
+                delta.update({'from': old_etag, 'etag': new_etag})
+            cache.set(cache_key, delta or {}, settings.LEADERBOARD_CACHE_SECONDS)
+            return delta
+        finally:
+            if locked:
+                cache.delete(lock_key)
+
+    # Thống kê của cột bài (đổi sau mỗi AC): gửi lại `problems` trong delta
+    PROBLEM_STAT_KEYS = ('solved_count', 'first_solver_id')
+
+    @staticmethod
+    def diff(old_payload, new_payload):
+        """So sánh hai payload leaderboard theo user_id"""
+        keys = ('contest_mode', 'penalty_time')
+        if any(old_payload.get(key) != new_payload.get(key) for key in keys):
+            return None
+        if LeaderboardDeltaService._columns(old_payload) != LeaderboardDeltaService._columns(new_payload):
+            return None
+
+        old_rows = {entry['user_id']: entry for entry in old_payload['leaderboard']}
+        new_rows = {entry['user_id']: entry for entry in new_payload['leaderboard']}
+        delta = {
+            'version': new_payload.get('version'),
+            'rows': [entry for user_id, entry in new_rows.items() if old_rows.get(user_id) != entry],
+            'removed': [user_id for user_id in old_rows if user_id not in new_rows],
+            'total_participants': new_payload['total_participants'],
+        }
+        if old_payload.get('problems') != new_payload.get('problems'):
+            delta['problems'] = new_payload.get('problems')
+        return delta
+
+    @staticmethod
+    def _columns(payload):
+        """Danh sách cột bài, bỏ các thống kê"""
+        return [
+            {key: value for key, value in problem.items() if key not in LeaderboardDeltaService.PROBLEM_STAT_KEYS}
+            for problem in payload.get('problems') or []
+        ]
+
+
+leaderboard_hub = BroadcastHub(interval=1.0)
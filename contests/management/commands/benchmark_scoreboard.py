@@ -0,0 +1,210 @@
+"""
+Django Management Command: Benchmark scoreboard engine
+
+So sánh tính lại ranking theo từng user (update_user_ranking) với
+ScoreboardEngine (một lần đọc submissions + bulk_update) và cập nhật tăng dần
+theo từng verdict (apply_submission_result) trên dữ liệu seed hoặc một contest
+có sẵn. Mọi thay đổi được rollback khi kết thúc.
+
+Usage:
+    python manage.py benchmark_scoreboard --users 300 --problems 12
+    python manage.py benchmark_scoreboard --mode OI
+    python manage.py benchmark_scoreboard --contest 5
+"""
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from contests.models import Contest, ContestParticipant, ContestProblem, ContestProblemResult
+from contests.ranking_service import ContestRankingService
+from contests.scoreboard import ScoreboardEngine
+from problems.models import Problem, Submissions
+from users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ScoreboardEngine so với tính ranking theo từng user'
+
+    # Viết hoa: luồng cũ so sánh status__in=['AC', ...], chỉ khớp 'ac' trên MySQL (collation ci)
+    STATUSES = ['AC', 'WA', 'WA', 'TLE', 'RTE', 'CE']
+    RANKING_FIELDS = ('solved_count', 'total_score', 'penalty_seconds', 'last_submission_at')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contest', type=int, help='Benchmark contest có sẵn thay vì seed dữ liệu')
+        parser.add_argument('--users', type=int, default=300, help='Số participant seed (default: 300)')
+        parser.add_argument('--problems', type=int, default=12, help='Số bài seed (default: 12)')
+        parser.add_argument(
+            '--submissions-per-user', type=int, default=30,
+            help='Số submission seed mỗi user (default: 30)'
+        )
+        parser.add_argument('--mode', choices=['ICPC', 'OI'], default='ICPC', help='Contest mode khi seed')
+        parser.add_argument('--no-freeze', action='store_true', help='Seed contest không đóng băng bảng xếp hạng')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['contest']:
+                    try:
+                        contest = Contest.objects.get(id=options['contest'])
+                    except Contest.DoesNotExist:
+                        raise CommandError(f"Contest {options['contest']} not found")
+                else:
+                    contest = self.seed(options)
+                self.benchmark(contest)
+                raise Rollback()
+        except Rollback:
+            self.stdout.write('Rolled back all benchmark changes')
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        tag = f"bench{int(time.time())}"
+
+        self.stdout.write(
+            f"Seeding {options['mode']} contest: {options['users']} users, {options['problems']} problems, "
+            f"{options['submissions_per_user']} submissions/user"
+        )
+
+        contest = Contest.objects.create(
+            slug=tag,
+            title=f'Scoreboard benchmark {tag}',
+            start_at=now - timedelta(hours=4),
+            end_at=now + timedelta(hours=1),
+            contest_mode=options['mode'],
+            freeze_rankings_at=None if options['no_freeze'] else now - timedelta(minutes=30),
+        )
+        problems = Problem.objects.bulk_create([
+            Problem(slug=f'{tag}-p{i}', title=f'Benchmark problem {i}', statement_text='')
+            for i in range(options['problems'])
+        ])
+        ContestProblem.objects.bulk_create([
+            ContestProblem(contest=contest, problem=problem, sequence=i,
+                           alias=chr(65 + i % 26), label=chr(65 + i % 26), point=100)
+            for i, problem in enumerate(problems)
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'{tag}-u{i}', email=f'{tag}-u{i}@example.com', password='!')
+            for i in range(options['users'])
+        ])
+        ContestParticipant.objects.bulk_create([
+            ContestParticipant(contest=contest, user=user) for user in users
+        ])
+
+        submissions = []
+        elapsed = int((now - contest.start_at).total_seconds())
+        for user in users:
+            for _ in range(options['submissions_per_user']):
+                total = rng.randint(5, 20)
+                submissions.append(Submissions(
+                    problem=rng.choice(problems),
+                    user=user,
+                    contest=contest,
+                    status=rng.choice(self.STATUSES),
+                    test_total=total,
+                    test_passed=rng.randint(0, total),
+                ))
+        submissions = Submissions.objects.bulk_create(submissions, batch_size=1000)
+
+        # submitted_at là auto_now_add: gán lại thời điểm ngẫu nhiên trong contest
+        for submission in submissions:
+            submission.submitted_at = contest.start_at + timedelta(
+                seconds=rng.randint(0, elapsed - 1), microseconds=rng.randint(0, 999999)
+            )
+        Submissions.objects.bulk_update(submissions, ['submitted_at'], batch_size=1000)
+
+        return contest
+
+    def benchmark(self, contest):
+        participants = ContestParticipant.objects.filter(contest=contest, is_active=True)
+        user_ids = list(participants.values_list('user_id', flat=True))
+        self.stdout.write(f'Contest {contest.slug} ({contest.contest_mode}): {len(user_ids)} participants')
+
+        # Luồng cũ: update_user_ranking cho từng participant
+        legacy_seconds, legacy_queries = self._measure(
+            lambda: [ContestRankingService.update_user_ranking(contest.id, user_id) for user_id in user_ids]
+        )
+        legacy = self._snapshot(contest)
+        sample = user_ids[:20]
+        legacy_cells = {
+            user_id: ContestRankingService._calculate_user_problem_details(contest.id, user_id)
+            for user_id in sample
+        }
+
+        participants.update(solved_count=0, total_score=0, penalty_seconds=0, last_submission_at=None)
+
+        engine_seconds, engine_queries = self._measure(
+            lambda: ScoreboardEngine(contest).recalculate()
+        )
+        engine = self._snapshot(contest)
+        engine_cells = ContestRankingService.get_all_problem_details(contest.id, sample)
+
+        # Phát lại từng verdict theo thứ tự nộp bài
+        participants.update(solved_count=0, total_score=0, penalty_seconds=0, last_submission_at=None)
+        ContestProblemResult.objects.filter(contest=contest).delete()
+        submissions = list(
+            Submissions.objects.filter(contest=contest, user_id__in=user_ids)
+            .select_related('contest').order_by('submitted_at', 'id')
+        )
+        incremental_seconds, incremental_queries = self._measure(
+            lambda: [ContestRankingService.apply_submission_result(submission) for submission in submissions]
+        )
+        incremental = self._snapshot(contest)
+        incremental_cells = ContestRankingService.get_all_problem_details(contest.id, sample)
+
+        self.stdout.write(f'{"":<24}{"time (s)":>12}{"queries":>12}')
+        self.stdout.write(f'{"update_user_ranking":<24}{legacy_seconds:>12.3f}{legacy_queries:>12}')
+        self.stdout.write(f'{"ScoreboardEngine":<24}{engine_seconds:>12.3f}{engine_queries:>12}')
+        if engine_seconds:
+            self.stdout.write(f'Speedup: {legacy_seconds / engine_seconds:.1f}x')
+        if submissions:
+            self.stdout.write(
+                f'Incremental: {len(submissions)} verdicts, '
+                f'{incremental_seconds * 1000 / len(submissions):.2f} ms and '
+                f'{incremental_queries / len(submissions):.1f} queries per verdict'
+            )
+
+        mismatches = [
+            user_id for user_id in user_ids
+            if not legacy.get(user_id) == engine.get(user_id) == incremental.get(user_id)
+        ]
+        cell_mismatches = [
+            user_id for user_id in sample
+            if not legacy_cells[user_id] == engine_cells.get(user_id) == incremental_cells.get(user_id)
+        ]
+        if mismatches or cell_mismatches:
+            self.stdout.write(self.style.ERROR(
+                f'Results differ: {len(mismatches)} rankings, {len(cell_mismatches)} problem details '
+                f'(users {(mismatches + cell_mismatches)[:10]})'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Results identical'))
+
+    @staticmethod
+    def _measure(func):
+        # Đếm bằng execute_wrapper (queries_log của CaptureQueriesContext giới hạn 9000 query)
+        counter = {'queries': 0}
+
+        def count_query(execute, sql, params, many, context):
+            counter['queries'] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+        return elapsed, counter['queries']
+
+    def _snapshot(self, contest):
+        return {
+            row['user_id']: tuple(row[field] for field in self.RANKING_FIELDS)
+            for row in ContestParticipant.objects.filter(contest=contest).values('user_id', *self.RANKING_FIELDS)
+        }
@@ -0,0 +1,36 @@
+"""
+Django Management Command: Rebuild contest results
+
+Tính lại ContestParticipant và bảng ContestProblemResult từ submissions
+(dùng khi triển khai lần đầu, hoặc sau khi đổi freeze/penalty/điểm bài của contest).
+
+Usage:
+    python manage.py rebuild_contest_results
+    python manage.py rebuild_contest_results --contest 5
+"""
+from django.core.management.base import BaseCommand
+
+from contests.models import Contest
+from contests.ranking_service import ContestRankingService
+
+
+class Command(BaseCommand):
+    help = 'Tính lại ranking và ContestProblemResult từ submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--contest',
+            type=int,
+            help='ID contest cần tính lại (mặc định: tất cả)',
+        )
+
+    def handle(self, *args, **options):
+        contests = Contest.objects.all()
+        if options['contest']:
+            contests = contests.filter(id=options['contest'])
+
+        for contest in contests.order_by('id'):
+            updated = ContestRankingService.recalculate_all_rankings(contest.id)
+            self.stdout.write(f'{contest.slug}: {updated} participants')
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt contest results'))
@@ -0,0 +1,86 @@
+"""
+Django Management Command: Reconcile practice counters
+
+Kiểm tra solved_count / attempted_count lưu trên ContestParticipant của contest
+practice với số liệu đếm lại từ submissions (một query GROUP BY user),
+và sửa các participant bị lệch khi có --fix.
+
+Usage:
+    python manage.py reconcile_practice_counters
+    python manage.py reconcile_practice_counters --fix
+    python manage.py reconcile_practice_counters --contest other-practice --fix
+"""
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q
+
+from contests.models import Contest, ContestParticipant
+from contests.ranking_service import ContestRankingService
+from contests.scoreboard import AC_STATUSES
+from problems.models import Submissions
+from problems.judging_service import IN_FLIGHT_STATUSES
+
+
+class Command(BaseCommand):
+    help = 'Kiểm tra và sửa solved_count / attempted_count của contest practice'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contest', default='practice', help='Slug contest (default: practice)')
+        parser.add_argument('--fix', action='store_true', help='Ghi lại các counter bị lệch')
+
+    def handle(self, *args, **options):
+        try:
+            contest = Contest.objects.get(slug=options['contest'])
+        except Contest.DoesNotExist:
+            raise CommandError(f"Contest '{options['contest']}' not found")
+
+        accepted = Q()
+        for status in AC_STATUSES:
+            accepted |= Q(status__iexact=status)
+
+        expected = {
+            row['user_id']: (row['solved'], row['attempted'])
+            for row in Submissions.objects.filter(
+                contest=contest,
+                submitted_at__gte=contest.start_at,
+                submitted_at__lte=contest.end_at
+            ).exclude(status__in=IN_FLIGHT_STATUSES).order_by().values('user_id').annotate(
+                solved=Count('problem_id', filter=accepted, distinct=True),
+                attempted=Count('problem_id', distinct=True)
+            )
+        }
+
+        drifted = []
+        checked = 0
+        for participant in ContestParticipant.objects.filter(contest=contest).only(
+            'id', 'user_id', 'solved_count', 'attempted_count', 'total_score'
+        ).iterator(chunk_size=2000):
+            checked += 1
+            solved, attempted = expected.get(participant.user_id, (0, 0))
+            if (participant.solved_count, participant.attempted_count) != (solved, attempted):
+                self.stdout.write(
+                    f'  user {participant.user_id}: solved {participant.solved_count} -> {solved}, '
+                    f'attempted {participant.attempted_count} -> {attempted}'
+                )
+                participant.solved_count = solved
+                participant.attempted_count = attempted
+                participant.total_score = Decimal(solved)
+                drifted.append(participant)
+
+        self.stdout.write(f'{contest.slug}: checked {checked} participants, {len(drifted)} drifted')
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Counters are consistent'))
+            return
+
+        if not options['fix']:
+            self.stdout.write(self.style.WARNING('Run with --fix to repair'))
+            return
+
+        with transaction.atomic():
+            ContestParticipant.objects.bulk_update(
+                drifted, ['solved_count', 'attempted_count', 'total_score'], batch_size=500
+            )
+            ContestRankingService.bump_standings_version(contest.id)
+        self.stdout.write(self.style.SUCCESS(f'Repaired {len(drifted)} participants'))
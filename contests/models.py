@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 # Create your models here.
@@ -20,6 +21,8 @@ class Contest(models.Model):
     penalty_time = models.IntegerField(default=20, help_text="Penalty time in minutes for each wrong submission")
     penalty_mode = models.CharField(max_length=50, choices=[("none", "No Penalty"), ("standard", "Standard Penalty")], default="standard")
     freeze_rankings_at = models.DateTimeField(null=True, blank=True, help_text="Time when the rankings will be frozen")
+    standings_version = models.BigIntegerField(default=0, help_text="Incremented whenever the standings change (leaderboard cache key)")
+    rankings_unfrozen_at = models.DateTimeField(null=True, blank=True, help_text="When rankings were recalculated without freeze after the contest ended")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True, related_name="created_contests")
@@ -59,6 +62,7 @@ class ContestParticipant(models.Model):
     total_score = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Total score (for OI mode)")
     penalty_seconds = models.IntegerField(default=0, help_text="Penalty time in seconds (for ICPC mode)")
     last_submission_at = models.DateTimeField(null=True, blank=True, help_text="Time of last submission")
+    attempted_count = models.IntegerField(default=0, help_text="Number of distinct problems with a judged submission")
     ranking_updated_at = models.DateTimeField(auto_now=True, help_text="Last time ranking was updated")
 
     class Meta:
@@ -67,8 +71,129 @@ class ContestParticipant(models.Model):
         ordering = ["-solved_count", "penalty_seconds", "last_submission_at"]
         indexes = [
             models.Index(fields=["contest", "-solved_count", "penalty_seconds"]),
+            models.Index(fields=["contest", "-total_score", "last_submission_at"]),
+            models.Index(fields=["contest", "-solved_count", "attempted_count"]),
             models.Index(fields=["contest", "is_active"]),
         ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.contest.title} (Solved: {self.solved_count}, Score: {self.total_score})"
\ No newline at end of file
+        return f"{self.user.username} - {self.contest.title} (Solved: {self.solved_count}, Score: {self.total_score})"
+
+class ContestProblemResult(models.Model):
+    """
+    Materialized result of one participant on one problem
+    Updated incrementally when a verdict arrives (see ContestRankingService.apply_submission_result)
+    """
+    id = models.BigAutoField(primary_key=True)
+    contest = models.ForeignKey(Contest, on_delete=models.CASCADE, related_name="problem_results")
+    participant = models.ForeignKey(ContestParticipant, on_delete=models.CASCADE, related_name="problem_results")
+    problem = models.ForeignKey('problems.Problem', on_delete=models.CASCADE, related_name="contest_results")
+
+    attempts = models.IntegerField(default=0, help_text="Number of judged submissions")
+    frozen_attempts = models.IntegerField(default=0, help_text="Judged submissions at or after freeze_rankings_at")
+    wrong_attempts = models.IntegerField(default=0, help_text="Wrong submissions before the first AC")
+    first_ac_at = models.DateTimeField(null=True, blank=True, help_text="Time of the first AC submission")
+    ac_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    ac_test_passed = models.IntegerField(null=True, blank=True)
+    ac_test_total = models.IntegerField(null=True, blank=True)
+    best_score = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Best OI score (test_passed / test_total * point)")
+    last_submission_at = models.DateTimeField(null=True, blank=True)
+    last_unfrozen_submission_at = models.DateTimeField(null=True, blank=True, help_text="Time of the last submission before freeze_rankings_at")
+    last_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    last_test_passed = models.IntegerField(null=True, blank=True)
+    last_test_total = models.IntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "contest_problem_results"
+        unique_together = ("participant", "problem")
+        indexes = [
+            models.Index(fields=["contest", "problem"]),
+        ]
+
+    def __str__(self):
+        return f"{self.participant_id} - {self.problem_id} (Attempts: {self.attempts}, AC: {self.first_ac_at})"
+
+
+class ContestFrozenScoreboard(models.Model):
+    """
+    Public leaderboard captured once when the ranking freeze starts
+    Served to non-admin users until the contest ends (see ContestFreezeService)
+    """
+    id = models.BigAutoField(primary_key=True)
+    contest = models.OneToOneField(Contest, on_delete=models.CASCADE, related_name="frozen_scoreboard")
+    frozen_at = models.DateTimeField(help_text="freeze_rankings_at of the contest when the snapshot was taken")
+    payload = models.JSONField(encoder=DjangoJSONEncoder, help_text="Full leaderboard payload (same format as the leaderboard API)")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "contest_frozen_scoreboards"
+
+    def __str__(self):
+        return f"Frozen scoreboard of {self.contest_id} @ {self.frozen_at}"
+
+
+class ContestRankingJob(models.Model):
+    """
+    Background rankings recalculation of a contest (django-q)
+    Progress is written per phase so admins can poll status and ETA
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    contest = models.ForeignKey(Contest, on_delete=models.CASCADE, related_name="ranking_jobs")
+    requested_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True, related_name="ranking_jobs")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    phase = models.CharField(max_length=20, blank=True, default="", help_text="loading / computing / writing")
+    processed = models.IntegerField(default=0, help_text="Items processed in the current phase")
+    total = models.IntegerField(default=0, help_text="Items in the current phase")
+    updated_participants = models.IntegerField(null=True, blank=True)
+    reset_freeze_snapshot = models.BooleanField(default=False, help_text="Drop the public freeze snapshot once rankings are recalculated")
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    phase_started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "contest_ranking_jobs"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["contest", "status"]),
+        ]
+
+    def __str__(self):
+        return f"Ranking job {self.id} of {self.contest_id} ({self.status})"
+
+
+class ContestProblemStats(models.Model):
+    """
+    First solver and cumulative solve curve of one problem in a contest
+    Maintained incrementally with ContestProblemResult (see ProblemStatsService),
+    so statistics and boards never scan submissions
+    """
+    id = models.BigAutoField(primary_key=True)
+    contest = models.ForeignKey(Contest, on_delete=models.CASCADE, related_name="problem_stats")
+    problem = models.ForeignKey('problems.Problem', on_delete=models.CASCADE, related_name="contest_stats")
+    solved_count = models.IntegerField(default=0, help_text="Active participants with an AC")
+    attempted_count = models.IntegerField(default=0, help_text="Active participants with a judged submission")
+    first_solver = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True, related_name="first_solves")
+    first_solved_at = models.DateTimeField(null=True, blank=True)
+    solve_timeline = models.JSONField(default=list, help_text="[[minute since start, cumulative solves], ...] ordered by minute")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "contest_problem_stats"
+        unique_together = ("contest", "problem")
+
+    def __str__(self):
+        return f"{self.contest_id} - {self.problem_id} (Solved: {self.solved_count})"
@@ -0,0 +1,244 @@
+"""
+First solver và đường cong số lượt giải theo thời gian của từng bài
+
+ContestProblemStats được cập nhật tăng dần cùng ContestProblemResult khi có verdict
+(apply_submission_result) và khi participant được (hủy) kích hoạt (apply_participants);
+rejudge hoặc tính lại toàn bộ thì dựng lại từ bảng ContestProblemResult (không đọc submissions).
+Đọc: O(số bài), một query.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ContestProblem, ContestProblemResult, ContestProblemStats
+
+
+class ProblemStatsService:
+    """Cập nhật và đọc ContestProblemStats"""
+
+    @staticmethod
+    def minute(contest, at):
+        return int((at - contest.start_at).total_seconds() // 60)
+
+    @staticmethod
+    def add_solve(timeline, minute):
+        """Thêm một lượt giải tại `minute` vào timeline [[minute, cumulative], ...] (sửa tại chỗ)"""
+        index = 0
+        while index < len(timeline) and timeline[index][0] < minute:
+            index += 1
+        if index < len(timeline) and timeline[index][0] == minute:
+            timeline[index][1] += 1
+            index += 1
+        else:
+            previous = timeline[index - 1][1] if index else 0
+            timeline.insert(index, [minute, previous + 1])
+            index += 1
+        # Lượt giải đến muộn (verdict trễ): cộng dồn cho các phút sau
+        for entry in timeline[index:]:
+            entry[1] += 1
+        return timeline
+
+    @staticmethod
+    def remove_solve(timeline, minute):
+        """Bỏ một lượt giải tại `minute` khỏi timeline (sửa tại chỗ), ngược với add_solve"""
+        index = 0
+        while index < len(timeline) and timeline[index][0] < minute:
+            index += 1
+        if index == len(timeline) or timeline[index][0] != minute:
+            return timeline
+        for entry in timeline[index:]:
+            entry[1] -= 1
+        previous = timeline[index - 1][1] if index else 0
+        if timeline[index][1] == previous:
+            del timeline[index]
+        return timeline
+
+    @staticmethod
+    def apply_participants(contest, participant_ids, active):
+        """
+        Cập nhật stats sau khi các participant được kích hoạt (active=True) hoặc hủy kích hoạt
+        Chỉ đọc result của chính các participant đó; bài mất first solver mới dựng lại từ result
+        """
+        if not participant_ids:
+            return
+        rows = defaultdict(list)
+        for problem_id, user_id, attempts, first_ac_at in ContestProblemResult.objects.filter(
+            contest=contest,
+            participant_id__in=participant_ids,
+            problem__contest_problems__contest=contest
+        ).exclude(attempts=0, first_ac_at__isnull=True).values_list(
+            'problem_id', 'participant__user_id', 'attempts', 'first_ac_at'
+        ):
+            rows[problem_id].append((user_id, attempts, first_ac_at))
+        if not rows:
+            return
+
+        sign = 1 if active else -1
+        with transaction.atomic():
+            existing = {
+                stats.problem_id: stats
+                for stats in ContestProblemStats.objects.select_for_update().filter(contest=contest, problem_id__in=rows)
+            }
+            for problem_id, problem_rows in rows.items():
+                stats = existing.get(problem_id)
+                if stats is None or (not active and stats.first_solver_id in {row[0] for row in problem_rows}):
+                    # Chưa có stats hoặc first solver bị hủy: dựng lại bài này từ result
+                    ProblemStatsService.rebuild_problem(contest, problem_id, stats)
+                    continue
+
+                for user_id, attempts, first_ac_at in problem_rows:
+                    if attempts:
+                        stats.attempted_count += sign
+                    if first_ac_at is None:
+                        continue
+                    stats.solved_count += sign
+                    minute = ProblemStatsService.minute(contest, first_ac_at)
+                    if active:
+                        ProblemStatsService.add_solve(stats.solve_timeline, minute)
+                        if stats.first_solved_at is None or first_ac_at < stats.first_solved_at:
+                            stats.first_solver_id = user_id
+                            stats.first_solved_at = first_ac_at
+                    else:
+                        ProblemStatsService.remove_solve(stats.solve_timeline, minute)
+                stats.save()
+
+    @staticmethod
+    def apply_result(contest, participant, before, result):
+        """
+        Cập nhật stats của bài sau khi result của một participant thay đổi
+        before: (attempts, first_ac_at) của result trước verdict
+        Gọi trong transaction của apply_submission_result
+        """
+        attempts_before, solved_before = before
+        if not participant.is_active:
+            return
+        if solved_before == result.first_ac_at and bool(attempts_before) == bool(result.attempts):
+            return
+
+        stats, created = ContestProblemStats.objects.select_for_update().get_or_create(
+            contest=contest,
+            problem_id=result.problem_id
+        )
+        if created or solved_before is not None:
+            # Chưa có stats (contest cũ) hoặc rejudge đổi lượt giải đã tính: dựng lại từ result
+            ProblemStatsService.rebuild_problem(contest, result.problem_id, stats)
+            return
+
+        if not attempts_before and result.attempts:
+            stats.attempted_count += 1
+        if result.first_ac_at is not None:
+            stats.solved_count += 1
+            ProblemStatsService.add_solve(stats.solve_timeline, ProblemStatsService.minute(contest, result.first_ac_at))
+            if stats.first_solved_at is None or result.first_ac_at < stats.first_solved_at:
+                stats.first_solver_id = participant.user_id
+                stats.first_solved_at = result.first_ac_at
+        stats.save()
+
+    @staticmethod
+    def _fill(contest, stats, rows):
+        """rows: [(user_id, attempts, first_ac_at), ...] của một bài"""
+        solves = sorted((first_ac_at, user_id) for user_id, _, first_ac_at in rows if first_ac_at is not None)
+        timeline = []
+        for first_ac_at, _ in solves:
+            minute = ProblemStatsService.minute(contest, first_ac_at)
+            if timeline and timeline[-1][0] == minute:
+                timeline[-1][1] += 1
+            else:
+                timeline.append([minute, (timeline[-1][1] if timeline else 0) + 1])
+
+        stats.solved_count = len(solves)
+        stats.attempted_count = sum(1 for _, attempts, _ in rows if attempts)
+        stats.first_solved_at, stats.first_solver_id = solves[0] if solves else (None, None)
+        stats.solve_timeline = timeline
+        return stats
+
+    @staticmethod
+    def _rows(contest, problem_ids=None):
+        queryset = ContestProblemResult.objects.filter(contest=contest, participant__is_active=True)
+        if problem_ids is not None:
+            queryset = queryset.filter(problem_id__in=problem_ids)
+        rows = defaultdict(list)
+        for row in queryset.values_list('problem_id', 'participant__user_id', 'attempts', 'first_ac_at').iterator(chunk_size=2000):
+            rows[row[0]].append(row[1:])
+        return rows
+
+    @staticmethod
+    def rebuild_problem(contest, problem_id, stats=None):
+        if stats is None:
+            stats, _ = ContestProblemStats.objects.get_or_create(contest=contest, problem_id=problem_id)
+        ProblemStatsService._fill(contest, stats, ProblemStatsService._rows(contest, [problem_id])[problem_id])
+        stats.save()
+        return stats
+
+    @staticmethod
+    def rebuild_contest(contest):
+        """Dựng lại stats cho mọi bài của contest (sau recalculate / thay đổi participant)"""
+        problem_ids = list(ContestProblem.objects.filter(contest=contest).values_list('problem_id', flat=True))
+        rows = ProblemStatsService._rows(contest, problem_ids)
+        existing = {stats.problem_id: stats for stats in ContestProblemStats.objects.filter(contest=contest)}
+
+        created = []
+        updated = []
+        for problem_id in problem_ids:
+            stats = existing.get(problem_id)
+            if stats is None:
+                created.append(ProblemStatsService._fill(contest, ContestProblemStats(contest=contest, problem_id=problem_id), rows[problem_id]))
+            else:
+                updated.append(ProblemStatsService._fill(contest, stats, rows[problem_id]))
+
+        ContestProblemStats.objects.filter(contest=contest).exclude(problem_id__in=problem_ids).delete()
+        ContestProblemStats.objects.bulk_create(created, batch_size=500)
+        ContestProblemStats.objects.bulk_update(
+            updated,
+            ['solved_count', 'attempted_count', 'first_solver', 'first_solved_at', 'solve_timeline'],
+            batch_size=500
+        )
+        return len(problem_ids)
+
+    @staticmethod
+    def payload(contest, include_frozen=False):
+        """
+        First solver và timeline của từng bài (theo label)
+        Trong thời gian freeze (không include_frozen) chỉ tính các lượt giải trước freeze
+        """
+        freeze_at = contest.freeze_rankings_at
+        if include_frozen or not freeze_at or timezone.now() >= contest.end_at:
+            freeze_at = None
+        freeze_minute = ProblemStatsService.minute(contest, freeze_at) if freeze_at else None
+
+        stats_by_problem = {
+            stats.problem_id: stats
+            for stats in ContestProblemStats.objects.filter(contest=contest).select_related('first_solver')
+        }
+
+        problems = []
+        for contest_problem in ContestProblem.objects.filter(contest=contest).order_by('label').values(
+            'problem_id', 'label'
+        ):
+            stats = stats_by_problem.get(contest_problem['problem_id'])
+            timeline = [list(entry) for entry in stats.solve_timeline] if stats else []
+            solved_count = stats.solved_count if stats else 0
+            first_solver = None
+
+            if freeze_minute is not None:
+                timeline = [entry for entry in timeline if entry[0] < freeze_minute]
+                solved_count = timeline[-1][1] if timeline else 0
+            if stats and stats.first_solver and (freeze_at is None or stats.first_solved_at < freeze_at):
+                first_solver = {
+                    'user_id': stats.first_solver.id,
+                    'username': stats.first_solver.username,
+                    'full_name': stats.first_solver.full_name or stats.first_solver.username,
+                    'solved_at': stats.first_solved_at,
+                    'minute': ProblemStatsService.minute(contest, stats.first_solved_at),
+                }
+
+            problems.append({
+                'problem_id': contest_problem['problem_id'],
+                'label': contest_problem['label'],
+                'solved_count': solved_count,
+                'attempted_count': stats.attempted_count if stats else 0,
+                'first_solver': first_solver,
+                'solve_timeline': timeline,
+            })
+        return problems
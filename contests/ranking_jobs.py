@@ -0,0 +1,172 @@
+"""
+Job tính lại ranking chạy nền (django-q) với tiến độ / ETA
+
+Request tạo ContestRankingJob và enqueue task, trả về ngay (202);
+task chạy ScoreboardEngine.recalculate và ghi tiến độ theo từng phase
+(loading submissions -> computing -> writing trong một transaction).
+Không enqueue được (broker lỗi): job giữ `queued`, task định kỳ
+run_queued_ranking_jobs chạy sau - không bao giờ tính lại trong request.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Contest, ContestRankingJob
+from .scoreboard import ScoreboardEngine
+
+logger = logging.getLogger(__name__)
+
+
+class RankingJobService:
+    """Tạo, chạy và báo tiến độ job tính lại ranking"""
+
+    ACTIVE_STATUSES = (ContestRankingJob.STATUS_QUEUED, ContestRankingJob.STATUS_RUNNING)
+    # Job queued lâu hơn N giây mà chưa chạy (task bị mất) được run_queued nhận
+    QUEUED_GRACE_SECONDS = 60
+
+    @staticmethod
+    def enqueue(contest, user=None, after_change=False, reset_freeze_snapshot=False):
+        """
+        Tạo job (hoặc trả về job đang chờ/chạy của contest) và đưa vào django-q
+        after_change: cấu hình contest (bài, cách tính điểm) vừa đổi - job đang chạy
+        đã đọc cấu hình cũ nên chỉ dùng lại job chưa bắt đầu
+        reset_freeze_snapshot: bỏ snapshot freeze công khai khi job xong (không bỏ trước,
+        user thường vẫn xem snapshot cũ trong lúc tính lại)
+
+        Returns: (ContestRankingJob, created)
+        """
+        # Khóa dòng contest: hai request đồng thời không tạo hai job
+        with transaction.atomic():
+            Contest.objects.select_for_update().filter(id=contest.id).values_list('id').first()
+
+            # Job quá timeout của qcluster: worker đã chết, cho phép tạo job mới
+            stale_before = timezone.now() - timedelta(seconds=settings.Q_CLUSTER['timeout'])
+            ContestRankingJob.objects.filter(
+                contest=contest,
+                status__in=RankingJobService.ACTIVE_STATUSES,
+                created_at__lt=stale_before
+            ).update(status=ContestRankingJob.STATUS_FAILED, error='Timed out', finished_at=timezone.now())
+
+            reusable = (ContestRankingJob.STATUS_QUEUED,) if after_change else RankingJobService.ACTIVE_STATUSES
+            job = ContestRankingJob.objects.filter(
+                contest=contest,
+                status__in=reusable
+            ).first()
+            if job is not None:
+                if reset_freeze_snapshot and not job.reset_freeze_snapshot:
+                    job.reset_freeze_snapshot = True
+                    job.save(update_fields=['reset_freeze_snapshot'])
+                return job, False
+
+            job = ContestRankingJob.objects.create(
+                contest=contest,
+                requested_by=user,
+                reset_freeze_snapshot=reset_freeze_snapshot
+            )
+
+        try:
+            from django_q.tasks import async_task
+            async_task('contests.tasks.recalculate_contest_rankings', job.id)
+        except Exception as e:
+            # Không enqueue được: job giữ `queued` cho run_queued_ranking_jobs
+            logger.warning(f"[Ranking Job] Failed to enqueue job {job.id}, left queued: {str(e)}")
+        return job, True
+
+    @staticmethod
+    def run_queued():
+        """Chạy các job queued quá QUEUED_GRACE_SECONDS (task enqueue lỗi hoặc bị mất)"""
+        queued_before = timezone.now() - timedelta(seconds=RankingJobService.QUEUED_GRACE_SECONDS)
+        job_ids = list(ContestRankingJob.objects.filter(
+            status=ContestRankingJob.STATUS_QUEUED,
+            created_at__lt=queued_before
+        ).order_by('id').values_list('id', flat=True))
+        return sum(1 for job_id in job_ids if RankingJobService.run(job_id) is not None)
+
+    @staticmethod
+    def run(job_id):
+        """Chạy job (gọi bởi task django-q)"""
+        job = ContestRankingJob.objects.select_related('contest').filter(id=job_id).first()
+        if job is None:
+            return None
+
+        # UPDATE có điều kiện status: task và run_queued không chạy cùng một job hai lần
+        now = timezone.now()
+        claimed = ContestRankingJob.objects.filter(
+            id=job.id,
+            status=ContestRankingJob.STATUS_QUEUED
+        ).update(
+            status=ContestRankingJob.STATUS_RUNNING,
+            started_at=now,
+            phase_started_at=now
+        )
+        if not claimed:
+            return None
+        state = {'phase': None}
+
+        def progress(phase, processed, total):
+            fields = {'phase': phase, 'processed': processed, 'total': total}
+            if phase != state['phase']:
+                state['phase'] = phase
+                fields['phase_started_at'] = timezone.now()
+            ContestRankingJob.objects.filter(id=job.id).update(**fields)
+
+        try:
+            contest = Contest.objects.get(id=job.contest_id)
+            updated = ScoreboardEngine(contest).recalculate(progress=progress)
+        except Exception as e:
+            logger.exception(f"[Ranking Job] Job {job.id} failed")
+            ContestRankingJob.objects.filter(id=job.id).update(
+                status=ContestRankingJob.STATUS_FAILED,
+                error=str(e),
+                finished_at=timezone.now()
+            )
+            return None
+
+        ContestRankingJob.objects.filter(id=job.id).update(
+            status=ContestRankingJob.STATUS_DONE,
+            phase='',
+            processed=updated,
+            total=updated,
+            updated_participants=updated,
+            finished_at=timezone.now()
+        )
+        # Job bắt đầu sau khi contest kết thúc: ranking đã mở băng
+        from .freeze_service import ContestFreezeService
+        ContestFreezeService.mark_unfrozen(contest.id, now)
+        if job.reset_freeze_snapshot:
+            # Snapshot tạo lại từ tổng vừa tính (process_due_contests / leaderboard)
+            ContestFreezeService.invalidate(contest.id)
+        logger.info(f"[Ranking Job] Contest {contest.slug}: {updated} participants recalculated")
+        return updated
+
+    @staticmethod
+    def status_payload(job):
+        """Trạng thái job cho API (kèm % và ETA của phase hiện tại)"""
+        percent = None
+        eta_seconds = None
+        if job.status == ContestRankingJob.STATUS_DONE:
+            percent = 100
+        elif job.total:
+            percent = round(job.processed * 100 / job.total, 1)
+            if job.processed and job.phase_started_at:
+                elapsed = (timezone.now() - job.phase_started_at).total_seconds()
+                eta_seconds = int(elapsed / job.processed * (job.total - job.processed))
+
+        return {
+            'job_id': job.id,
+            'contest_id': job.contest_id,
+            'status': job.status,
+            'phase': job.phase,
+            'processed': job.processed,
+            'total': job.total,
+            'percent': percent,
+            'eta_seconds': eta_seconds,
+            'updated_participants': job.updated_participants,
+            'error': job.error,
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at,
+        }
@@ -1,7 +1,9 @@
 """
 Service for calculating and updating contest rankings
 """
-from django.db.models import Q, Count, Sum, Max, Min, F
+from django.db import connection
+from django.db.models import Q, Count, Sum, Max, Min, F, Window
+from django.db.models.functions import Rank, RowNumber
 from django.utils import timezone
 from decimal import Decimal
 from .models import Contest, ContestParticipant, ContestProblem
@@ -10,6 +12,9 @@ from problems.models import Submissions
 
 class ContestRankingService:
     """Service to calculate and update contest rankings"""
+
+    # Contest fields the stored standings (ContestParticipant, ContestProblemResult) depend on
+    SCORING_FIELDS = ('contest_mode', 'penalty_time', 'freeze_rankings_at', 'start_at', 'end_at')
     
     @staticmethod
     def update_user_ranking(contest_id, user_id):
@@ -72,7 +77,17 @@ class ContestRankingService:
             submitted_at__lte=contest.end_at
         ).order_by('-submitted_at').first()
         
+        # Distinct problems with a judged submission
+        from problems.judging_service import IN_FLIGHT_STATUSES
+        attempted_count = Submissions.objects.filter(
+            contest=contest,
+            user=user,
+            submitted_at__gte=contest.start_at,
+            submitted_at__lte=contest.end_at
+        ).exclude(status__in=IN_FLIGHT_STATUSES).values('problem').distinct().count()
+        
         participant.solved_count = solved_count
+        participant.attempted_count = attempted_count
         participant.total_score = Decimal(solved_count)  # Score = number of solved problems
         participant.penalty_seconds = 0  # No penalty in practice mode
         participant.last_submission_at = last_submission.submitted_at if last_submission else None
@@ -95,7 +110,7 @@ class ContestRankingService:
         contest_problems = ContestProblem.objects.filter(contest=contest)
         
         solved_count = 0
-        total_penalty_minutes = 0
+        total_penalty_seconds = 0
         last_submission_time = None
         
         # Determine if we should apply freeze
@@ -132,8 +147,8 @@ class ContestRankingService:
             if first_ac:
                 solved_count += 1
                 
-                # Calculate time from contest start to AC (in minutes)
-                time_to_ac = (first_ac.submitted_at - contest.start_at).total_seconds() / 60
+                # Calculate time from contest start to AC (in whole seconds)
+                time_to_ac = int((first_ac.submitted_at - contest.start_at).total_seconds())
                 
                 # Count wrong submissions before first AC (only unfrozen during freeze, all after contest)
                 wrong_count = unfrozen_submissions.filter(
@@ -143,8 +158,8 @@ class ContestRankingService:
                 ).count()
                 
                 # Calculate penalty for this problem
-                problem_penalty = time_to_ac + (wrong_count * contest.penalty_time)
-                total_penalty_minutes += problem_penalty
+                problem_penalty = time_to_ac + (wrong_count * contest.penalty_time * 60)
+                total_penalty_seconds += problem_penalty
             
             # Track last submission (only unfrozen during freeze, all after contest)
             last_sub = unfrozen_submissions.last() if should_apply_freeze else submissions.last()
@@ -153,7 +168,7 @@ class ContestRankingService:
         
         participant.solved_count = solved_count
         participant.total_score = Decimal(solved_count)
-        participant.penalty_seconds = int(total_penalty_minutes * 60)  # Convert to seconds
+        participant.penalty_seconds = total_penalty_seconds
         participant.last_submission_at = last_submission_time
     
     @staticmethod
@@ -210,7 +225,8 @@ class ContestRankingService:
                 if computed > best_score_for_problem:
                     best_score_for_problem = computed
 
-            # Accumulate the best score for this problem
+            # Accumulate the best score for this problem (rounded like ContestProblemResult.best_score)
+            best_score_for_problem = best_score_for_problem.quantize(Decimal('0.01'))
             total_score += best_score_for_problem
 
             # Count as solved if achieved full points for the problem
@@ -226,7 +242,9 @@ class ContestRankingService:
     def get_contest_leaderboard(contest_id):
         """
         Get full leaderboard for a contest
-        Returns list of participants with ranking info
+        Returns list of participants with ranking info, annotated with
+        `rank` (RANK() over the standing keys, ties share a rank) and
+        `position` (ROW_NUMBER() in display order)
         """
         from contests.models import Contest, ContestParticipant
         
@@ -236,64 +254,47 @@ class ContestRankingService:
             return []
         
         # Get all active participants for this contest
+        participants = ContestParticipant.objects.filter(
+            contest=contest,
+            is_active=True
+        ).select_related('user', 'contest')
+
         if contest.slug == 'practice':
-            # Practice: order by solved_count desc, submissions asc, then name asc
-            participants = ContestParticipant.objects.filter(
-                contest=contest,
-                is_active=True
-            ).select_related('user', 'contest').annotate(
-                submissions_count=Count(
-                    'user__submissions__problem',
-                    filter=(
-                        Q(user__submissions__contest=contest) &
-                        Q(user__submissions__submitted_at__gte=contest.start_at) &
-                        Q(user__submissions__submitted_at__lte=contest.end_at)
-                    ),
-                    distinct=True
-                )
-            ).order_by(
-                '-solved_count',
-                'submissions_count',
-                'user__full_name',
-                'user__username'
-            )
-        elif contest.contest_mode == 'ICPC':
-            # ICPC: order by solved_count desc, penalty_seconds asc, last_submission_at asc
-            participants = ContestParticipant.objects.filter(
-                contest=contest,
-                is_active=True
-            ).select_related('user', 'contest').order_by(
-                '-solved_count',
-                'penalty_seconds',
-                'last_submission_at'
-            )
+            # Practice: order by solved_count desc, attempted problems asc, then name asc
+            # attempted_count is a stored counter maintained on each verdict
+            rank_keys = [F('solved_count').desc(), F('attempted_count').asc()]
+            tiebreak = [F('user__full_name').asc(), F('user__username').asc()]
         elif contest.contest_mode == 'OI':
             # OI: order by total_score desc, last_submission_at asc
-            participants = ContestParticipant.objects.filter(
-                contest=contest,
-                is_active=True
-            ).select_related('user', 'contest').order_by(
-                '-total_score',
-                'last_submission_at'
-            )
-            for participant in participants:
-                ContestRankingService.update_user_ranking(contest_id, participant.user.id)
+            # Scores are kept current by apply_submission_result, reads never write
+            rank_keys = [F('total_score').desc()]
+            tiebreak = [F('last_submission_at').asc(), F('id').asc()]
         else:
-            participants = ContestParticipant.objects.filter(
-                contest=contest,
-                is_active=True
-            ).select_related('user', 'contest').order_by(
-                '-solved_count',
-                'penalty_seconds'
-            )
-        
-        return participants
+            # ICPC: order by solved_count desc, penalty_seconds asc, last_submission_at asc
+            rank_keys = [F('solved_count').desc(), F('penalty_seconds').asc()]
+            tiebreak = [F('last_submission_at').asc(), F('id').asc()]
+
+        return participants.annotate(
+            rank=Window(expression=Rank(), order_by=rank_keys),
+            position=Window(expression=RowNumber(), order_by=rank_keys + tiebreak)
+        ).order_by(*(rank_keys + tiebreak))
     
     @staticmethod
     def get_user_problem_details(contest_id, user_id):
         """
         Get detailed submission info for each problem in the contest for a user
         Used for ICPC leaderboard display
+        Reads ContestProblemResult rows (one query), no per-problem submission queries
+
+        Returns dict: {problem_id: {...}} (same format as _calculate_user_problem_details)
+        """
+        return ContestRankingService.get_all_problem_details(contest_id, [user_id]).get(user_id, {})
+
+    @staticmethod
+    def _calculate_user_problem_details(contest_id, user_id):
+        """
+        Compute problem details of a user directly from submissions
+        (reference implementation, used by benchmark_scoreboard)
         
         Returns dict: {
             problem_id: {
@@ -407,28 +408,350 @@ class ContestRankingService:
         
         return problem_details
     
+    @staticmethod
+    def get_all_problem_details(contest_id, user_ids=None):
+        """
+        Get problem details of many users from ContestProblemResult in one query
+        (same cell format as get_user_problem_details)
+
+        Returns dict: {user_id: {problem_id: {...}}}
+        (all given user_ids, or every user with a result if user_ids is None)
+        """
+        from contests.models import Contest, ContestProblemResult
+        from .scoreboard import ScoreboardEngine
+
+        try:
+            contest = Contest.objects.get(id=contest_id)
+        except Contest.DoesNotExist:
+            return {}
+
+        engine = ScoreboardEngine(contest)
+        results = ContestProblemResult.objects.filter(
+            contest=contest,
+            problem_id__in=list(engine.problems)
+        ).annotate(user_id=F('participant__user_id'))
+        if user_ids is not None:
+            results = results.filter(participant__user_id__in=user_ids)
+
+        results_by_user = {user_id: {} for user_id in (user_ids or [])}
+        for result in results:
+            results_by_user.setdefault(result.user_id, {})[result.problem_id] = result
+
+        return {
+            user_id: engine.problem_cells(user_results)
+            for user_id, user_results in results_by_user.items()
+        }
+
+    @staticmethod
+    def apply_submission_result(submission):
+        """
+        Incrementally update ranking after a submission got its verdict
+
+        Only the (participant, problem) ContestProblemResult row and the participant totals
+        are touched: the new submission is folded into the row and the totals are adjusted
+        by the difference of the row's contribution. The first verdict on a problem,
+        out-of-order verdicts (older than the newest counted submission) and rejudges
+        rebuild just that row from its submissions.
+
+        Returns: updated ContestParticipant or None
+        """
+        from django.db import transaction
+        from contests.models import ContestProblemResult
+        from problems.judging_service import IN_FLIGHT_STATUSES
+        from .scoreboard import ScoreboardEngine
+        from .problem_stats import ProblemStatsService
+
+        contest = submission.contest
+        if (contest is None
+                or submission.status in IN_FLIGHT_STATUSES
+                or not (contest.start_at <= submission.submitted_at <= contest.end_at)):
+            return None
+
+        engine = ScoreboardEngine(contest)
+        if not engine.tracks_problem(submission.problem_id):
+            return None
+        row = engine.submission_row(submission)
+
+        with transaction.atomic():
+            # Same lock as ScoreboardEngine.recalculate (the version bump below locks this row anyway)
+            Contest.objects.select_for_update().filter(id=contest.id).values_list('id').first()
+            participant, _ = ContestParticipant.objects.select_for_update().get_or_create(
+                contest=contest,
+                user_id=submission.user_id,
+                defaults={'is_active': True}
+            )
+            result = ContestProblemResult.objects.select_for_update().filter(
+                participant=participant,
+                problem_id=submission.problem_id
+            ).first()
+
+            before = engine.contribution(result)
+            attempted_before = engine.attempted(result)
+            solve_before = (result.attempts, result.first_ac_at) if result is not None else (0, None)
+            if result is not None and result.last_submission_at and row['submitted_at'] > result.last_submission_at:
+                engine.add_submission(result, row)
+            else:
+                # First verdict on this problem, out-of-order verdict or rejudge
+                if result is None:
+                    result = engine.new_result(submission.problem_id, participant)
+                engine.reset_result(result)
+                submissions = engine.submissions_queryset().filter(
+                    user_id=submission.user_id,
+                    problem_id=submission.problem_id
+                ).order_by('submitted_at', 'id').values(*engine.SUBMISSION_FIELDS)
+                for sub in submissions:
+                    engine.add_submission(result, sub)
+            result.save()
+            if submission.problem_id in engine.problems:
+                ProblemStatsService.apply_result(contest, participant, solve_before, result)
+
+            if ContestRankingService._totals_outdated(participant, contest, engine.now):
+                # Freeze was lifted since the totals were computed: sum all rows again
+                totals = engine.standing(
+                    ContestProblemResult.objects.filter(participant=participant)
+                )
+            else:
+                totals = {
+                    'solved_count': participant.solved_count,
+                    'total_score': participant.total_score,
+                    'penalty_seconds': participant.penalty_seconds,
+                    'last_submission_at': participant.last_submission_at,
+                    'attempted_count': participant.attempted_count + engine.attempted(result) - attempted_before,
+                }
+                engine.add_contribution(totals, before, sign=-1)
+                engine.add_contribution(totals, engine.contribution(result))
+
+            for field, value in totals.items():
+                setattr(participant, field, value)
+            participant.save(update_fields=list(totals) + ['ranking_updated_at'])
+            ContestRankingService.bump_standings_version(contest.id)
+
+        if engine.freeze_time and submission.submitted_at < engine.freeze_time:
+            # Late verdict for a pre-freeze submission: the public frozen snapshot is stale
+            from .freeze_service import ContestFreezeService
+            ContestFreezeService.invalidate(contest.id)
+
+        return participant
+
+    @staticmethod
+    def _totals_outdated(participant, contest, now):
+        """Totals computed during freeze must be rebuilt once the contest has ended"""
+        return bool(
+            contest.freeze_rankings_at
+            and participant.ranking_updated_at
+            and participant.ranking_updated_at < contest.end_at <= now
+        )
+
     @staticmethod
     def recalculate_all_rankings(contest_id):
         """
         Recalculate rankings for all participants in a contest
         Useful for manual recalculation or fixing inconsistencies
+
+        Reads all contest submissions once (ScoreboardEngine) and saves with bulk_update
         """
-        from contests.models import Contest, ContestParticipant
+        from contests.models import Contest
+        from .scoreboard import ScoreboardEngine
         
         try:
             contest = Contest.objects.get(id=contest_id)
         except Contest.DoesNotExist:
             return 0
         
-        # Get all active participants
-        participants = ContestParticipant.objects.filter(
-            contest=contest,
-            is_active=True
-        )
+        return ScoreboardEngine(contest).recalculate()
+
+    @staticmethod
+    def bump_standings_version(contest_id):
+        """Mark the leaderboard snapshot of a contest as outdated"""
+        Contest.objects.filter(id=contest_id).update(standings_version=F('standings_version') + 1)
+
+    @staticmethod
+    def leaderboard_etag(contest, now=None):
+        """
+        ETag of the leaderboard snapshot
+        Changes when standings change (standings_version), the contest is edited
+        (updated_at) or the freeze is lifted at contest end
+        """
+        now = now or timezone.now()
+        frozen = bool(contest.freeze_rankings_at and now < contest.end_at)
+        updated = int(contest.updated_at.timestamp() * 1000000) if contest.updated_at else 0
+        return f"{contest.id}-{contest.standings_version}-{updated}-{'f' if frozen else 'u'}"
+
+    @staticmethod
+    def get_leaderboard_snapshot(contest, page=None, page_size=None, around_user=None, window=None):
+        """
+        Get leaderboard payload from cache, rebuilding it only when the ETag changed
+
+        - default: full leaderboard
+        - page/page_size: one page of the leaderboard
+        - around_user/window: rank of a user and the `window` rows above and below it
+
+        Returns: (payload dict, etag)
+        """
+        from django.conf import settings
+        from django.core.cache import cache
+
+        etag = ContestRankingService.leaderboard_etag(contest)
+        if around_user is not None:
+            cache_key = f"contest_leaderboard:{etag}:around:{around_user}:{window}"
+            build = lambda: ContestRankingService.build_leaderboard_window(contest, around_user, window)
+        elif page is not None:
+            cache_key = f"contest_leaderboard:{etag}:page:{page}:{page_size}"
+            build = lambda: ContestRankingService.build_leaderboard_page(contest, page, page_size)
+        else:
+            cache_key = f"contest_leaderboard:{etag}"
+            build = lambda: ContestRankingService.build_leaderboard(contest)
+
+        payload = cache.get(cache_key)
+        if payload is None:
+            payload = build()
+            cache.set(cache_key, payload, settings.LEADERBOARD_CACHE_SECONDS)
+        return payload, etag
+
+    @staticmethod
+    def build_leaderboard_page(contest, page, page_size):
+        """Build one page of the leaderboard (offset pagination on the ranked query)"""
+        participants = ContestRankingService.get_contest_leaderboard(contest.id)
+        total = ContestParticipant.objects.filter(contest=contest, is_active=True).count()
+        offset = (page - 1) * page_size
+
+        payload = ContestRankingService.build_leaderboard(contest, participants[offset:offset + page_size])
+        payload.update({
+            'total_participants': total,
+            'page': page,
+            'page_size': page_size,
+            'total_pages': (total + page_size - 1) // page_size if total > 0 else 0
+        })
+        return payload
+
+    @staticmethod
+    def build_leaderboard_window(contest, user_id, window):
+        """Build the rows around a user: the user's rank and the `window` rows above and below"""
+        participants = ContestRankingService.get_contest_leaderboard(contest.id)
+        total = ContestParticipant.objects.filter(contest=contest, is_active=True).count()
+
+        current = ContestRankingService._leaderboard_position(participants, user_id)
+        if current is None:
+            rows = []
+        else:
+            rows = participants.filter(
+                position__gte=current['position'] - window,
+                position__lte=current['position'] + window
+            )
+
+        payload = ContestRankingService.build_leaderboard(contest, rows)
+        payload.update({
+            'total_participants': total,
+            'around_user': user_id,
+            'window': window,
+            'user_rank': current['rank'] if current else None,
+            'user_position': current['position'] if current else None
+        })
+        return payload
+
+    @staticmethod
+    def _leaderboard_position(participants, user_id):
+        """
+        {'rank', 'position'} of a user in the ranked queryset, or None
+        The ranked query is wrapped as a derived table: filtering by user_id on the
+        queryset itself would apply before the window functions (always rank 1)
+        """
+        sql, params = participants.values('user_id', 'rank', 'position').query.sql_with_params()
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT ranked.{quote('rank')}, ranked.{quote('position')} FROM ({sql}) ranked "
+                f"WHERE ranked.{quote('user_id')} = %s",
+                [*params, user_id]
+            )
+            row = cursor.fetchone()
+        return {'rank': row[0], 'position': row[1]} if row else None
+
+    @staticmethod
+    def build_leaderboard(contest, participants=None):
+        """
+        Build the leaderboard payload of a contest (problems, entries, cells)
+        participants: ranked participants to include (default: all)
+        """
+        contest_id = contest.id
+
+        # Get contest problems for column headers
+        contest_problems = ContestProblem.objects.filter(
+            contest=contest
+        ).select_related('problem').order_by('label')
+        
+        # First solver badge and solve count per problem (precomputed, freeze applied)
+        from .problem_stats import ProblemStatsService
+        solve_stats = {item['problem_id']: item for item in ProblemStatsService.payload(contest)}
+
+        problem_list = [{
+            'id': cp.problem.id,
+            'label': cp.label,
+            'alias': cp.alias,
+            'point': cp.point,
+            'title': cp.problem.title,
+            'color': cp.color or '',
+            'rgb': cp.rgb or '',
+            'solved_count': solve_stats.get(cp.problem.id, {}).get('solved_count', 0),
+            'first_solver_id': (solve_stats.get(cp.problem.id, {}).get('first_solver') or {}).get('user_id')
+        } for cp in contest_problems]
+        
+        # Get rankings
+        if participants is None:
+            participants = ContestRankingService.get_contest_leaderboard(contest_id)
+        participants = list(participants)
+
+        # Get problem details for all users in one pass (for ICPC mode)
+        all_problem_details = {}
+        if contest.contest_mode == 'ICPC' or contest.slug == 'practice':
+            all_problem_details = ContestRankingService.get_all_problem_details(
+                contest_id,
+                [participant.user_id for participant in participants]
+            )
+
+        # Build leaderboard entries
+        leaderboard_data = []
         
-        count = 0
         for participant in participants:
-            ContestRankingService.update_user_ranking(contest_id, participant.user.id)
-            count += 1
+            problem_details = all_problem_details.get(participant.user_id, {})
+            
+            # Get full name
+            full_name = participant.user.full_name if participant.user.full_name else participant.user.username
+            
+            # Get avatar URL properly
+            avatar_url = None
+            if participant.user.avatar_url:
+                avatar_url = participant.user.avatar_url.url if hasattr(participant.user.avatar_url, 'url') else str(participant.user.avatar_url)
+            
+            # Attempted problems (distinct problems with a judged submission), practice only
+            attempted_count = participant.attempted_count if contest.slug == 'practice' else None
+
+            entry = {
+                'rank': participant.rank,
+                'position': participant.position,
+                'user_id': participant.user.id,
+                'username': participant.user.username,
+                'full_name': full_name,
+                'avatar_url': avatar_url,
+                'solved_count': participant.solved_count,
+                'total_score': float(participant.total_score),
+                'penalty_seconds': participant.penalty_seconds,
+                'penalty_minutes': participant.penalty_seconds // 60,
+                'last_submission_at': participant.last_submission_at,
+                'problems': problem_details,
+                'attempted_count': attempted_count
+            }
+            
+            leaderboard_data.append(entry)
         
-        return count
+        return {
+            'contest_id': contest.id,
+            'contest_slug': contest.slug,
+            'contest_title': contest.title,
+            'contest_mode': contest.contest_mode,
+            'penalty_time': contest.penalty_time,
+            'version': contest.standings_version,
+            'problems': problem_list,
+            'leaderboard': leaderboard_data,
+            'total_participants': len(leaderboard_data)
+        }
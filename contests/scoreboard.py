@@ -0,0 +1,387 @@
+"""
+Scoreboard engine: tính bảng xếp hạng của cả contest trong một lần đọc
+
+Thay vì 3-4 query cho mỗi (user, problem) như update_user_ranking, engine
+đọc toàn bộ submissions của contest một lần (values(), theo thứ tự thời gian),
+gộp thành ContestProblemResult cho từng (participant, problem) rồi tính
+solved/penalty/score và ô của từng bài trong bộ nhớ.
+
+Cùng một phép gộp được dùng để cập nhật tăng dần khi có verdict mới
+(ContestRankingService.apply_submission_result).
+Luật tính giống ContestRankingService (freeze, penalty, OI best score).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Contest, ContestParticipant, ContestProblem, ContestProblemResult
+from .problem_stats import ProblemStatsService
+from problems.models import Submissions
+from problems.judging_service import IN_FLIGHT_STATUSES
+
+
+# Collation MySQL không phân biệt hoa thường: 'ac', 'AC', 'correct' đều là AC
+AC_STATUSES = ('ac', 'correct')
+
+SCORE_PRECISION = Decimal('0.01')
+
+
+def is_accepted(status):
+    return (status or '').lower() in AC_STATUSES
+
+
+class ScoreboardEngine:
+    """Tính ranking và chi tiết từng bài cho mọi participant của một contest"""
+
+    SUBMISSION_FIELDS = (
+        'id', 'user_id', 'problem_id', 'status', 'submitted_at',
+        'score', 'test_passed', 'test_total',
+    )
+    PROGRESS_EVERY = 2000
+
+    PARTICIPANT_FIELDS = ['solved_count', 'total_score', 'penalty_seconds',
+                          'last_submission_at', 'attempted_count', 'ranking_updated_at']
+    # Lệch đồng hồ giữa các server khi so ranking_updated_at
+    RECHECK_MARGIN = timedelta(seconds=5)
+
+    def __init__(self, contest, now=None):
+        self.contest = contest
+        self.now = now or timezone.now()
+
+        # Freeze chỉ áp dụng khi contest đang diễn ra
+        freeze_time = contest.freeze_rankings_at
+        self.freeze_time = freeze_time if freeze_time and self.now < contest.end_at else None
+
+        self.problems = {
+            problem['problem_id']: problem
+            for problem in ContestProblem.objects.filter(contest=contest).order_by('label').values(
+                'problem_id', 'label', 'point'
+            )
+        }
+
+    # ------------------------------------------------------------------
+    # Đọc submissions
+    # ------------------------------------------------------------------
+
+    def submissions_queryset(self):
+        """Submissions đã có verdict trong thời gian contest"""
+        return Submissions.objects.filter(
+            contest=self.contest,
+            submitted_at__gte=self.contest.start_at,
+            submitted_at__lte=self.contest.end_at
+        ).exclude(status__in=IN_FLIGHT_STATUSES)
+
+    def load_submissions(self, user_ids=None, progress=None):
+        """
+        Đọc submissions của contest một lần, nhóm theo user -> problem
+        progress: callback(phase, processed, total) (optional)
+
+        Returns: {user_id: {problem_id: [submission dict, ...]}} (tăng dần theo thời gian)
+        """
+        queryset = self.submissions_queryset()
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=user_ids)
+
+        total = 0
+        if progress:
+            total = queryset.count()
+            progress('loading', 0, total)
+        grouped = defaultdict(lambda: defaultdict(list))
+        rows = queryset.order_by('submitted_at', 'id').values(*self.SUBMISSION_FIELDS).iterator(chunk_size=2000)
+        for count, row in enumerate(rows, start=1):
+            grouped[row['user_id']][row['problem_id']].append(row)
+            if progress and count % self.PROGRESS_EVERY == 0:
+                progress('loading', count, total)
+        return grouped
+
+    @classmethod
+    def submission_row(cls, submission):
+        """Submission instance -> dict cùng format với load_submissions"""
+        return {field: getattr(submission, field) for field in cls.SUBMISSION_FIELDS}
+
+    # ------------------------------------------------------------------
+    # Gộp submissions thành ContestProblemResult
+    # ------------------------------------------------------------------
+
+    def new_result(self, problem_id, participant=None):
+        return ContestProblemResult(contest=self.contest, participant=participant, problem_id=problem_id)
+
+    def add_submission(self, result, sub):
+        """
+        Gộp một submission vào result
+        Chỉ đúng khi sub mới hơn mọi submission đã gộp (theo submitted_at)
+        """
+        submitted_at = sub['submitted_at']
+        freeze_at = self.contest.freeze_rankings_at
+
+        result.attempts += 1
+        if freeze_at and submitted_at >= freeze_at:
+            result.frozen_attempts += 1
+        else:
+            result.last_unfrozen_submission_at = submitted_at
+
+        result.last_submission_at = submitted_at
+        result.last_score = sub['score']
+        result.last_test_passed = sub['test_passed']
+        result.last_test_total = sub['test_total']
+
+        if result.first_ac_at is None:
+            if is_accepted(sub['status']):
+                result.first_ac_at = submitted_at
+                result.ac_score = sub['score']
+                result.ac_test_passed = sub['test_passed']
+                result.ac_test_total = sub['test_total']
+            else:
+                result.wrong_attempts += 1
+
+        problem = self.problems.get(sub['problem_id'])
+        passed, total = sub['test_passed'], sub['test_total']
+        if problem and passed is not None and total not in (None, 0):
+            max_points = Decimal(problem['point'] or 100)
+            computed = (Decimal(passed) / Decimal(total) * max_points).quantize(SCORE_PRECISION)
+            if computed > result.best_score:
+                result.best_score = computed
+        return result
+
+    def reset_result(self, result):
+        """Xóa trạng thái đã gộp (giữ khóa) để gộp lại từ đầu"""
+        fresh = self.new_result(result.problem_id)
+        for field in ContestProblemResult._meta.concrete_fields:
+            if field.name not in ('id', 'contest', 'participant', 'problem', 'updated_at'):
+                setattr(result, field.attname, getattr(fresh, field.attname))
+        return result
+
+    def tracks_problem(self, problem_id):
+        """Có lưu ContestProblemResult cho bài này không (practice: mọi bài)"""
+        return self.contest.slug == 'practice' or problem_id in self.problems
+
+    def build_results(self, by_problem):
+        """{problem_id: [submission dict, ...]} -> {problem_id: ContestProblemResult} (chưa lưu)"""
+        results = {}
+        for problem_id, submissions in by_problem.items():
+            if not self.tracks_problem(problem_id):
+                continue
+            result = self.new_result(problem_id)
+            for sub in submissions:
+                self.add_submission(result, sub)
+            results[problem_id] = result
+        return results
+
+    # ------------------------------------------------------------------
+    # Tính standing và ô leaderboard từ ContestProblemResult
+    # ------------------------------------------------------------------
+
+    def _visible(self, result):
+        """(số lần nộp không đóng băng, số lần nộp đóng băng, AC có hiển thị không)"""
+        if self.freeze_time is None:
+            return result.attempts, 0, result.first_ac_at is not None
+        unfrozen = result.attempts - result.frozen_attempts
+        accepted = result.first_ac_at is not None and result.first_ac_at < self.freeze_time
+        return unfrozen, result.frozen_attempts, accepted
+
+    def _ac_seconds(self, result):
+        return int((result.first_ac_at - self.contest.start_at).total_seconds())
+
+    def contribution(self, result):
+        """
+        Đóng góp của một result vào tổng của participant
+
+        Returns: (solved, score, penalty_seconds, last_submission_at)
+        """
+        if result is None:
+            return 0, Decimal(0), 0, None
+
+        if self.contest.slug == 'practice':
+            # Practice tính mọi bài đã AC (kể cả bài không nằm trong ContestProblem), không freeze
+            solved = 1 if result.first_ac_at else 0
+            return solved, Decimal(solved), 0, result.last_submission_at
+
+        problem = self.problems.get(result.problem_id)
+        if problem is None:
+            return 0, Decimal(0), 0, None
+
+        if self.contest.contest_mode == 'OI':
+            max_points = Decimal(problem['point'] or 100)
+            solved = 1 if result.best_score >= max_points else 0
+            return solved, result.best_score, 0, result.last_submission_at
+
+        _, _, accepted = self._visible(result)
+        last_at = result.last_unfrozen_submission_at if self.freeze_time else result.last_submission_at
+        if not accepted:
+            return 0, Decimal(0), 0, last_at
+        penalty = self._ac_seconds(result) + result.wrong_attempts * self.contest.penalty_time * 60
+        return 1, Decimal(1), penalty, last_at
+
+    def standing(self, results):
+        """Tổng solved/score/penalty/last/attempted của một participant từ các result"""
+        totals = {
+            'solved_count': 0,
+            'total_score': Decimal(0),
+            'penalty_seconds': 0,
+            'last_submission_at': None,
+            'attempted_count': 0,
+        }
+        for result in results:
+            self.add_contribution(totals, self.contribution(result))
+            totals['attempted_count'] += self.attempted(result)
+        return totals
+
+    def attempted(self, result):
+        """1 nếu result được tính là một bài đã thử (có submission đã chấm), ngược lại 0"""
+        if result is None or not result.attempts:
+            return 0
+        return 1 if self.contest.slug == 'practice' or result.problem_id in self.problems else 0
+
+    @staticmethod
+    def add_contribution(totals, contribution, sign=1):
+        """Cộng (sign=1) hoặc trừ (sign=-1) đóng góp của một result vào totals"""
+        solved, score, penalty, last_at = contribution
+        totals['solved_count'] += sign * solved
+        totals['total_score'] += sign * score
+        totals['penalty_seconds'] += sign * penalty
+        # last_submission_at chỉ tăng
+        if sign > 0 and last_at and (not totals['last_submission_at'] or last_at > totals['last_submission_at']):
+            totals['last_submission_at'] = last_at
+
+    def problem_cell(self, problem, result):
+        """Ô của một bài trên leaderboard (cùng format với get_user_problem_details)"""
+        if result is None or not result.attempts:
+            return {
+                'problem_label': problem['label'],
+                'status': None,
+                'attempts': 0,
+                'frozen_attempts': 0,
+                'time_minutes': None,
+                'penalty': 0,
+                'score': None,
+                'test_passed': None,
+                'test_total': None
+            }
+
+        unfrozen, frozen, accepted = self._visible(result)
+
+        if accepted:
+            time_to_ac_minutes = int(self._ac_seconds(result) / 60)
+            return {
+                'problem_label': problem['label'],
+                'status': 'AC',
+                'attempts': unfrozen,
+                'frozen_attempts': frozen,
+                'wrong_attempts': result.wrong_attempts,
+                'time_minutes': time_to_ac_minutes,
+                'penalty': time_to_ac_minutes + (result.wrong_attempts * self.contest.penalty_time),
+                'score': result.ac_score,
+                'test_passed': result.ac_test_passed,
+                'test_total': result.ac_test_total
+            }
+
+        return {
+            'problem_label': problem['label'],
+            'status': 'WA' if unfrozen else 'pending',
+            'attempts': unfrozen,
+            'frozen_attempts': frozen,
+            'wrong_attempts': unfrozen,
+            'time_minutes': None,
+            'penalty': 0,
+            'score': result.last_score if self.contest.contest_mode == 'OI' else None,
+            'test_passed': result.last_test_passed,
+            'test_total': result.last_test_total
+        }
+
+    def problem_cells(self, results_by_problem):
+        """{problem_id: result} -> {problem_id: cell} cho mọi bài của contest (theo label)"""
+        return {
+            problem_id: self.problem_cell(problem, results_by_problem.get(problem_id))
+            for problem_id, problem in self.problems.items()
+        }
+
+    # ------------------------------------------------------------------
+    # Tính lại toàn bộ
+    # ------------------------------------------------------------------
+
+    def build(self, user_ids=None, progress=None):
+        """
+        Tính bảng xếp hạng từ submissions
+
+        Returns: {user_id: {'solved_count', 'total_score', 'penalty_seconds',
+                            'last_submission_at', 'problems': {problem_id: cell},
+                            'results': {problem_id: ContestProblemResult}}}
+        Nếu truyền user_ids: có đủ mọi user (kể cả chưa nộp bài), ngược lại chỉ user đã nộp bài.
+        """
+        grouped = self.load_submissions(user_ids, progress=progress)
+        if user_ids is None:
+            user_ids = list(grouped)
+
+        if progress:
+            progress('computing', 0, len(user_ids))
+        standings = {}
+        for count, user_id in enumerate(user_ids, start=1):
+            results = self.build_results(grouped.get(user_id, {}))
+            standing = self.standing(results.values())
+            standing['problems'] = self.problem_cells(results)
+            standing['results'] = results
+            standings[user_id] = standing
+            if progress and count % self.PROGRESS_EVERY == 0:
+                progress('computing', count, len(user_ids))
+        return standings
+
+    def recalculate(self, participants=None, progress=None):
+        """
+        Tính lại và lưu ranking + ContestProblemResult cho participants
+        (mặc định: mọi participant active) bằng một lần đọc submissions và bulk write
+        trong một transaction
+        progress: callback(phase, processed, total) cho job chạy nền (optional)
+
+        Phần đọc chạy ngoài transaction. Phần ghi khóa dòng contest (như
+        apply_submission_result) rồi tính lại các participant có verdict mới
+        được áp dụng trong lúc đọc, để không ghi đè kết quả của chúng.
+
+        Returns: số participant đã cập nhật
+        """
+        if participants is None:
+            participants = ContestParticipant.objects.filter(contest=self.contest, is_active=True)
+        participants = list(participants)
+        if not participants:
+            return 0
+
+        build_started = timezone.now() - self.RECHECK_MARGIN
+        user_ids = [participant.user_id for participant in participants]
+        standings = self.build(user_ids=user_ids, progress=progress)
+
+        if progress:
+            progress('writing', 0, len(participants))
+        with transaction.atomic():
+            Contest.objects.select_for_update().filter(id=self.contest.id).values_list('id').first()
+            changed_user_ids = set(ContestParticipant.objects.filter(
+                contest=self.contest,
+                ranking_updated_at__gte=build_started
+            ).values_list('user_id', flat=True)) & set(user_ids)
+            if changed_user_ids:
+                standings.update(self.build(user_ids=list(changed_user_ids)))
+
+            now = timezone.now()
+            results = []
+            for participant in participants:
+                standing = standings[participant.user_id]
+                participant.solved_count = standing['solved_count']
+                participant.total_score = standing['total_score']
+                participant.penalty_seconds = standing['penalty_seconds']
+                participant.last_submission_at = standing['last_submission_at']
+                participant.attempted_count = standing['attempted_count']
+                # bulk_update không tự cập nhật auto_now
+                participant.ranking_updated_at = now
+
+                for result in standing['results'].values():
+                    result.participant = participant
+                    results.append(result)
+
+            ContestParticipant.objects.bulk_update(participants, self.PARTICIPANT_FIELDS, batch_size=500)
+            ContestProblemResult.objects.filter(participant__in=participants).delete()
+            ContestProblemResult.objects.bulk_create(results, batch_size=500)
+            ProblemStatsService.rebuild_contest(self.contest)
+            Contest.objects.filter(id=self.contest.id).update(standings_version=F('standings_version') + 1)
+        return len(participants)
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from rest_framework.views import APIView
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+
+from .leaderboard_stream import LeaderboardDeltaService, leaderboard_hub
+from common.authentication import QueryParamJWTAuthentication
+from common.sse import (
+    DONE_RETRY_MS, HEARTBEAT, HEARTBEAT_SECONDS, WSGI_RETRY_SECONDS,
+    EventStreamRenderer, format_retry, is_asgi, run_in_thread, stream_response,
+)
+
+
+class ContestLeaderboardStreamView(APIView):
+    """
+    GET: Server-Sent Events - leaderboard trực tiếp của contest
+    Query params:
+    - token: JWT access token (optional, admin xem cả kết quả trong thời gian freeze)
+
+    Events (id = ETag của leaderboard):
+    - `snapshot`: toàn bộ leaderboard (cùng format với ContestLeaderboardView),
+      gửi khi mở stream hoặc khi không tính được delta
+    - `delta`: {version, from, etag, rows, removed, total_participants, problems?}
+      rows = các dòng thay đổi (rank, tổng điểm, ô bài), client thay theo user_id
+      rồi sắp lại theo `position`; `problems` chỉ có khi thống kê cột bài đổi
+    Khi reconnect với Last-Event-ID còn trong cache, stream bắt đầu bằng delta.
+
+    Trên ASGI mọi kết nối cùng contest đọc message của leaderboard_hub (một task
+    poll mỗi process), kết nối chỉ giữ ETag đã gửi. Trên WSGI mỗi request chỉ gửi
+    phần thay đổi so với Last-Event-ID rồi đóng (xem common/sse.py).
+    """
+    authentication_classes = [QueryParamJWTAuthentication]
+    permission_classes = [AllowAny]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    MAX_STREAM_SECONDS = 600
+
+    def get(self, request, contest_id):
+        include_frozen = request.user.is_authenticated and request.user.has_role('admin')
+        last_etag = request.headers.get('Last-Event-ID') or None
+
+        if not is_asgi(request):
+            def single_poll():
+                message = LeaderboardDeltaService.poll(contest_id, include_frozen)
+                yield from LeaderboardDeltaService.resume(last_etag, message)
+                yield format_retry(DONE_RETRY_MS if message.error_event else WSGI_RETRY_SECONDS * 1000)
+
+            return stream_response(single_poll())
+
+        def poll(previous):
+            return LeaderboardDeltaService.poll(contest_id, include_frozen, previous)
+
+        async def stream():
+            yield format_retry(leaderboard_hub.interval * 1000)
+            channel, queue = leaderboard_hub.subscribe((contest_id, include_frozen), poll)
+            etag = last_etag
+            resuming = last_etag is not None
+            started = time.monotonic()
+            try:
+                while time.monotonic() - started < self.MAX_STREAM_SECONDS:
+                    try:
+                        message = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        yield HEARTBEAT
+                        continue
+
+                    if resuming:
+                        # Kết nối lại: delta từ Last-Event-ID (đọc payload cũ trong cache)
+                        resuming = False
+                        events = await run_in_thread(lambda: LeaderboardDeltaService.resume(etag, message))()
+                    else:
+                        events = message.events_for(etag)
+                    for chunk in events:
+                        yield chunk
+                    if message.error_event:
+                        yield format_retry(DONE_RETRY_MS)
+                        return
+                    etag = message.etag
+            finally:
+                leaderboard_hub.unsubscribe(channel, queue)
+
+        return stream_response(stream())
@@ -0,0 +1,40 @@
+"""
+Background tasks cho Django-Q (contests)
+"""
+import logging
+
+from .freeze_service import ContestFreezeService
+from .ranking_jobs import RankingJobService
+
+logger = logging.getLogger(__name__)
+
+
+def freeze_contest_scoreboards():
+    """
+    Task chụp snapshot công khai cho contest vừa tới giờ freeze
+    và tính lại ranking (mở băng) cho contest vừa kết thúc
+    Chạy mỗi phút (xem setup_schedules)
+    """
+    result = ContestFreezeService.process_due_contests()
+    if any(result.values()):
+        logger.info(f"[Freeze] Frozen {result['frozen']} contests, unfrozen {result['unfrozen']}")
+    return result
+
+
+def recalculate_contest_rankings(job_id):
+    """
+    Task tính lại ranking của một contest (ContestRankingJob)
+    Được enqueue bởi ContestRecalculateRankingsView
+    """
+    return RankingJobService.run(job_id)
+
+
+def run_queued_ranking_jobs():
+    """
+    Task chạy các ContestRankingJob còn queued (enqueue lỗi / task bị mất)
+    Chạy mỗi phút (xem setup_schedules)
+    """
+    ran = RankingJobService.run_queued()
+    if ran:
+        logger.info(f"[Ranking Job] Ran {ran} queued jobs")
+    return ran
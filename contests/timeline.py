@@ -0,0 +1,401 @@
+"""
+Bảng xếp hạng tại thời điểm T (virtual contest, replay, biểu đồ standings theo thời gian)
+
+Event log là các submission đã có verdict của contest, sắp theo (submitted_at, id).
+Sau mỗi CHECKPOINT_EVERY event, trạng thái ContestProblemResult của mọi
+(user, problem) được lưu thành checkpoint, mỗi checkpoint một key cache riêng;
+key chính chỉ giữ index (submitted_at, id) của các checkpoint. Checkpoints chỉ được
+nối thêm khi có event mới sau checkpoint cuối (xem checkpoints()).
+Standings tại T = checkpoint gần nhất trước T (đọc đúng một key) + phát lại phần
+event còn lại bằng cùng phép gộp của ScoreboardEngine.
+"""
+import bisect
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from .models import ContestParticipant
+from .scoreboard import AC_STATUSES, ScoreboardEngine, is_accepted
+
+
+class ScoreboardTimeline:
+    """Standings của một contest tại thời điểm bất kỳ"""
+
+    CHECKPOINT_EVERY = 500
+    # series() không có `users` luôn tính cho SERIES_TOP user đứng đầu rồi cắt theo
+    # `top`: mọi giá trị top dùng chung một cache
+    SERIES_TOP = 50
+
+    # Trạng thái gộp của một ContestProblemResult (lưu trong checkpoint)
+    STATE_FIELDS = (
+        'attempts', 'frozen_attempts', 'wrong_attempts', 'first_ac_at',
+        'ac_score', 'ac_test_passed', 'ac_test_total', 'best_score',
+        'last_submission_at', 'last_unfrozen_submission_at',
+        'last_score', 'last_test_passed', 'last_test_total',
+    )
+
+    def __init__(self, contest, include_frozen=False):
+        """
+        include_frozen: bỏ qua freeze (admin); mặc định ẩn kết quả sau freeze
+        như leaderboard công khai khi contest đang diễn ra
+        """
+        self.contest = contest
+        self.engine = ScoreboardEngine(contest, now=contest.end_at if include_frozen else None)
+
+    # ------------------------------------------------------------------
+    # Event log và checkpoints
+    # ------------------------------------------------------------------
+
+    def events(self):
+        return self.engine.submissions_queryset().order_by('submitted_at', 'id').values(
+            *ScoreboardEngine.SUBMISSION_FIELDS
+        )
+
+    def _cache_key(self):
+        # Trạng thái checkpoint phụ thuộc thời điểm freeze đang áp dụng
+        freeze_time = self.engine.freeze_time
+        return f"contest_timeline:{self.contest.id}:{int(freeze_time.timestamp()) if freeze_time else 'open'}"
+
+    def _checkpoint_key(self, index):
+        return f"{self._cache_key()}:cp:{index}"
+
+    def _checkpoint_state(self, index, marker):
+        """
+        Trạng thái của checkpoint thứ `index` ({(user_id, problem_id): state tuple})
+        hoặc None nếu key đã hết hạn / thuộc một lần dựng khác (marker không khớp)
+        """
+        stored = cache.get(self._checkpoint_key(index))
+        if stored is None or stored[0] != marker:
+            return None
+        return stored[1]
+
+    def checkpoints(self):
+        """
+        Index checkpoints của contest, mỗi CHECKPOINT_EVERY event
+
+        Key chính giữ index cùng fingerprint của các event tới checkpoint cuối;
+        trạng thái checkpoint thứ n nằm ở key `...:cp:<n>` cùng marker (submitted_at, id).
+        Khi standings_version đổi, fingerprint được so lại bằng một query aggregate:
+        nếu khớp (verdict mới đều nằm sau checkpoint cuối) chỉ đọc checkpoint cuối và
+        các event sau nó rồi nối thêm checkpoint; rejudge hoặc verdict trễ của
+        submission cũ làm fingerprint đổi -> dựng lại toàn bộ.
+
+        Returns: [(submitted_at, id), ...]
+        """
+        cache_key = self._cache_key()
+        version_key = f"{cache_key}:version"
+        stored = cache.get(cache_key)
+        if stored is not None and cache.get(version_key) == self.contest.standings_version:
+            return stored['checkpoints']
+
+        results = None
+        if stored is not None and stored['checkpoints']:
+            submitted_at, submission_id = stored['checkpoints'][-1]
+            if self._fingerprint(submitted_at, submission_id) == stored['fingerprint']:
+                state = self._checkpoint_state(len(stored['checkpoints']) - 1, stored['checkpoints'][-1])
+                results = self._load(state) if state is not None else None
+            if results is None:
+                stored = None
+
+        checkpoints = list(stored['checkpoints']) if stored else []
+        fingerprint = stored['fingerprint'] if stored else self._empty_fingerprint()
+        if checkpoints:
+            submitted_at, submission_id = checkpoints[-1]
+            events = self.events().filter(
+                Q(submitted_at__gt=submitted_at) | Q(submitted_at=submitted_at, id__gt=submission_id)
+            )
+        else:
+            results = {}
+            events = self.events()
+
+        appended = False
+        tail = list(fingerprint)
+        for count, sub in enumerate(events.iterator(chunk_size=2000), start=1):
+            self._fold(results, sub)
+            self._add_fingerprint(tail, sub)
+            if count % self.CHECKPOINT_EVERY == 0:
+                marker = (sub['submitted_at'], sub['id'])
+                cache.set(
+                    self._checkpoint_key(len(checkpoints)),
+                    (marker, self._dump(results)),
+                    settings.LEADERBOARD_CACHE_SECONDS
+                )
+                checkpoints.append(marker)
+                fingerprint = tuple(tail)
+                appended = True
+
+        if appended or stored is None:
+            cache.set(
+                cache_key,
+                {'checkpoints': checkpoints, 'fingerprint': fingerprint},
+                settings.LEADERBOARD_CACHE_SECONDS
+            )
+        cache.set(version_key, self.contest.standings_version, settings.LEADERBOARD_CACHE_SECONDS)
+        return checkpoints
+
+    @staticmethod
+    def _empty_fingerprint():
+        return (0, 0, Decimal(0), 0)
+
+    @staticmethod
+    def _add_fingerprint(fingerprint, sub):
+        """(số event, số AC, tổng score, tổng test_passed) - đổi khi có rejudge / event chèn vào"""
+        fingerprint[0] += 1
+        fingerprint[1] += 1 if is_accepted(sub['status']) else 0
+        fingerprint[2] += sub['score'] or 0
+        fingerprint[3] += sub['test_passed'] or 0
+
+    def _fingerprint(self, submitted_at, submission_id):
+        """Fingerprint của các event tới (submitted_at, id), tính trong DB"""
+        accepted = Q()
+        for status in AC_STATUSES:
+            accepted |= Q(status__iexact=status)
+        row = self.engine.submissions_queryset().filter(
+            Q(submitted_at__lt=submitted_at) | Q(submitted_at=submitted_at, id__lte=submission_id)
+        ).aggregate(
+            events=Count('id'),
+            accepted=Count('id', filter=accepted),
+            score=Sum('score'),
+            test_passed=Sum('test_passed'),
+        )
+        return (row['events'], row['accepted'], row['score'] or Decimal(0), row['test_passed'] or 0)
+
+    def _fold(self, results, sub):
+        key = (sub['user_id'], sub['problem_id'])
+        result = results.get(key)
+        if result is None:
+            result = results[key] = self.engine.new_result(sub['problem_id'])
+        self.engine.add_submission(result, sub)
+        return key
+
+    def _dump(self, results):
+        return {
+            key: tuple(getattr(result, field) for field in self.STATE_FIELDS)
+            for key, result in results.items()
+        }
+
+    def _load(self, state):
+        results = {}
+        for (user_id, problem_id), values in state.items():
+            result = self.engine.new_result(problem_id)
+            for field, value in zip(self.STATE_FIELDS, values):
+                setattr(result, field, value)
+            results[(user_id, problem_id)] = result
+        return results
+
+    def results_at(self, at):
+        """Trạng thái {(user_id, problem_id): ContestProblemResult} sau mọi event có submitted_at <= at"""
+        checkpoints = self.checkpoints()
+        index = bisect.bisect_right([checkpoint[0] for checkpoint in checkpoints], at)
+
+        # Chỉ đọc checkpoint cần dùng; key hết hạn -> lùi về checkpoint trước
+        state = None
+        while index and state is None:
+            state = self._checkpoint_state(index - 1, checkpoints[index - 1])
+            if state is None:
+                index -= 1
+
+        events = self.events().filter(submitted_at__lte=at)
+        if index:
+            submitted_at, submission_id = checkpoints[index - 1]
+            results = self._load(state)
+            events = events.filter(
+                Q(submitted_at__gt=submitted_at) | Q(submitted_at=submitted_at, id__gt=submission_id)
+            )
+        else:
+            results = {}
+
+        for sub in events:
+            self._fold(results, sub)
+        return results
+
+    # ------------------------------------------------------------------
+    # Standings
+    # ------------------------------------------------------------------
+
+    def participants(self):
+        return {
+            row['user_id']: row
+            for row in ContestParticipant.objects.filter(
+                contest=self.contest,
+                is_active=True
+            ).values('user_id', 'user__username', 'user__full_name')
+        }
+
+    def sort_keys(self, totals):
+        """(khóa xếp hạng, khóa thứ tự) giống ContestRankingService.get_contest_leaderboard"""
+        last_at = totals['last_submission_at']
+        last_key = (last_at is None, last_at.timestamp() if last_at else 0)
+        if self.contest.contest_mode == 'OI':
+            rank_key = (-totals['total_score'],)
+        else:
+            rank_key = (-totals['solved_count'], totals['penalty_seconds'])
+        return rank_key, rank_key + (last_key,)
+
+    def rank(self, totals_by_user):
+        """{user_id: totals} -> [(rank, user_id, totals), ...] theo thứ tự xếp hạng"""
+        keyed = sorted(
+            ((self.sort_keys(totals), user_id, totals) for user_id, totals in totals_by_user.items()),
+            key=lambda item: (item[0][1], item[1])
+        )
+        ranked = []
+        previous_key = None
+        for position, ((rank_key, _), user_id, totals) in enumerate(keyed, start=1):
+            if rank_key != previous_key:
+                rank = position
+                previous_key = rank_key
+            ranked.append((rank, user_id, totals))
+        return ranked
+
+    def _totals_at(self, at, participants):
+        """({user_id: {problem_id: result}}, {user_id: totals}) tại thời điểm `at`"""
+        by_user = {user_id: {} for user_id in participants}
+        for (user_id, problem_id), result in self.results_at(at).items():
+            if user_id in by_user:
+                by_user[user_id][problem_id] = result
+
+        totals_by_user = {
+            user_id: self.engine.standing(user_results.values())
+            for user_id, user_results in by_user.items()
+        }
+        return by_user, totals_by_user
+
+    def standings_at(self, at, with_problems=False):
+        """
+        Bảng xếp hạng tại thời điểm `at` (participant hiện tại của contest)
+
+        Returns: payload cùng format cơ bản với leaderboard API
+        """
+        participants = self.participants()
+        by_user, totals_by_user = self._totals_at(at, participants)
+
+        entries = []
+        for rank, user_id, totals in self.rank(totals_by_user):
+            participant = participants[user_id]
+            entry = {
+                'rank': rank,
+                'position': len(entries) + 1,
+                'user_id': user_id,
+                'username': participant['user__username'],
+                'full_name': participant['user__full_name'] or participant['user__username'],
+                'solved_count': totals['solved_count'],
+                'total_score': float(totals['total_score']),
+                'penalty_seconds': totals['penalty_seconds'],
+                'last_submission_at': totals['last_submission_at'],
+            }
+            if with_problems:
+                entry['problems'] = self.engine.problem_cells(by_user[user_id])
+            entries.append(entry)
+
+        return {
+            'contest_id': self.contest.id,
+            'contest_mode': self.contest.contest_mode,
+            'at': at,
+            'elapsed_seconds': int((at - self.contest.start_at).total_seconds()),
+            'problems': [
+                {'id': problem_id, 'label': problem['label']}
+                for problem_id, problem in self.engine.problems.items()
+            ],
+            'leaderboard': entries,
+            'total_participants': len(entries),
+        }
+
+    def series(self, step_seconds, user_ids=None, top=10):
+        """
+        Standings theo thời gian: một lần đọc event log, chụp rank mỗi `step_seconds`
+
+        user_ids: user cần theo dõi (mặc định: `top` user đứng đầu lúc kết thúc, tối đa SERIES_TOP)
+        Totals được cập nhật tăng dần theo đóng góp của từng result (như apply_submission_result).
+        Chỉ chụp totals của các user theo dõi; rank = vị trí trong danh sách khóa xếp
+        hạng đã sắp của mọi participant (bisect). Kết quả cache theo phiên bản leaderboard.
+        """
+        from .ranking_service import ContestRankingService
+
+        end = min(self.contest.end_at, self.engine.now)
+        users_key = ','.join(map(str, user_ids)) if user_ids is not None else f"top{self.SERIES_TOP}"
+        cache_key = (
+            f"contest_timeline_series:{self._cache_key()}:{ContestRankingService.leaderboard_etag(self.contest)}:"
+            f"{step_seconds}:{int((end - self.contest.start_at).total_seconds()) // step_seconds}:{users_key}"
+        )
+        payload = cache.get(cache_key)
+        if payload is None:
+            payload = self._build_series(step_seconds, end, user_ids, self.SERIES_TOP)
+            cache.set(cache_key, payload, settings.LEADERBOARD_CACHE_SECONDS)
+        if user_ids is None and top < self.SERIES_TOP:
+            # Thứ tự user trong payload là thứ tự xếp hạng lúc kết thúc
+            payload = dict(payload, users=payload['users'][:top], points=[
+                dict(point, standings=point['standings'][:top]) for point in payload['points']
+            ])
+        return payload
+
+    def _build_series(self, step_seconds, end, user_ids, top):
+        participants = self.participants()
+        if user_ids is None:
+            _, final_totals = self._totals_at(end, participants)
+            user_ids = [user_id for _, user_id, _ in self.rank(final_totals)[:top]]
+        user_ids = [user_id for user_id in user_ids if user_id in participants]
+
+        results = {}
+        totals_by_user = {user_id: self.engine.standing([]) for user_id in participants}
+        rank_keys = {user_id: self.sort_keys(totals)[0] for user_id, totals in totals_by_user.items()}
+        ordered_keys = sorted(rank_keys.values())
+
+        points = []
+        step = timedelta(seconds=step_seconds)
+        next_point = self.contest.start_at
+
+        def snapshot(at):
+            points.append((at, {
+                user_id: (bisect.bisect_left(ordered_keys, rank_keys[user_id]) + 1, dict(totals_by_user[user_id]))
+                for user_id in user_ids
+            }))
+
+        for sub in self.events().filter(submitted_at__lte=end).iterator(chunk_size=2000):
+            while next_point < sub['submitted_at']:
+                snapshot(next_point)
+                next_point += step
+
+            key = (sub['user_id'], sub['problem_id'])
+            before = self.engine.contribution(results.get(key))
+            self._fold(results, sub)
+            user_id = sub['user_id']
+            if user_id in totals_by_user:
+                totals = totals_by_user[user_id]
+                self.engine.add_contribution(totals, before, sign=-1)
+                self.engine.add_contribution(totals, self.engine.contribution(results[key]))
+
+                rank_key = self.sort_keys(totals)[0]
+                if rank_key != rank_keys[user_id]:
+                    del ordered_keys[bisect.bisect_left(ordered_keys, rank_keys[user_id])]
+                    bisect.insort(ordered_keys, rank_key)
+                    rank_keys[user_id] = rank_key
+
+        while next_point <= end:
+            snapshot(next_point)
+            next_point += step
+        if not points or points[-1][0] < end:
+            snapshot(end)
+
+        return {
+            'contest_id': self.contest.id,
+            'step_seconds': step_seconds,
+            'users': [{
+                'user_id': user_id,
+                'username': participants[user_id]['user__username'],
+                'full_name': participants[user_id]['user__full_name'] or participants[user_id]['user__username'],
+            } for user_id in user_ids],
+            'points': [{
+                'at': at,
+                'elapsed_seconds': int((at - self.contest.start_at).total_seconds()),
+                'standings': [{
+                    'user_id': user_id,
+                    'rank': ranked[user_id][0],
+                    'solved_count': ranked[user_id][1]['solved_count'],
+                    'total_score': float(ranked[user_id][1]['total_score']),
+                    'penalty_seconds': ranked[user_id][1]['penalty_seconds'],
+                } for user_id in user_ids],
+            } for at, ranked in points],
+        }
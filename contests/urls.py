@@ -13,12 +13,17 @@ from .views import (
     ContestParticipantsView,
     ContestParticipantToggleView,
     ContestLeaderboardView,
+    ContestResolverView,
+    ContestExportView,
+    ContestStandingsAtView,
+    ContestStandingsTimelineView,
     ContestUserCandidatesView,
     ContestParticipantsBulkAddView,
     ContestRecalculateRankingsView,
     ContestStatisticsView,
     ContestDetailStatisticsView,
 )
+from .stream_views import ContestLeaderboardStreamView
 
 urlpatterns = [
     path('', ContestListView.as_view(), name='contest-list'),
@@ -29,6 +34,11 @@ urlpatterns = [
     path('<int:contest_id>/problems/', ContestProblemView.as_view(), name='contest-add-problem'),
     path('<int:contest_id>/problems/<int:problem_id>/', ContestProblemView.as_view(), name='contest-remove-problem'),
     path('<int:contest_id>/leaderboard/', ContestLeaderboardView.as_view(), name='contest-leaderboard'),
+    path('<int:contest_id>/leaderboard/stream/', ContestLeaderboardStreamView.as_view(), name='contest-leaderboard-stream'),
+    path('<int:contest_id>/resolver/', ContestResolverView.as_view(), name='contest-resolver'),
+    path('<int:contest_id>/export/<str:kind>/', ContestExportView.as_view(), name='contest-export'),
+    path('<int:contest_id>/standings/', ContestStandingsAtView.as_view(), name='contest-standings-at'),
+    path('<int:contest_id>/standings/timeline/', ContestStandingsTimelineView.as_view(), name='contest-standings-timeline'),
     path('practice/contest/', ContestDetailUserView.as_view(), name='practice-contest-detail'),
     path('user/contests/', UserContestsView.as_view(), name='user-contests'),
     path('user/<int:contest_id>/', UserContestDetailView.as_view(), name='user-contest-detail'),
@@ -6,8 +6,13 @@ from django.utils import timezone
 from datetime import timedelta
 from django.db.models import Q, Count, Sum, Avg
 from django.core.paginator import Paginator, EmptyPage
+from django.utils.http import parse_etags, quote_etag
+from django.utils.dateparse import parse_datetime
+from django.http import StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+import json
 
-from .models import Contest, ContestProblem, ContestParticipant
+from .models import Contest, ContestProblem, ContestParticipant, ContestProblemResult, ContestRankingJob
 from .serializers import (
     ContestCreateSerializer,
     ContestSerializer,
@@ -16,10 +21,24 @@ from .serializers import (
 )
 from .domjudge_service import DOMjudgeContestService
 from .ranking_service import ContestRankingService
+from .freeze_service import ContestFreezeService
+from .timeline import ScoreboardTimeline
+from .export_service import ContestExportService
+from .ranking_jobs import RankingJobService
+from .problem_stats import ProblemStatsService
 from problems.models import Submissions
 from common.authentication import CustomJWTAuthentication
 
 
+def unfreezing_response():
+    """202 while the unfreeze job of an ended contest is still running"""
+    return Response(
+        {'status': 'unfreezing', 'detail': 'Final rankings are being calculated, retry shortly'},
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Retry-After': str(ContestFreezeService.UNFREEZE_RETRY_SECONDS)}
+    )
+
+
 class ContestCreateView(APIView):
     """Create a new contest and sync with DOMjudge"""
     authentication_classes = [CustomJWTAuthentication]
@@ -163,6 +182,8 @@ class ContestDetailView(APIView):
             contest_mode_changed = False
             if 'contest_mode' in request.data and request.data['contest_mode'] != contest.contest_mode:
                 contest_mode_changed = True
+            scoring_before = [getattr(contest, field) for field in ContestRankingService.SCORING_FIELDS]
+            freeze_window_before = (contest.freeze_rankings_at, contest.end_at)
             serializer = ContestCreateSerializer(contest, data=request.data, partial=True, context={'request': request})
             
             if not serializer.is_valid():
@@ -176,11 +197,24 @@ class ContestDetailView(APIView):
                 # Update lazy_eval_results in DOMjudge if contest_mode changed
                 domjudge_service = DOMjudgeContestService()
                 domjudge_service.update_lazy_eval_results_for_contest(contest)
+            ranking_job = None
+            if (contest.freeze_rankings_at, contest.end_at) != freeze_window_before:
+                # Freeze window moved: the job below unfreezes again if the contest has ended
+                Contest.objects.filter(id=contest.id).update(rankings_unfrozen_at=None)
+                contest.rankings_unfrozen_at = None
+            if scoring_before != [getattr(contest, field) for field in ContestRankingService.SCORING_FIELDS]:
+                # Stored standings depend on these fields: recalculate in the background,
+                # the freeze snapshot is dropped when the job finishes
+                job, _ = RankingJobService.enqueue(
+                    contest, request.user, after_change=True, reset_freeze_snapshot=True
+                )
+                ranking_job = RankingJobService.status_payload(job)
             response_serializer = ContestSerializer(contest)
             
             return Response({
                 'message': 'Contest updated successfully',
-                'contest': response_serializer.data
+                'contest': response_serializer.data,
+                'ranking_job': ranking_job
             }, status=status.HTTP_200_OK)
             
         except Contest.DoesNotExist:
@@ -250,20 +284,7 @@ class ContestProblemView(APIView):
             max_sequence = ContestProblem.objects.filter(contest=contest).count()
             sequence = serializer.validated_data.get('sequence', max_sequence)
             
-            # Create contest problem in database
-            contest_problem = ContestProblem.objects.create(
-                contest=contest,
-                problem=problem,
-                sequence=sequence,
-                alias=serializer.validated_data.get('label', ''),
-                label=serializer.validated_data.get('label', ''),
-                color=serializer.validated_data.get('color', ''),
-                rgb=serializer.validated_data.get('rgb', ''),
-                point=serializer.validated_data.get('points', 1),
-                lazy_eval_results=serializer.validated_data.get('lazy_eval_results', False)
-            )
-            
-            # Sync with DOMjudge
+            # Sync with DOMjudge first: nothing to roll back locally if it fails
             try:
                 domjudge_service = DOMjudgeContestService()
                 # DOMjudge: lazy_eval_results special handling
@@ -290,31 +311,44 @@ class ContestProblemView(APIView):
                     problem.slug,
                     domjudge_problem_data
                 )
-                
-                return Response({
-                    'message': 'Problem added to contest successfully',
-                    'contest_problem': {
-                        'id': contest_problem.id,
-                        'problem_id': problem.id,
-                        'problem_title': problem.title,
-                        'problem_slug': problem.slug,
-                        'sequence': contest_problem.sequence,
-                        'alias': contest_problem.alias,
-                        'label': contest_problem.label,
-                        'color': contest_problem.color,
-                        'rgb': contest_problem.rgb,
-                        'point': contest_problem.point
-                    },
-                    'domjudge_response': domjudge_response
-                }, status=status.HTTP_201_CREATED)
-                
             except Exception as e:
-                # Rollback database changes if DOMjudge sync fails
-                contest_problem.delete()
                 return Response({
                     'error': 'Failed to sync with DOMjudge',
                     'details': str(e)
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            
+            # Create contest problem in database
+            contest_problem = ContestProblem.objects.create(
+                contest=contest,
+                problem=problem,
+                sequence=sequence,
+                alias=serializer.validated_data.get('label', ''),
+                label=serializer.validated_data.get('label', ''),
+                color=serializer.validated_data.get('color', ''),
+                rgb=serializer.validated_data.get('rgb', ''),
+                point=serializer.validated_data.get('points', 1),
+                lazy_eval_results=serializer.validated_data.get('lazy_eval_results', False)
+            )
+            # Earlier submissions on this problem now count: recalculate stored standings in the background
+            job, _ = RankingJobService.enqueue(contest, request.user, after_change=True)
+            
+            return Response({
+                'message': 'Problem added to contest successfully',
+                'contest_problem': {
+                    'id': contest_problem.id,
+                    'problem_id': problem.id,
+                    'problem_title': problem.title,
+                    'problem_slug': problem.slug,
+                    'sequence': contest_problem.sequence,
+                    'alias': contest_problem.alias,
+                    'label': contest_problem.label,
+                    'color': contest_problem.color,
+                    'rgb': contest_problem.rgb,
+                    'point': contest_problem.point
+                },
+                'domjudge_response': domjudge_response,
+                'ranking_job': RankingJobService.status_payload(job)
+            }, status=status.HTTP_201_CREATED)
                 
         except Problem.DoesNotExist:
             return Response({
@@ -352,11 +386,15 @@ class ContestProblemView(APIView):
                     'details': str(e)
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
-            # Remove from database
+            # Remove from database and ContestProblemResult rows of the problem,
+            # stored totals are recalculated in the background
             contest_problem.delete()
+            ContestProblemResult.objects.filter(contest=contest, problem=problem).delete()
+            job, _ = RankingJobService.enqueue(contest, request.user, after_change=True)
             
             return Response({
-                'message': 'Problem removed from contest successfully'
+                'message': 'Problem removed from contest successfully',
+                'ranking_job': RankingJobService.status_payload(job)
             }, status=status.HTTP_200_OK)
             
         except Contest.DoesNotExist:
@@ -663,6 +701,8 @@ class ContestParticipantToggleView(APIView):
             # Deactivate participant
             participant.is_active = False
             participant.save()
+            ProblemStatsService.apply_participants(participant.contest, [participant.id], active=False)
+            ContestRankingService.bump_standings_version(participant.contest_id)
             
             # Serialize updated participant
             from .serializers import ContestParticipantSerializer
@@ -790,6 +830,7 @@ class ContestParticipantsBulkAddView(APIView):
 
         added = []
         existed = []
+        reactivated = []
         for uid in found_ids:
             participant, created = ContestParticipant.objects.get_or_create(
                 contest=contest,
@@ -800,10 +841,16 @@ class ContestParticipantsBulkAddView(APIView):
                 if not participant.is_active:
                     participant.is_active = True
                     participant.save(update_fields=['is_active'])
+                    reactivated.append(participant.id)
                 existed.append(uid)
             else:
                 added.append(uid)
 
+        if found_ids:
+            # Participant mới chưa có result: chỉ cần cộng result của người được kích hoạt lại
+            ProblemStatsService.apply_participants(contest, reactivated, active=True)
+            ContestRankingService.bump_standings_version(contest.id)
+
         missing = [uid for uid in user_ids if uid not in found_ids]
 
         return Response({
@@ -913,6 +960,10 @@ class ContestDetailStatisticsView(APIView):
             # Test case statistics from DOMjudge
             test_case_stats = self._get_test_case_statistics(contest, submissions)
             
+            # First solvers and cumulative solves per problem (precomputed, O(problems))
+            is_admin = request.user.has_role('admin')
+            solve_stats = ProblemStatsService.payload(contest, include_frozen=is_admin)
+
             # Recent submissions
             recent_submissions = submissions.order_by('-submitted_at')[:20]
             recent_submissions_data = []
@@ -946,7 +997,11 @@ class ContestDetailStatisticsView(APIView):
                 'statistics': {
                     'problems': {
                         'total': total_problems,
-                        'by_problem': problem_stats
+                        'by_problem': problem_stats,
+                        'first_solvers': [
+                            dict(item['first_solver'], problem_id=item['problem_id'], label=item['label'])
+                            for item in solve_stats if item['first_solver']
+                        ]
                     },
                     'participants': {
                         'total': total_participants,
@@ -969,7 +1024,13 @@ class ContestDetailStatisticsView(APIView):
                     'submissions_over_time': list(submissions_by_day),
                     'participants_registration': list(participants_by_day),
                     'problem_statistics': problem_stats,
-                    'error_distribution': list(error_stats)
+                    'error_distribution': list(error_stats),
+                    'solves_over_time': [{
+                        'problem_id': item['problem_id'],
+                        'label': item['label'],
+                        'solved_count': item['solved_count'],
+                        'timeline': item['solve_timeline']
+                    } for item in solve_stats]
                 }
             }, status=status.HTTP_200_OK)
             
@@ -1081,6 +1142,8 @@ class ContestRegistrationView(APIView):
                 if not participant.is_active:
                     participant.is_active = True
                     participant.save()
+                    ProblemStatsService.apply_participants(contest, [participant.id], active=True)
+                    ContestRankingService.bump_standings_version(contest.id)
                     return Response({
                         'message': 'Đăng ký lại cuộc thi thành công',
                         'registered_at': participant.registered_at
@@ -1091,6 +1154,7 @@ class ContestRegistrationView(APIView):
                         'registered_at': participant.registered_at
                     }, status=status.HTTP_400_BAD_REQUEST)
             
+            ContestRankingService.bump_standings_version(contest.id)
             return Response({
                 'message': 'Đăng ký cuộc thi thành công',
                 'registered_at': participant.registered_at
@@ -1129,6 +1193,8 @@ class ContestRegistrationView(APIView):
                 # Deactivate instead of delete to keep history
                 participant.is_active = False
                 participant.save()
+                ProblemStatsService.apply_participants(contest, [participant.id], active=False)
+                ContestRankingService.bump_standings_version(contest.id)
                 
                 return Response({
                     'message': 'Hủy đăng ký cuộc thi thành công'
@@ -1221,6 +1287,9 @@ class ContestLeaderboardView(APIView):
     authentication_classes = [CustomJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    MAX_PAGE_SIZE = 200
+    MAX_WINDOW = 50
+
     def get_permissions(self):
         """Allow any user to view contest leaderboard"""
         if self.request.method == 'GET':
@@ -1228,97 +1297,61 @@ class ContestLeaderboardView(APIView):
         return [IsAuthenticated()]
     
     def get(self, request, contest_id):
-        """Get contest leaderboard with rankings"""
+        """
+        Get contest leaderboard with rankings
+        Served from a cached snapshot, rebuilt only when standings change.
+        Supports ETag / If-None-Match (304 between changes)
+
+        During the freeze non-admin users get the snapshot taken at freeze time.
+
+        Query params (optional, default: full leaderboard):
+        - page, page_size: one page of the leaderboard
+        - around_user, window: rank of a user and the `window` rows above/below (default 5)
+        """
         try:
             contest = Contest.objects.get(id=contest_id)
-            
-            # Get contest problems for column headers
-            contest_problems = ContestProblem.objects.filter(
-                contest=contest
-            ).select_related('problem').order_by('label')
-            
-            problem_list = [{
-                'id': cp.problem.id,
-                'label': cp.label,
-                'alias': cp.alias,
-                'point': cp.point,
-                'title': cp.problem.title,
-                'color': cp.color or '',
-                'rgb': cp.rgb or ''
-            } for cp in contest_problems]
-            
-            # Get rankings
-            participants = ContestRankingService.get_contest_leaderboard(contest_id)
-            
-            # Build leaderboard entries
-            leaderboard_data = []
-            current_rank = 1
-            
-            for idx, participant in enumerate(participants, start=1):
-                # Get problem details for this user (for ICPC mode)
-                problem_details = {}
-                if contest.contest_mode == 'ICPC' or contest.slug == 'practice':
-                    problem_details = ContestRankingService.get_user_problem_details(
-                        contest_id,
-                        participant.user.id
-                    )
-                
-                # Get full name
-                full_name = participant.user.full_name if participant.user.full_name else participant.user.username
-                
-                # Get avatar URL properly
-                avatar_url = None
-                if participant.user.avatar_url:
-                    avatar_url = participant.user.avatar_url.url if hasattr(participant.user.avatar_url, 'url') else str(participant.user.avatar_url)
-                
-                # Attempted problems (distinct problems with any submission)
-                attempted_count = None
-                try:
-                    # Only compute for practice to avoid heavy queries elsewhere
-                    if contest.slug == 'practice':
-                        # Count distinct problems the user has ever submitted within the window
-                        attempted_count = Submissions.objects.filter(
-                            contest=contest,
-                            user=participant.user,
-                            submitted_at__gte=contest.start_at,
-                            submitted_at__lte=contest.end_at
-                        ).values('problem').distinct().count()
-                except Exception:
-                    attempted_count = None
-
-                entry = {
-                    'rank': current_rank,
-                    'user_id': participant.user.id,
-                    'username': participant.user.username,
-                    'full_name': full_name,
-                    'avatar_url': avatar_url,
-                    'solved_count': participant.solved_count,
-                    'total_score': float(participant.total_score),
-                    'penalty_seconds': participant.penalty_seconds,
-                    'penalty_minutes': participant.penalty_seconds // 60,
-                    'last_submission_at': participant.last_submission_at,
-                    'problems': problem_details,
-                    'attempted_count': attempted_count
-                }
-                
-                leaderboard_data.append(entry)
-                current_rank += 1
-            
-            return Response({
-                'contest_id': contest.id,
-                'contest_slug': contest.slug,
-                'contest_title': contest.title,
-                'contest_mode': contest.contest_mode,
-                'penalty_time': contest.penalty_time,
-                'problems': problem_list,
-                'leaderboard': leaderboard_data,
-                'total_participants': len(leaderboard_data)
-            }, status=status.HTTP_200_OK)
+            params = self._view_params(request)
+
+            # Freeze (và sau khi kết thúc tới khi mở băng xong): user thường xem snapshot công khai chụp lúc freeze
+            is_admin = request.user.is_authenticated and request.user.has_role('admin')
+            snapshot = None if is_admin else ContestFreezeService.get_public_snapshot(contest)
+            if snapshot is not None:
+                etag = quote_etag(f"{contest.id}-frozen-{snapshot.id}")
+                if self._not_modified(request, etag):
+                    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={
+                        'ETag': etag,
+                        'Cache-Control': 'no-cache'
+                    })
+                return Response(ContestFreezeService.slice_payload(snapshot.payload, **params), headers={
+                    'ETag': etag,
+                    'Cache-Control': 'no-cache'
+                })
+
+            # Contest kết thúc: mở băng bằng job nền, không tính lại trong request
+            if is_admin:
+                ContestFreezeService.request_unfreeze(contest)
+
+            etag = quote_etag(ContestRankingService.leaderboard_etag(contest))
+            if self._not_modified(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={
+                    'ETag': etag,
+                    'Cache-Control': 'no-cache'
+                })
+
+            payload, current_etag = ContestRankingService.get_leaderboard_snapshot(contest, **params)
+            return Response(payload, status=status.HTTP_200_OK, headers={
+                'ETag': quote_etag(current_etag),
+                'Cache-Control': 'no-cache'
+            })
             
         except Contest.DoesNotExist:
             return Response({
                 'error': 'Contest not found'
             }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError:
+            return Response({
+                'error': 'Invalid pagination parameters'
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -1327,6 +1360,215 @@ class ContestLeaderboardView(APIView):
                 'details': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @staticmethod
+    def _not_modified(request, etag):
+        if_none_match = request.headers.get('If-None-Match')
+        return bool(if_none_match) and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*')
+
+    def _view_params(self, request):
+        """Parse pagination / window params (raises ValueError if invalid)"""
+        params = request.query_params
+        if params.get('around_user'):
+            window = int(params.get('window', 5))
+            if window < 0:
+                raise ValueError('window')
+            return {
+                'around_user': int(params['around_user']),
+                'window': min(window, self.MAX_WINDOW)
+            }
+        if params.get('page') or params.get('page_size'):
+            page = int(params.get('page', 1))
+            page_size = int(params.get('page_size', 50))
+            if page < 1 or page_size < 1:
+                raise ValueError('page')
+            return {'page': page, 'page_size': min(page_size, self.MAX_PAGE_SIZE)}
+        return {}
+
+
+class ContestStandingsAtView(APIView):
+    """Standings of a contest as of any moment (virtual participation, replays)"""
+    authentication_classes = [CustomJWTAuthentication]
+    permission_classes = [AllowAny]
+
+    def get(self, request, contest_id):
+        """
+        Query params:
+        - at: ISO datetime, or elapsed: seconds since contest start (default: now)
+        - problems: 'true' to include the per-problem cells
+        Results after the freeze stay hidden for non-admin users while the contest is running.
+        """
+        try:
+            contest = Contest.objects.get(id=contest_id)
+        except Contest.DoesNotExist:
+            return Response({'error': 'Contest not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            at = self._parse_at(request, contest)
+        except (ValueError, OverflowError):
+            return Response({'error': 'Invalid time parameter'}, status=status.HTTP_400_BAD_REQUEST)
+
+        is_admin = request.user.is_authenticated and request.user.has_role('admin')
+        timeline = ScoreboardTimeline(contest, include_frozen=is_admin)
+        with_problems = request.query_params.get('problems', '').lower() == 'true'
+        return Response(timeline.standings_at(at, with_problems=with_problems), status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _parse_at(request, contest):
+        """Requested moment, clamped to [start_at, min(end_at, now)] (raises ValueError if invalid)"""
+        params = request.query_params
+        upper = min(contest.end_at, timezone.now())
+        if params.get('at'):
+            at = parse_datetime(params['at'])
+            if at is None:
+                raise ValueError('at')
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+        elif params.get('elapsed'):
+            at = contest.start_at + timedelta(seconds=int(params['elapsed']))
+        else:
+            at = upper
+        return max(contest.start_at, min(at, upper))
+
+
+class ContestStandingsTimelineView(APIView):
+    """
+    Standings over time for charts, computed in one pass over the contest submissions
+    (cached per leaderboard version, step and followed users)
+    """
+    authentication_classes = [CustomJWTAuthentication]
+    permission_classes = [AllowAny]
+
+    MAX_POINTS = 300
+    MAX_TOP = ScoreboardTimeline.SERIES_TOP
+    # Steps are rounded up to one of these (then 3600 * 2^k) so callers share cached series
+    STEP_CHOICES = (1, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600)
+
+    def get(self, request, contest_id):
+        """
+        Query params:
+        - step: seconds between points (default: contest duration / 100, at most MAX_POINTS points),
+          rounded up to STEP_CHOICES
+        - users: comma separated user ids to follow, at most MAX_TOP, authenticated users only
+          (default: the `top` users at the end)
+        - top: number of leading users when `users` is omitted (default 10)
+        """
+        try:
+            contest = Contest.objects.get(id=contest_id)
+        except Contest.DoesNotExist:
+            return Response({'error': 'Contest not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if timezone.now() < contest.start_at:
+            return Response({'error': 'Contest has not started yet'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            params = request.query_params
+            duration = max(int((contest.end_at - contest.start_at).total_seconds()), 1)
+            step = int(params.get('step', max(duration // 100, 1)))
+            top = min(int(params.get('top', 10)), self.MAX_TOP)
+            user_ids = [int(user_id) for user_id in params['users'].split(',')] if params.get('users') else None
+            if step < 1 or top < 1 or (user_ids is not None and not 0 < len(user_ids) <= self.MAX_TOP):
+                raise ValueError('step')
+        except ValueError:
+            return Response({'error': 'Invalid parameters'}, status=status.HTTP_400_BAD_REQUEST)
+        if user_ids is not None and not request.user.is_authenticated:
+            # Every custom user list is a separate pass over the event log
+            return Response({'error': 'Authentication required to follow specific users'},
+                            status=status.HTTP_401_UNAUTHORIZED)
+        step = self._snap_step(min(max(step, -(-duration // self.MAX_POINTS)), duration))
+
+        is_admin = request.user.is_authenticated and request.user.has_role('admin')
+        timeline = ScoreboardTimeline(contest, include_frozen=is_admin)
+        return Response(timeline.series(step, user_ids=user_ids, top=top), status=status.HTTP_200_OK)
+
+    @classmethod
+    def _snap_step(cls, step):
+        for choice in cls.STEP_CHOICES:
+            if step <= choice:
+                return choice
+        snapped = cls.STEP_CHOICES[-1]
+        while snapped < step:
+            snapped *= 2
+        return snapped
+
+
+class ContestResolverView(APIView):
+    """Resolver replay after an ICPC contest with frozen rankings has ended"""
+    authentication_classes = [CustomJWTAuthentication]
+    permission_classes = [AllowAny]
+
+    def get(self, request, contest_id):
+        """
+        Stream resolver steps as NDJSON (one JSON object per line):
+        `init` (standings at freeze time), `reveal` (one pending cell opened,
+        lowest ranked participant first) and `final`
+        """
+        try:
+            contest = Contest.objects.get(id=contest_id)
+        except Contest.DoesNotExist:
+            return Response({'error': 'Contest not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if contest.contest_mode != 'ICPC' or not contest.freeze_rankings_at or contest.slug == 'practice':
+            return Response({
+                'error': 'Resolver is only available for ICPC contests with frozen rankings'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.now() < contest.end_at:
+            return Response({'error': 'Contest has not ended yet'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if ContestFreezeService.request_unfreeze(contest):
+            return unfreezing_response()
+        lines = (
+            json.dumps(event, cls=DjangoJSONEncoder) + '\n'
+            for event in ContestFreezeService.resolver_events(contest)
+        )
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+
+class ContestExportView(APIView):
+    """Stream final standings or all submissions of a contest (admin)"""
+    authentication_classes = [CustomJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, contest_id, kind):
+        """
+        kind: 'standings' (ranking + per-problem cells) or 'submissions'
+        Query params:
+        - output: 'csv' (default) or 'ndjson' (`format` is taken by DRF content negotiation)
+        Rows are written as they are read from the database cursor.
+        """
+        if not request.user.has_role('admin'):
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            contest = Contest.objects.get(id=contest_id)
+        except Contest.DoesNotExist:
+            return Response({'error': 'Contest not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        export_format = request.query_params.get('output', 'csv').lower()
+        if kind not in ('standings', 'submissions') or export_format not in ContestExportService.FORMATS:
+            return Response({'error': 'Invalid export type or format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if kind == 'standings':
+            if ContestFreezeService.request_unfreeze(contest):
+                return unfreezing_response()
+            rows = ContestExportService.standings(contest)
+            if export_format == 'csv':
+                lines = ContestExportService.as_csv(
+                    ContestExportService.standings_header(contest),
+                    rows,
+                    ContestExportService.standings_csv_row
+                )
+        else:
+            rows = ContestExportService.submissions(contest)
+            if export_format == 'csv':
+                lines = ContestExportService.as_csv(ContestExportService.SUBMISSION_FIELDS, rows)
+
+        if export_format == 'ndjson':
+            response = StreamingHttpResponse(ContestExportService.as_ndjson(rows), content_type='application/x-ndjson')
+        else:
+            response = StreamingHttpResponse(lines, content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{contest.slug}-{kind}.{export_format}"'
+        return response
+
 
 class ContestRecalculateRankingsView(APIView):
     """Trigger a full rankings recalculation for a contest (admin utility)"""
@@ -1334,6 +1576,10 @@ class ContestRecalculateRankingsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, contest_id):
+        """
+        Queue a background recalculation job (django-q) and return 202 immediately
+        Returns the running job instead if one is already queued for the contest
+        """
         try:
             # Ensure contest exists
             try:
@@ -1341,21 +1587,38 @@ class ContestRecalculateRankingsView(APIView):
             except Contest.DoesNotExist:
                 return Response({'error': 'Contest not found'}, status=status.HTTP_404_NOT_FOUND)
 
-            # Recalculate rankings for all active participants
-            updated_count = ContestRankingService.recalculate_all_rankings(contest_id)
+            job, created = RankingJobService.enqueue(contest, request.user)
 
             return Response({
-                'message': 'Đã tính lại xếp hạng',
-                'updated_participants': updated_count,
+                'message': 'Đã đưa yêu cầu tính lại xếp hạng vào hàng đợi' if created else 'Đang tính lại xếp hạng',
                 'contest_id': contest.id,
-                'contest_slug': contest.slug
-            }, status=status.HTTP_200_OK)
+                'contest_slug': contest.slug,
+                'job': RankingJobService.status_payload(job)
+            }, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response({
                 'error': 'Không thể tính lại xếp hạng',
                 'details': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def get(self, request, contest_id):
+        """
+        Progress of a recalculation job (status, phase, percent, ETA)
+        Query params:
+        - job_id: job to report (default: latest job of the contest)
+        """
+        jobs = ContestRankingJob.objects.filter(contest_id=contest_id)
+        job_id = request.query_params.get('job_id')
+        if job_id:
+            if not job_id.isdigit():
+                return Response({'error': 'Invalid job_id'}, status=status.HTTP_400_BAD_REQUEST)
+            jobs = jobs.filter(id=job_id)
+
+        job = jobs.order_by('-created_at', '-id').first()
+        if job is None:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(RankingJobService.status_payload(job), status=status.HTTP_200_OK)
+
 
 class ContestStatisticsView(APIView):
     """Get contest statistics for admin dashboard - separated Practice and Contest"""
@@ -17,6 +17,21 @@ while ! nc -z db 3306; do
 done
 echo "DOMjudge database is ready!"
 
+# Service django_stream: chỉ phục vụ SSE stream (.../stream/) bằng ASGI worker,
+# migrate/collectstatic/superuser do django_backend làm
+if [ "$DJANGO_SERVER" = "asgi" ]; then
+  echo "Starting Gunicorn (ASGI, uvicorn worker)..."
+  exec gunicorn backend.asgi:application \
+      --bind 0.0.0.0:8000 \
+      --workers ${STREAM_WORKERS:-2} \
+      --worker-class uvicorn.workers.UvicornWorker \
+      --worker-tmp-dir /dev/shm \
+      --timeout 120 \
+      --access-logfile - \
+      --error-logfile - \
+      --log-level info
+fi
+
 # Run migrations
 echo "Running database migrations..."
 python manage.py migrate --noinput
@@ -0,0 +1,144 @@
+"""
+Outbox gửi bài lên DOMjudge
+
+SubmissionCreateView chỉ lưu submission với status `queued` rồi trả về 202,
+consumer (django-q task / poll_judgings) gửi các submission đang queued
+lên DOMjudge với số luồng giới hạn và retry theo exponential backoff
+(next_dispatch_at), để DOMjudge tạm ngừng vài phút không làm bài bị `error`.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Submissions
+from .domjudge_service import DOMjudgeService
+
+logger = logging.getLogger(__name__)
+
+
+class SubmissionDispatchService:
+    """Gửi submission trong outbox lên DOMjudge"""
+
+    BATCH_SIZE = 50
+    # Submission bị kẹt ở `dispatching` quá lâu (worker chết giữa chừng) sẽ được đưa lại vào queue
+    STALE_DISPATCH_MINUTES = 5
+
+    @staticmethod
+    def dispatch(submission):
+        """
+        Gửi một submission lên DOMjudge (đồng bộ)
+        Raises Exception nếu DOMjudge trả lỗi
+        """
+        domjudge_service = DOMjudgeService()
+        contest_id = submission.contest.slug if submission.contest else 'practice'
+        domjudge_response = domjudge_service.submit_code(
+            problem=submission.problem,
+            language=submission.language,
+            source_code=submission.code_text,
+            contest_id=contest_id,
+            team_id=submission.domjudge_team_id or 'exteam'
+        )
+
+        # Lưu submission ID từ DOMjudge
+        submission.domjudge_submission_id = domjudge_response.get('id') or domjudge_response.get('submitid')
+        submission.status = "judging"
+        submission.save(update_fields=['domjudge_submission_id', 'status', 'dispatch_attempts'])
+        return domjudge_response
+
+    @staticmethod
+    def dispatch_queued(batch_size=None, max_workers=None):
+        """
+        Gửi các submission đang queued
+
+        Returns:
+            dict: {'dispatched': int, 'retrying': int, 'failed': int}
+        """
+        batch_size = batch_size or SubmissionDispatchService.BATCH_SIZE
+        max_workers = max_workers or getattr(settings, 'SUBMISSION_DISPATCH_CONCURRENCY', 4)
+
+        SubmissionDispatchService._requeue_stale()
+        submissions = SubmissionDispatchService._claim(batch_size)
+        if not submissions:
+            return {'dispatched': 0, 'retrying': 0, 'failed': 0}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = list(executor.map(SubmissionDispatchService._dispatch_one, submissions))
+
+        return {
+            'dispatched': outcomes.count('dispatched'),
+            'retrying': outcomes.count('retrying'),
+            'failed': outcomes.count('failed'),
+        }
+
+    @staticmethod
+    def _claim(batch_size):
+        """
+        Đánh dấu `dispatching` cho một batch submission đang queued
+        UPDATE có điều kiện status nên hai consumer chạy song song không gửi trùng
+        """
+        now = timezone.now()
+        candidate_ids = list(
+            Submissions.objects.filter(status='queued')
+            .filter(Q(next_dispatch_at__isnull=True) | Q(next_dispatch_at__lte=now))
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        claimed = []
+        for submission_id in candidate_ids:
+            if Submissions.objects.filter(id=submission_id, status='queued').update(
+                status='dispatching',
+                dispatched_at=now
+            ):
+                claimed.append(submission_id)
+
+        return list(
+            Submissions.objects.filter(id__in=claimed)
+            .select_related('problem', 'language', 'contest')
+            .order_by('id')
+        )
+
+    @staticmethod
+    def _requeue_stale():
+        threshold = timezone.now() - timedelta(minutes=SubmissionDispatchService.STALE_DISPATCH_MINUTES)
+        Submissions.objects.filter(
+            status='dispatching',
+            dispatched_at__lt=threshold
+        ).update(status='queued')
+
+    @staticmethod
+    def retry_delay(attempts):
+        """Thời gian chờ trước lần gửi tiếp theo sau `attempts` lần gửi lỗi"""
+        base = getattr(settings, 'SUBMISSION_DISPATCH_RETRY_BASE_SECONDS', 5)
+        ceiling = getattr(settings, 'SUBMISSION_DISPATCH_RETRY_MAX_SECONDS', 300)
+        return timedelta(seconds=min(ceiling, base * 2 ** max(attempts - 1, 0)))
+
+    @staticmethod
+    def _dispatch_one(submission):
+        """Chạy trong thread pool; trả về 'dispatched' | 'retrying' | 'failed'"""
+        max_attempts = getattr(settings, 'SUBMISSION_DISPATCH_MAX_ATTEMPTS', 8)
+        try:
+            submission.dispatch_attempts += 1
+            SubmissionDispatchService.dispatch(submission)
+            return 'dispatched'
+        except Exception as e:
+            logger.warning(f"Dispatch submission {submission.id} failed (attempt {submission.dispatch_attempts}): {str(e)}")
+            submission.feedback = str(e)
+            if submission.dispatch_attempts < max_attempts:
+                submission.status = 'queued'
+                submission.next_dispatch_at = timezone.now() + SubmissionDispatchService.retry_delay(
+                    submission.dispatch_attempts
+                )
+                outcome = 'retrying'
+            else:
+                submission.status = 'error'
+                outcome = 'failed'
+            submission.save(update_fields=['status', 'feedback', 'dispatch_attempts', 'next_dispatch_at'])
+            return outcome
+        finally:
+            # Mỗi thread có connection DB riêng
+            connection.close()
@@ -1,5 +1,4 @@
 import pytz
-import requests
 import zipfile
 from io import BytesIO
 import re
@@ -7,6 +6,7 @@ from django.conf import settings
 from django.core.files.base import ContentFile
 from course.models import File
 from django.db import connections
+from common.domjudge_client import DOMjudgeClient
 
 def execute_raw_query(db_alias, query, params=None, fetch=False):
     """
@@ -33,6 +33,7 @@ class DOMjudgeService:
         self.api_url = getattr(settings, 'DOMJUDGE_API_URL', 'http://localhost:8080/api/v4')
         self.username = getattr(settings, 'DOMJUDGE_USERNAME', 'admin')
         self.password = getattr(settings, 'DOMJUDGE_PASSWORD', '12345')
+        self.client = DOMjudgeClient()
 
     def sync_problem(self, problem):
         """
@@ -217,9 +218,6 @@ exec python3 "$DIR/validator.py" "$@"
     def _upload_to_domjudge(self, problem, zip_file):
         """Upload problem ZIP lên DOMjudge qua API"""
         
-        url = f"{self.api_url}/problems"
-        method = 'POST'
-
         if problem.domjudge_problem_id:
             files = {'problem': (None, problem.domjudge_problem_id)}
         else:
@@ -229,11 +227,11 @@ exec python3 "$DIR/validator.py" "$@"
             # files = {'zip': (zip_file.filename, f, 'application/zip')}
             files['zip'] = (zip_file.filename, f, 'application/zip')
 
-            response = requests.request(
-                method=method,
-                url=url,
+            # Upload ZIP có thể lâu, nới read timeout
+            response = self.client.post(
+                'problems',
                 files=files,
-                auth=(self.username, self.password)
+                timeout=(self.client.timeout[0], 300)
             )
         
         if response.status_code in [200, 201]:
@@ -249,10 +247,7 @@ exec python3 "$DIR/validator.py" "$@"
             return
         
         try:
-            response = requests.delete(
-                f"{self.api_url}/problems/{domjudge_problem_id}",
-                auth=(self.username, self.password)
-            )
+            response = self.client.delete(f"problems/{domjudge_problem_id}")
             
             if response.status_code not in [200, 204]:
                 print(f"Failed to delete from DOMjudge: {response.text}")
@@ -267,9 +262,9 @@ exec python3 "$DIR/validator.py" "$@"
         """
         # Nếu có contest_id thì submit vào contest, không thì submit trực tiếp
         if contest_id:
-            url = f"{self.api_url}/contests/{contest_id}/submissions"
+            path = f"contests/{contest_id}/submissions"
         else:
-            url = f"{self.api_url}/submissions"
+            path = "submissions"
         
         # Xác định extension dựa trên language code
 
@@ -290,11 +285,10 @@ exec python3 "$DIR/validator.py" "$@"
             'code[]': (filename, source_code.encode('utf-8'), 'text/plain')
         }
         
-        response = requests.post(
-            url,
+        response = self.client.post(
+            path,
             data=data,
-            files=files,
-            auth=(self.username, self.password)
+            files=files
         )
         
         if response.status_code in [200, 201]:
@@ -304,12 +298,7 @@ exec python3 "$DIR/validator.py" "$@"
     
     def get_submission_result(self, submission_id):
         """Lấy kết quả submission từ DOMjudge"""
-        url = f"{self.api_url}/submissions/{submission_id}"
-        
-        response = requests.get(
-            url,
-            auth=(self.username, self.password)
-        )
+        response = self.client.get(f"submissions/{submission_id}")
         
         if response.status_code == 200:
             return response.json()
@@ -322,14 +311,11 @@ exec python3 "$DIR/validator.py" "$@"
         Returns: judgement data with judgement_type_id (AC, WA, TLE, etc.)
         """
         if contest_id:
-            url = f"{self.api_url}/contests/{contest_id}/judgements/{submission_id}"
+            path = f"contests/{contest_id}/judgements/{submission_id}"
         else:
-            url = f"{self.api_url}/judgements/{submission_id}"
+            path = f"judgements/{submission_id}"
         
-        response = requests.get(
-            url,
-            auth=(self.username, self.password)
-        )
+        response = self.client.get(path)
         
         if response.status_code == 200:
             return response.json()
@@ -337,56 +323,101 @@ exec python3 "$DIR/validator.py" "$@"
             # Nếu chưa có judgement, trả về None
             return None
     
+    JUDGEMENT_MAP = {
+        'final': {
+            'compiler-error': 'CE',
+            'memory-limit': 'MLE',
+            'output-limit': 'OLE',
+            'run-error': 'RTE',
+            'timelimit': 'TLE',
+            'wrong-answer': 'WA',
+            'no-output': 'NO',
+            'correct': 'AC',
+        },
+        'error': {
+            'aborted': 'JE',
+            'import-error': 'IE',
+        },
+        'in_progress': {
+            'judging': 'JU',
+            'pending': 'JU',
+            'queued': 'JU',
+        }
+    }
+
     def get_judgement_summary(self, submitid):
-        import datetime, pytz
-        
-        JUDGEMENT_MAP = {
-            'final': {
-                'compiler-error': 'CE',
-                'memory-limit': 'MLE',
-                'output-limit': 'OLE',
-                'run-error': 'RTE',
-                'timelimit': 'TLE',
-                'wrong-answer': 'WA',
-                'no-output': 'NO',
-                'correct': 'AC',
-            },
-            'error': {
-                'aborted': 'JE',
-                'import-error': 'IE',
-            },
-            'in_progress': {
-                'judging': 'JU',
-                'pending': 'JU',
-                'queued': 'JU',
-            }
+        """Lấy judging mới nhất của một submission"""
+        summaries = self.get_judgement_summaries([submitid])
+        return summaries.get(int(submitid))
+
+    def get_judgement_summaries(self, submitids):
+        """
+        Lấy judging mới nhất cho nhiều submission trong một query
+
+        Args:
+            submitids: list submitid trong DOMjudge
+
+        Returns:
+            dict {submitid (int): summary} - submission chưa có judging sẽ không có trong dict
+        """
+        submitids = list({int(sid) for sid in submitids if sid})
+        if not submitids:
+            return {}
+
+        placeholders = ','.join(['%s'] * len(submitids))
+        sql = f"""
+            SELECT j.judgingid, j.submitid,
+                j.starttime, j.endtime, j.max_runtime_for_verdict as maxruntime,
+                j.valid, j.result
+            FROM judging j
+            JOIN (
+                SELECT submitid, MAX(judgingid) AS judgingid
+                FROM judging
+                WHERE submitid IN ({placeholders})
+                GROUP BY submitid
+            ) latest ON latest.judgingid = j.judgingid
+        """
+        rows = execute_raw_query('domjudge', sql, submitids, fetch=True)
+
+        tz = pytz.timezone('Asia/Ho_Chi_Minh')
+        return {
+            int(row['submitid']): self._format_judgement_summary(row, tz)
+            for row in rows
         }
 
+    def get_judgings_after(self, judgingid, limit=1000):
+        """
+        Các judging có judgingid > `judgingid` (phát hiện rejudge ở chế độ poll)
+
+        Returns:
+            list dict {judgingid, submitid, result, valid, starttime, latest_judgingid}
+            (latest_judgingid: judging mới nhất của cùng submission)
+        """
         sql = """
-            SELECT judgingid, submitid,
-                starttime, endtime, max_runtime_for_verdict as maxruntime,
-                valid, result
-            FROM judging
-            WHERE submitid = %s
-            ORDER BY judgingid DESC
-            LIMIT 1
+            SELECT j.judgingid, j.submitid, j.result, j.valid, j.starttime,
+                (SELECT MAX(j2.judgingid) FROM judging j2 WHERE j2.submitid = j.submitid) AS latest_judgingid
+            FROM judging j
+            WHERE j.judgingid > %s
+            ORDER BY j.judgingid
+            LIMIT %s
         """
-        rows = execute_raw_query('domjudge', sql, [submitid], fetch=True)
-        if not rows:
-            return None
-        
-        j = rows[0]
+        return execute_raw_query('domjudge', sql, [int(judgingid), int(limit)], fetch=True)
 
-        # Chuyển decimal -> datetime
-        tz = pytz.timezone('Asia/Ho_Chi_Minh')
+    def get_latest_judging_id(self):
+        """judgingid lớn nhất hiện tại (0 nếu chưa có judging)"""
+        rows = execute_raw_query('domjudge', "SELECT MAX(judgingid) AS judgingid FROM judging", fetch=True)
+        return int(rows[0]['judgingid'] or 0) if rows else 0
+
+    def _format_judgement_summary(self, j, tz):
+        """Chuyển một row judging thành summary (map verdict + đổi timezone)"""
+        import datetime
 
-        start_dt = None
-        end_dt = None
         start_time_str = None
         end_time_str = None
         start_contest_time = None
         end_contest_time = None
 
+        # Chuyển decimal -> datetime
         if j['starttime'] is not None:
             start_dt = datetime.datetime.fromtimestamp(float(j['starttime']), tz)
             start_time_str = start_dt.isoformat()
@@ -396,12 +427,12 @@ exec python3 "$DIR/validator.py" "$@"
             end_dt = datetime.datetime.fromtimestamp(float(j['endtime']), tz)
             end_time_str = end_dt.isoformat()
             end_contest_time = end_dt.strftime("%H:%M:%S.%f")[:-3]
-            
+
         result_key = j['result']
         judgement_type_id = (
-            JUDGEMENT_MAP['final'].get(result_key)
-            or JUDGEMENT_MAP['error'].get(result_key)
-            or JUDGEMENT_MAP['in_progress'].get(result_key)
+            self.JUDGEMENT_MAP['final'].get(result_key)
+            or self.JUDGEMENT_MAP['error'].get(result_key)
+            or self.JUDGEMENT_MAP['in_progress'].get(result_key)
             or result_key  # fallback nếu chưa map
         )
         return {
@@ -421,28 +452,32 @@ exec python3 "$DIR/validator.py" "$@"
         Lấy danh sách submissions theo problem từ DOMjudge
         """
         if contest_id:
-            url = f"{self.api_url}/contests/{contest_id}/submissions"
+            path = f"contests/{contest_id}/submissions"
         else:
-            url = f"{self.api_url}/submissions"
+            path = "submissions"
         
         params = {'problem_id': problem_id}
         
-        response = requests.get(
-            url,
-            params=params,
-            auth=(self.username, self.password)
-        )
+        response = self.client.get(path, params=params)
         
         if response.status_code == 200:
             return response.json()
         else:
             raise Exception(f"Get submissions failed: {response.status_code}")
     
-    def get_detailed_judging_results(self, domjudge_submission_id):
+    # Giới hạn số byte output (stdout/stderr/diff/system) đọc cho mỗi test case
+    OUTPUT_PREVIEW_BYTES = 4096
+
+    def get_detailed_judging_results(self, domjudge_submission_id, include_output=False):
         """
-        Lấy chi tiết kết quả judging từ DOMjudge database
+        Lấy chi tiết kết quả judging từ DOMjudge database (một query duy nhất)
         Bao gồm: verdict, test case results, compile output, error messages
         
+        Args:
+            domjudge_submission_id: submitid trong DOMjudge
+            include_output: True để đọc thêm output/error/diff/system của từng test
+                (cắt tối đa OUTPUT_PREVIEW_BYTES byte mỗi trường)
+        
         Returns: {
             'verdict': 'AC' | 'WA' | 'TLE' | 'MLE' | 'RE' | 'CE',
             'compile_output': '...',
@@ -451,7 +486,7 @@ exec python3 "$DIR/validator.py" "$@"
                     'test_number': 1,
                     'verdict': 'AC',
                     'runtime': 0.02,
-                    'output': '...',
+                    'output': '...',   # chỉ có khi include_output=True
                     'error': '...'
                 },
                 ...
@@ -459,120 +494,114 @@ exec python3 "$DIR/validator.py" "$@"
         }
         """
         try:
-            # 1. Lấy judging ID từ submission ID
-            judging_query = """
-                SELECT 
-                    j.judgingid,
-                    j.result as verdict,
-                    j.output_compile
-                FROM judging j
-                WHERE j.submitid = %s 
-                    AND j.valid = 1
-                ORDER BY j.judgingid DESC
-                LIMIT 1
-            """
-            
-            judging_result = execute_raw_query(
-                'domjudge', 
-                judging_query, 
-                [domjudge_submission_id], 
-                fetch=True
+            results = self.get_detailed_judging_results_batch(
+                [domjudge_submission_id],
+                include_output=include_output
             )
-            
-            if not judging_result:
-                return {
-                    'verdict': 'pending',
-                    'message': 'Chưa có kết quả chấm'
-                }
-            
-            judging_data = judging_result[0]
-            judgingid = judging_data['judgingid']
-            verdict = judging_data['verdict']
-            
-            # 2. Lấy compile output nếu có
-            compile_output = ''
-            if judging_data['output_compile']:
-                try:
-                    compile_output = judging_data['output_compile'].decode('utf-8')
-                except:
-                    compile_output = str(judging_data['output_compile'])
-            
-            # 3. Lấy chi tiết test case results
-            runs_query = """
-                SELECT 
-                    jr.runid,
-                    jr.runresult as verdict,
-                    jr.runtime,
-                    tc.probid,
-                    tc.testcaseid,
-                    tc.md5sum_input,
-                    tc.md5sum_output,
-                    tc.description as test_description
-                FROM judging_run jr
-                JOIN testcase tc ON jr.testcaseid = tc.testcaseid
-                WHERE jr.judgingid = %s
-                    AND jr.endtime IS NOT NULL
-                ORDER BY jr.runid
-            """
-            
-            runs_result = execute_raw_query(
-                'domjudge',
-                runs_query,
-                [judgingid],
-                fetch=True
-            )
-            
-            test_cases = []
-            for idx, run in enumerate(runs_result, start=1):
-                # Lấy output chi tiết của run này
-                output_query = """
-                    SELECT 
-                        jro.output_run,
-                        jro.output_error,
-                        jro.output_diff,
-                        jro.output_system
-                    FROM judging_run_output jro
-                    WHERE jro.runid = %s
-                    LIMIT 1
-                """
-                
-                output_result = execute_raw_query(
-                    'domjudge',
-                    output_query,
-                    [run['runid']],
-                    fetch=True
-                )
-                
-                output_data = output_result[0] if output_result else {}
-                
-                # Decode blob data
-                def decode_blob(blob_data):
-                    if not blob_data:
-                        return ''
-                    try:
-                        return blob_data.decode('utf-8')
-                    except:
-                        return str(blob_data)
-                
-                test_cases.append({
-                    'test_number': idx,  # Use enumeration index as test number
-                    'verdict': run['verdict'] or 'pending',
-                    'runtime': float(run['runtime']) if run['runtime'] else 0,
-                    'description': run['test_description'],
-                    'output': decode_blob(output_data.get('output_run')),
-                    'error': decode_blob(output_data.get('output_error')),
-                    'diff': decode_blob(output_data.get('output_diff')),
-                    'system': decode_blob(output_data.get('output_system'))
-                })
-            
-            return {
-                'verdict': verdict,
-                'compile_output': compile_output,
-                'test_cases': test_cases
-            }
-            
         except Exception as e:
             return {
                 'verdict': 'error',
                 'message': f'Error getting detailed results: {str(e)}'
-            }
\ No newline at end of file
+            }
+        
+        result = results.get(int(domjudge_submission_id))
+        if not result:
+            return {
+                'verdict': 'pending',
+                'message': 'Chưa có kết quả chấm'
+            }
+        return result
+    
+    def get_detailed_judging_results_batch(self, submitids, include_output=False):
+        """
+        Lấy chi tiết judging hợp lệ mới nhất cho nhiều submission trong một query
+        
+        Returns:
+            dict {submitid (int): detailed result} - submission chưa có judging hợp lệ sẽ không có trong dict
+        """
+        submitids = list({int(sid) for sid in submitids if sid})
+        if not submitids:
+            return {}
+        
+        output_columns = ''
+        output_join = ''
+        params = []
+        if include_output:
+            cap = self.OUTPUT_PREVIEW_BYTES
+            output_columns = """,
+                    SUBSTRING(jro.output_run, 1, %s) AS output_run,
+                    SUBSTRING(jro.output_error, 1, %s) AS output_error,
+                    SUBSTRING(jro.output_diff, 1, %s) AS output_diff,
+                    SUBSTRING(jro.output_system, 1, %s) AS output_system"""
+            output_join = "LEFT JOIN judging_run_output jro ON jro.runid = jr.runid"
+            params.extend([cap, cap, cap, cap])
+        
+        placeholders = ','.join(['%s'] * len(submitids))
+        query = f"""
+            SELECT 
+                j.submitid,
+                j.judgingid,
+                j.result as verdict,
+                j.output_compile,
+                jr.runid,
+                jr.runresult as run_verdict,
+                jr.runtime,
+                tc.description as test_description{output_columns}
+            FROM judging j
+            JOIN (
+                SELECT submitid, MAX(judgingid) AS judgingid
+                FROM judging
+                WHERE submitid IN ({placeholders})
+                    AND valid = 1
+                GROUP BY submitid
+            ) latest ON latest.judgingid = j.judgingid
+            LEFT JOIN judging_run jr ON jr.judgingid = j.judgingid
+                AND jr.endtime IS NOT NULL
+            LEFT JOIN testcase tc ON jr.testcaseid = tc.testcaseid
+            {output_join}
+            ORDER BY j.submitid, jr.runid
+        """
+        params.extend(submitids)
+        rows = execute_raw_query('domjudge', query, params, fetch=True)
+        
+        results = {}
+        for row in rows:
+            submitid = int(row['submitid'])
+            result = results.get(submitid)
+            if result is None:
+                result = results[submitid] = {
+                    'judging_id': row['judgingid'],
+                    'verdict': row['verdict'],
+                    'compile_output': self._decode_blob(row['output_compile']),
+                    'test_cases': []
+                }
+            
+            # LEFT JOIN: judging chưa có run nào (vd: compiler-error)
+            if row['runid'] is None:
+                continue
+            
+            test_case = {
+                'test_number': len(result['test_cases']) + 1,
+                'verdict': row['run_verdict'] or 'pending',
+                'runtime': float(row['runtime']) if row['runtime'] else 0,
+                'description': row['test_description'],
+            }
+            if include_output:
+                test_case.update({
+                    'output': self._decode_blob(row['output_run']),
+                    'error': self._decode_blob(row['output_error']),
+                    'diff': self._decode_blob(row['output_diff']),
+                    'system': self._decode_blob(row['output_system'])
+                })
+            result['test_cases'].append(test_case)
+        
+        return results
+    
+    @staticmethod
+    def _decode_blob(blob_data):
+        """Decode blob từ DOMjudge (có thể bị cắt giữa ký tự UTF-8)"""
+        if not blob_data:
+            return ''
+        if isinstance(blob_data, str):
+            return blob_data
+        return bytes(blob_data).decode('utf-8', errors='replace')
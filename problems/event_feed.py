@@ -0,0 +1,212 @@
+"""
+Ingester cho DOMjudge event-feed (NDJSON)
+
+Áp dụng event `judgements` và `runs` vào bảng submissions ngay khi DOMjudge
+phát ra, thay cho việc poll bảng judging. Vị trí đã đọc (token) được lưu
+trong EventFeedState để resume sau khi restart.
+
+Judgement đến trước khi domjudge_submission_id được lưu (dispatch chưa commit)
+được giữ lại và thử áp dụng lại ở mỗi checkpoint trong PARK_SECONDS; sau đó
+(hoặc nếu consumer restart) verdict được lấy bởi đối soát định kỳ
+(sync_judging_submissions, DOMJUDGE_RECONCILE_AFTER_SECONDS).
+"""
+import json
+import logging
+import time
+
+from .models import Submissions, EventFeedState
+from .judging_service import JudgingSyncService, JudgingResultCache
+
+logger = logging.getLogger(__name__)
+
+
+class EventFeedIngester:
+    """Xử lý từng dòng event-feed của một contest DOMjudge"""
+
+    # Lưu token sau mỗi N event hoặc mỗi CHECKPOINT_SECONDS giây
+    CHECKPOINT_EVERY = 50
+    CHECKPOINT_SECONDS = 1.0
+    # Thời gian giữ judgement chưa tìm thấy submission
+    PARK_SECONDS = 300
+
+    # judgement_type_id của run -> verdict dạng DOMjudge DB (JudgingSyncService đếm 'correct')
+    RUN_VERDICT_MAP = {
+        'AC': 'correct',
+        'WA': 'wrong-answer',
+        'TLE': 'timelimit',
+        'RTE': 'run-error',
+        'MLE': 'memory-limit',
+        'OLE': 'output-limit',
+        'NO': 'no-output',
+    }
+
+    def __init__(self, domjudge_contest_id):
+        self.state, _ = EventFeedState.objects.get_or_create(
+            domjudge_contest_id=domjudge_contest_id
+        )
+        # judgement_id -> {'submission_id', 'runs': {ordinal: verdict}, 'complete': bool}
+        self.judgements = {}
+        # domjudge submission id -> (judgement data, entry, thời điểm nhận)
+        self.parked = {}
+        self._unsaved = 0
+        self._last_checkpoint = time.monotonic()
+
+    @property
+    def last_token(self):
+        return self.state.last_token
+
+    def reset(self):
+        """Đọc lại feed từ đầu"""
+        self.state.last_token = None
+        self.state.events_processed = 0
+        self.state.save()
+
+    def process_line(self, line):
+        """Xử lý một dòng NDJSON (dòng rỗng là keep-alive)"""
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = (line or '').strip()
+        if not line:
+            return
+
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning(f"[Event Feed] Invalid line skipped: {line[:200]}")
+            return
+
+        event_type = event.get('type')
+        data = event.get('data')
+        # Event bị xóa: format mới data = null, format cũ op = 'delete'
+        if data and event.get('op') != 'delete':
+            try:
+                if event_type == 'judgements':
+                    self._on_judgement(data)
+                elif event_type == 'runs':
+                    self._on_run(data)
+            except Exception as e:
+                logger.error(f"[Event Feed] Failed to apply {event_type} event: {str(e)}")
+
+        self._advance(event.get('token') or event.get('id'))
+
+    def flush(self):
+        """Lưu token hiện tại, thử lại các judgement đang chờ submission"""
+        if self._unsaved:
+            self.state.save(update_fields=['last_token', 'events_processed', 'updated_at'])
+            self._unsaved = 0
+        self._last_checkpoint = time.monotonic()
+        if self.parked:
+            self._retry_parked()
+
+    def _retry_parked(self):
+        submissions = Submissions.objects.filter(
+            domjudge_submission_id__in=list(self.parked)
+        ).select_related('contest')
+        for submission in submissions:
+            data, entry, _ = self.parked.pop(submission.domjudge_submission_id)
+            try:
+                self._apply(submission, data, entry)
+            except Exception as e:
+                logger.error(f"[Event Feed] Failed to apply parked judgement {data.get('id')}: {str(e)}")
+
+        expired_before = time.monotonic() - self.PARK_SECONDS
+        for submitid, (data, _, parked_at) in list(self.parked.items()):
+            if parked_at < expired_before:
+                del self.parked[submitid]
+                logger.info(
+                    f"[Event Feed] No submission for DOMjudge submission {submitid} "
+                    f"(judgement {data.get('id')}), left to reconciliation"
+                )
+
+    def _advance(self, token):
+        if token is None:
+            return
+        self.state.last_token = str(token)
+        self.state.events_processed += 1
+        self._unsaved += 1
+        if (self._unsaved >= self.CHECKPOINT_EVERY
+                or time.monotonic() - self._last_checkpoint >= self.CHECKPOINT_SECONDS):
+            self.flush()
+
+    def _on_run(self, data):
+        judgement_id = str(data.get('judgement_id'))
+        entry = self.judgements.setdefault(judgement_id, {
+            'submission_id': None,
+            'runs': {},
+            'complete': False,  # bỏ lỡ event bắt đầu judging (restart giữa chừng)
+        })
+        verdict = data.get('judgement_type_id')
+        entry['runs'][data.get('ordinal')] = self.RUN_VERDICT_MAP.get(verdict, verdict)
+
+    def _on_judgement(self, data):
+        judgement_id = str(data.get('id'))
+        entry = self.judgements.get(judgement_id)
+        judgement_type = data.get('judgement_type_id')
+
+        if entry is None:
+            entry = self.judgements[judgement_id] = {
+                'submission_id': None,
+                'runs': {},
+                # Event đầu tiên chưa có verdict = judging vừa bắt đầu, sẽ thấy đủ runs
+                'complete': not judgement_type,
+            }
+        entry['submission_id'] = data.get('submission_id')
+
+        # Judging đang chạy, chờ event cập nhật verdict
+        if not judgement_type:
+            return
+
+        self.judgements.pop(judgement_id, None)
+        if data.get('valid') is False:
+            return
+
+        submission = self._find_submission(entry['submission_id'])
+        if submission is None:
+            try:
+                # Có thể dispatch chưa lưu domjudge_submission_id: thử lại ở checkpoint sau
+                self.parked[int(entry['submission_id'])] = (data, entry, time.monotonic())
+            except (TypeError, ValueError):
+                pass
+            return
+        self._apply(submission, data, entry)
+
+    def _apply(self, submission, data, entry):
+        judgement_type = data.get('judgement_type_id')
+        detailed = self._detailed_results(submission, judgement_type, entry)
+        judgement = {
+            'judgement_type_id': judgement_type,
+            'valid': True,
+            'max_run_time': data.get('max_run_time') or 0,
+            'start_contest_time': data.get('start_contest_time'),
+            'end_contest_time': data.get('end_contest_time'),
+        }
+        if JudgingSyncService.apply_judgement(submission, judgement, detailed):
+            # Cache chi tiết (kèm output) sẽ được lấy lại lần đầu mở detail view
+            JudgingResultCache.invalidate([submission.id])
+            JudgingSyncService.update_rankings([submission])
+
+    def _detailed_results(self, submission, judgement_type, entry):
+        if judgement_type == 'CE':
+            return {'test_cases': []}
+        if entry['complete']:
+            return {
+                'test_cases': [
+                    {'verdict': verdict}
+                    for _, verdict in sorted(entry['runs'].items(), key=lambda item: item[0] or 0)
+                ]
+            }
+
+        # Restart giữa lúc đang chấm: thiếu một phần runs, đọc lại một lần từ DOMjudge
+        from .domjudge_service import DOMjudgeService
+        submitid = int(submission.domjudge_submission_id)
+        return DOMjudgeService().get_detailed_judging_results_batch([submitid]).get(submitid)
+
+    @staticmethod
+    def _find_submission(domjudge_submission_id):
+        try:
+            submitid = int(domjudge_submission_id)
+        except (TypeError, ValueError):
+            return None
+        return Submissions.objects.filter(
+            domjudge_submission_id=submitid
+        ).select_related('contest').first()
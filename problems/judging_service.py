@@ -0,0 +1,341 @@
+"""
+Service đồng bộ kết quả chấm từ DOMjudge về bảng submissions.
+
+Chạy ngoài request (django-q task hoặc management command `poll_judgings`)
+để các API list/detail chỉ đọc dữ liệu local.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Submissions, SubmissionJudgingResult, JudgingSyncState
+from .domjudge_service import DOMjudgeService
+
+logger = logging.getLogger(__name__)
+
+# Submission chưa có verdict cuối cùng (queued/dispatching: đang nằm trong outbox)
+IN_FLIGHT_STATUSES = ('queued', 'dispatching', 'pending', 'judging')
+
+
+class JudgingSyncService:
+    """Resolve verdict cho các submission đang `judging`"""
+
+    BATCH_SIZE = 100
+
+    # judgingid đã quét để phát hiện rejudge (sync_rejudged), lưu trong JudgingSyncState
+    JUDGING_WATERMARK_NAME = 'rejudge_scan'
+    REJUDGE_SCAN_LIMIT = 1000
+    # Judging chưa xong / rejudge chưa áp dụng quá N giây thì bỏ qua, không chặn watermark
+    REJUDGE_WAIT_SECONDS = 3600
+
+    @staticmethod
+    def pending_submissions(older_than=None):
+        """
+        Các submission đang chờ kết quả từ DOMjudge
+        older_than: chỉ lấy submission nộp trước N giây (optional)
+        """
+        submissions = Submissions.objects.filter(
+            status='judging',
+            domjudge_submission_id__isnull=False
+        )
+        if older_than is not None:
+            submissions = submissions.filter(submitted_at__lt=timezone.now() - timedelta(seconds=older_than))
+        return submissions.select_related('contest').order_by('id')
+
+    @staticmethod
+    def sync_pending(batch_size=None, older_than=None):
+        """
+        Đồng bộ tất cả submission đang judging theo từng batch
+        older_than: chỉ đồng bộ submission nộp trước N giây (đối soát khi dùng event-feed)
+
+        Returns:
+            dict: {'checked': int, 'resolved': int}
+        """
+        batch_size = batch_size or JudgingSyncService.BATCH_SIZE
+        checked = 0
+        resolved = 0
+        last_id = 0
+
+        while True:
+            batch = list(
+                JudgingSyncService.pending_submissions(older_than).filter(id__gt=last_id)[:batch_size]
+            )
+            if not batch:
+                break
+
+            last_id = batch[-1].id
+            checked += len(batch)
+            resolved += JudgingSyncService.sync_submissions(batch)
+
+        return {'checked': checked, 'resolved': resolved}
+
+    @staticmethod
+    def sync_rejudged():
+        """
+        Phát hiện rejudge khi không dùng event-feed: quét các judging mới
+        (judgingid > watermark) của DOMjudge, đồng bộ lại các submission local đã
+        có verdict nếu judging mới nhất khác judging đã lưu
+
+        Watermark dừng trước judging đang chạy hoặc rejudge chưa được áp dụng
+        (judging mới nhất nhưng valid = 0), để lần quét sau xét lại.
+
+        Returns:
+            dict: {'checked': int, 'rejudged': int}
+        """
+        domjudge_service = DOMjudgeService()
+        state, _ = JudgingSyncState.objects.get_or_create(name=JudgingSyncService.JUDGING_WATERMARK_NAME)
+        watermark = state.last_judging_id
+        if watermark is None:
+            # Lần đầu: bắt đầu từ judging hiện tại
+            state.last_judging_id = domjudge_service.get_latest_judging_id()
+            state.save(update_fields=['last_judging_id', 'updated_at'])
+            return {'checked': 0, 'rejudged': 0}
+
+        rows = domjudge_service.get_judgings_after(watermark, JudgingSyncService.REJUDGE_SCAN_LIMIT)
+        if not rows:
+            return {'checked': 0, 'rejudged': 0}
+
+        expired_before = time.time() - JudgingSyncService.REJUDGE_WAIT_SECONDS
+        new_watermark = watermark
+        for row in rows:
+            pending = row['result'] is None or (
+                not row['valid'] and row['judgingid'] == row['latest_judgingid']
+            )
+            if pending and row['starttime'] is not None and float(row['starttime']) >= expired_before:
+                break
+            new_watermark = row['judgingid']
+
+        submissions = list(
+            Submissions.objects.filter(
+                domjudge_submission_id__in={int(row['submitid']) for row in rows}
+            ).exclude(status__in=IN_FLIGHT_STATUSES).select_related('contest')
+        )
+        rejudged = JudgingSyncService.sync_submissions(submissions, changed_only=True) if submissions else 0
+        # Chỉ tiến lên: lần quét chạy song song (task + poll_judgings) không kéo watermark lùi
+        JudgingSyncState.objects.filter(id=state.id, last_judging_id__lt=new_watermark).update(
+            last_judging_id=new_watermark,
+            updated_at=timezone.now()
+        )
+        return {'checked': len(submissions), 'rejudged': rejudged}
+
+    @staticmethod
+    def sync_submissions(submissions, changed_only=False):
+        """
+        Đồng bộ một nhóm submission, sau đó cập nhật ranking một lần
+        cho mỗi cặp (contest, user) bị ảnh hưởng
+
+        Cache chi tiết (JudgingResultCache) có judging id khác judging mới nhất
+        (rejudge) bị xóa trước khi ghi verdict.
+        changed_only: chỉ ghi lại submission có verdict hoặc judging khác đã lưu
+        (submission đã final, xem sync_rejudged)
+
+        Returns:
+            int: số submission đã có verdict cuối cùng (đã ghi lại)
+        """
+        domjudge_service = DOMjudgeService()
+        submissions = [s for s in submissions if s.domjudge_submission_id]
+        if not submissions:
+            return 0
+
+        # Một query lấy judging mới nhất cho cả batch
+        try:
+            judgements = domjudge_service.get_judgement_summaries(
+                [s.domjudge_submission_id for s in submissions]
+            )
+        except Exception as e:
+            logger.error(f"Failed to fetch judgement summaries: {str(e)}")
+            return 0
+
+        cached_judging_ids = JudgingResultCache.judging_ids([s.id for s in submissions])
+        stale = [
+            submission for submission in submissions
+            if submission.id in cached_judging_ids
+            and int(submission.domjudge_submission_id) in judgements
+            and cached_judging_ids[submission.id] != int(judgements[int(submission.domjudge_submission_id)]['id'])
+        ]
+        if stale:
+            JudgingResultCache.invalidate([submission.id for submission in stale])
+        if changed_only:
+            stale_ids = {submission.id for submission in stale}
+            submissions = [
+                submission for submission in submissions
+                if submission.id in stale_ids
+                or ((judgements.get(int(submission.domjudge_submission_id)) or {}).get('judgement_type_id') or '').lower()
+                != (submission.status or '').lower()
+            ]
+            if not submissions:
+                return 0
+
+        # Chi tiết test case (output đã cắt) cho các submission đã có verdict, cũng một query
+        finished_ids = [
+            sid for sid, judgement in judgements.items()
+            if judgement.get('valid') and judgement.get('judgement_type_id') not in (None, 'JU')
+        ]
+        try:
+            detailed_results = domjudge_service.get_detailed_judging_results_batch(
+                finished_ids,
+                include_output=True
+            )
+        except Exception as e:
+            logger.warning(f"Failed to get detailed results: {str(e)}")
+            detailed_results = {}
+
+        resolved = []
+        for submission in submissions:
+            submitid = int(submission.domjudge_submission_id)
+            judgement = judgements.get(submitid)
+            if not judgement or not judgement.get('valid'):
+                continue
+            try:
+                detailed = detailed_results.get(submitid)
+                if JudgingSyncService.apply_judgement(submission, judgement, detailed):
+                    resolved.append(submission)
+                    if detailed:
+                        JudgingResultCache.store(submission, detailed)
+            except Exception as e:
+                logger.error(f"Failed to sync submission {submission.id}: {str(e)}")
+
+        JudgingSyncService.update_rankings(resolved)
+        return len(resolved)
+
+    @staticmethod
+    def apply_judgement(submission, judgement, detailed_results=None):
+        """
+        Ghi verdict vào submission
+
+        Returns:
+            bool: True nếu đã ghi, False nếu judging vẫn đang chạy
+        """
+        # result = NULL trong DOMjudge nghĩa là judging chưa xong
+        judgement_type = judgement.get('judgement_type_id')
+        if not judgement_type or judgement_type == 'JU':
+            return False
+
+        submission.status = judgement_type.lower()
+
+        # Tính test_passed và test_total từ chi tiết test cases
+        if detailed_results and 'test_cases' in detailed_results:
+            test_cases = detailed_results['test_cases']
+            submission.test_total = len(test_cases)
+            submission.test_passed = sum(
+                1 for tc in test_cases
+                if (tc.get('verdict') or '').lower() == 'correct'
+            )
+
+        # Score: AC thì 100, không thì 0
+        submission.score = 100.00 if judgement_type == 'AC' else 0.00
+
+        feedback_parts = [
+            f"Judgement: {judgement_type}",
+            f"Max run time: {judgement.get('max_run_time', 0)}s",
+            f"Start time: {judgement.get('start_contest_time') or 'N/A'}",
+            f"End time: {judgement.get('end_contest_time') or 'N/A'}"
+        ]
+        submission.feedback = "\n".join(feedback_parts)
+        submission.save(update_fields=['status', 'score', 'test_passed', 'test_total', 'feedback'])
+        return True
+
+    @staticmethod
+    def update_rankings(submissions):
+        """Cập nhật ranking cho các contest có submission vừa có verdict"""
+        from contests.ranking_service import ContestRankingService
+
+        # Cập nhật tăng dần theo thứ tự nộp bài
+        for submission in sorted(submissions, key=lambda s: (s.submitted_at, s.id)):
+            if not submission.contest_id:
+                continue
+            try:
+                ContestRankingService.apply_submission_result(submission)
+            except Exception as e:
+                logger.error(
+                    f"Failed to update ranking for user {submission.user_id} "
+                    f"in contest {submission.contest_id}: {str(e)}"
+                )
+
+
+class JudgingResultCache:
+    """
+    Cache local cho chi tiết judging đã final (bảng submission_judging_results)
+    DOMjudge chỉ được hỏi khi submission đang chấm, bị rejudge hoặc chưa có cache
+    """
+
+    OUTPUT_FIELDS = ('output', 'error', 'diff', 'system')
+
+    @staticmethod
+    def store(submission, detailed):
+        """Lưu (hoặc ghi đè) chi tiết judging của submission"""
+        SubmissionJudgingResult.objects.update_or_create(
+            submission=submission,
+            defaults={
+                'domjudge_judging_id': detailed.get('judging_id'),
+                'verdict': detailed.get('verdict'),
+                'compile_output': detailed.get('compile_output') or '',
+                'test_cases': detailed.get('test_cases') or [],
+            }
+        )
+
+    @staticmethod
+    def judging_ids(submission_ids):
+        """{submission_id: domjudge_judging_id} của các cache đang có"""
+        return dict(
+            SubmissionJudgingResult.objects.filter(
+                submission_id__in=submission_ids
+            ).values_list('submission_id', 'domjudge_judging_id')
+        )
+
+    @staticmethod
+    def invalidate(submission_ids):
+        """Xóa cache (vd: khi submission bị rejudge)"""
+        SubmissionJudgingResult.objects.filter(submission_id__in=submission_ids).delete()
+
+    @staticmethod
+    def get_detailed_results(submission, include_output=False):
+        """
+        Chi tiết judging cho detail view
+        - Submission đang chấm: đọc trực tiếp DOMjudge
+        - Submission đã final: đọc cache, nếu chưa có thì lấy từ DOMjudge một lần rồi lưu lại
+        """
+        if not submission.domjudge_submission_id:
+            return None
+
+        service = DOMjudgeService()
+        if submission.status in IN_FLIGHT_STATUSES:
+            return service.get_detailed_judging_results(
+                submission.domjudge_submission_id,
+                include_output=include_output
+            )
+
+        cached = SubmissionJudgingResult.objects.filter(submission=submission).first()
+        if cached is None:
+            detailed = service.get_detailed_judging_results_batch(
+                [submission.domjudge_submission_id],
+                include_output=True
+            ).get(int(submission.domjudge_submission_id))
+            if not detailed:
+                return {
+                    'verdict': 'pending',
+                    'message': 'Chưa có kết quả chấm'
+                }
+            if detailed.get('verdict'):
+                JudgingResultCache.store(submission, detailed)
+            test_cases = detailed['test_cases']
+            verdict = detailed['verdict']
+            compile_output = detailed['compile_output']
+        else:
+            test_cases = cached.test_cases
+            verdict = cached.verdict
+            compile_output = cached.compile_output
+
+        if not include_output:
+            test_cases = [
+                {k: v for k, v in tc.items() if k not in JudgingResultCache.OUTPUT_FIELDS}
+                for tc in test_cases
+            ]
+
+        return {
+            'verdict': verdict,
+            'compile_output': compile_output,
+            'test_cases': test_cases
+        }
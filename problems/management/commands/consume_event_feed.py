@@ -0,0 +1,113 @@
+"""
+Django Management Command: Consume DOMjudge event-feed
+
+Đọc stream NDJSON `/contests/{id}/event-feed` và cập nhật verdict cho
+submissions ngay khi DOMjudge chấm xong. Resume từ token đã lưu.
+Chạy một process cho mỗi contest DOMjudge.
+
+Usage:
+    python manage.py consume_event_feed --contest practice
+    python manage.py consume_event_feed --contest practice --feed-file events.ndjson
+"""
+import sys
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from common.domjudge_client import DOMjudgeClient
+from problems.event_feed import EventFeedIngester
+
+
+class Command(BaseCommand):
+    help = 'Cập nhật verdict từ DOMjudge event-feed (thay cho poll judging)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--contest',
+            type=str,
+            required=True,
+            help='ID contest trong DOMjudge (slug, vd: practice)',
+        )
+        parser.add_argument(
+            '--feed-file',
+            type=str,
+            help="Đọc event từ file NDJSON thay vì DOMjudge ('-' = stdin)",
+        )
+        parser.add_argument(
+            '--from-start',
+            action='store_true',
+            help='Bỏ qua token đã lưu, đọc lại feed từ đầu',
+        )
+        parser.add_argument(
+            '--idle-timeout',
+            type=float,
+            default=60.0,
+            help='Số giây không nhận được dữ liệu thì kết nối lại',
+        )
+
+    def handle(self, *args, **options):
+        ingester = EventFeedIngester(options['contest'])
+        if options['from_start']:
+            ingester.reset()
+
+        if options['feed_file']:
+            self._consume_file(ingester, options['feed_file'])
+            return
+
+        self._consume_stream(ingester, options['contest'], options['idle_timeout'])
+
+    def _consume_file(self, ingester, path):
+        stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+        try:
+            for line in stream:
+                ingester.process_line(line)
+        finally:
+            ingester.flush()
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed feed file, last token: {ingester.last_token}'
+        ))
+
+    def _consume_stream(self, ingester, contest_id, idle_timeout):
+        client = DOMjudgeClient()
+        backoff = 1
+
+        while True:
+            params = {'stream': 'true'}
+            if ingester.last_token:
+                params['since_token'] = ingester.last_token
+
+            self.stdout.write(f'Connecting to event-feed of {contest_id} (since_token={ingester.last_token})')
+            try:
+                close_old_connections()
+                with client.get(
+                    f'contests/{contest_id}/event-feed',
+                    params=params,
+                    stream=True,
+                    timeout=(client.timeout[0], idle_timeout)
+                ) as response:
+                    if response.status_code != 200:
+                        raise requests.exceptions.RequestException(
+                            f'HTTP {response.status_code}: {response.text[:200]}'
+                        )
+                    backoff = 1
+                    for line in response.iter_lines():
+                        ingester.process_line(line)
+                # Server đóng stream (contest kết thúc hoặc restart)
+                ingester.flush()
+                self.stdout.write('Event-feed closed by server, reconnecting')
+
+            except KeyboardInterrupt:
+                ingester.flush()
+                self.stdout.write(self.style.SUCCESS(f'Stopped at token {ingester.last_token}'))
+                return
+            except requests.exceptions.RequestException as e:
+                ingester.flush()
+                self.stderr.write(self.style.ERROR(f'Event-feed error: {str(e)}'))
+
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
@@ -0,0 +1,97 @@
+"""
+Django Management Command: Poll DOMjudge judgings
+
+Worker chạy liên tục: gửi các submission trong outbox lên DOMjudge và
+đồng bộ verdict cho các submission đang judging (và submission bị rejudge),
+để API list/detail không phải gọi DOMjudge trong request.
+
+Usage: python manage.py poll_judgings [--interval 2] [--once] [--no-dispatch]
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from problems.judging_service import JudgingSyncService
+from problems.dispatch_service import SubmissionDispatchService
+
+
+class Command(BaseCommand):
+    help = 'Đồng bộ verdict từ DOMjudge cho các submission đang judging'
+
+    # Chế độ event-feed: số giây giữa hai lần đối soát submission judging quá lâu
+    RECONCILE_INTERVAL = 60
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Số giây nghỉ giữa hai lần poll',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=JudgingSyncService.BATCH_SIZE,
+            help='Số submission xử lý mỗi batch',
+        )
+        parser.add_argument(
+            '--no-dispatch',
+            action='store_true',
+            help='Không gửi submission trong outbox (chỉ đồng bộ verdict)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Chỉ chạy một lần rồi thoát',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        batch_size = options['batch_size']
+        # Verdict đến từ consume_event_feed: chỉ đối soát định kỳ submission judging quá lâu
+        event_feed = settings.DOMJUDGE_VERDICT_SOURCE == 'event-feed'
+        last_reconcile = None
+
+        self.stdout.write(self.style.SUCCESS(f'Judging poller started (interval={interval}s)'))
+
+        while True:
+            close_old_connections()
+            if not options['no_dispatch']:
+                try:
+                    dispatched = SubmissionDispatchService.dispatch_queued()
+                    if any(dispatched.values()):
+                        self.stdout.write(
+                            f"Dispatched {dispatched['dispatched']}, retrying {dispatched['retrying']}, "
+                            f"failed {dispatched['failed']}"
+                        )
+                except Exception as e:
+                    self.stderr.write(self.style.ERROR(f'Dispatch failed: {str(e)}'))
+
+            reconcile_due = last_reconcile is None or time.monotonic() - last_reconcile >= self.RECONCILE_INTERVAL
+            if not event_feed or reconcile_due:
+                last_reconcile = time.monotonic()
+                try:
+                    result = JudgingSyncService.sync_pending(
+                        batch_size=batch_size,
+                        older_than=settings.DOMJUDGE_RECONCILE_AFTER_SECONDS if event_feed else None
+                    )
+                    if result['checked']:
+                        self.stdout.write(
+                            f"Checked {result['checked']} submissions, resolved {result['resolved']}"
+                        )
+                except Exception as e:
+                    self.stderr.write(self.style.ERROR(f'Poll failed: {str(e)}'))
+
+            if not event_feed:
+                try:
+                    rejudged = JudgingSyncService.sync_rejudged()
+                    if rejudged['rejudged']:
+                        self.stdout.write(f"Re-synced {rejudged['rejudged']} rejudged submissions")
+                except Exception as e:
+                    self.stderr.write(self.style.ERROR(f'Rejudge scan failed: {str(e)}'))
+
+            if options['once']:
+                break
+            time.sleep(interval)
@@ -181,10 +181,62 @@ class Submissions(models.Model):
     test_total = models.IntegerField(null=True, blank=True, help_text="Total number of test cases (for OI mode)")
     feedback = models.TextField(null=True, blank=True)
     domjudge_submission_id = models.BigIntegerField(null=True, blank=True)
+    domjudge_team_id = models.CharField(max_length=100, null=True, blank=True, help_text="Team gửi bài lên DOMjudge (outbox)")
+    dispatch_attempts = models.IntegerField(default=0, help_text="Số lần thử gửi bài lên DOMjudge (outbox)")
+    dispatched_at = models.DateTimeField(null=True, blank=True, help_text="Thời điểm consumer nhận gửi bài (outbox)")
+    next_dispatch_at = models.DateTimeField(null=True, blank=True, help_text="Không gửi lại trước thời điểm này (backoff khi gửi lỗi)")
 
     class Meta:
         db_table = "submissions"
         ordering = ["-submitted_at"]
 
     def __str__(self):
-        return f"Submission #{self.id} by {self.user.username} for {self.problem.title}"
\ No newline at end of file
+        return f"Submission #{self.id} by {self.user.username} for {self.problem.title}"
+
+class SubmissionJudgingResult(models.Model):
+    """
+    Chi tiết judging đã chốt của một submission (cache local từ DOMjudge)
+    Chỉ lưu khi verdict đã final, detail view đọc từ đây thay vì DOMjudge
+    """
+    id = models.BigAutoField(primary_key=True)
+    submission = models.OneToOneField(Submissions, on_delete=models.CASCADE, related_name="judging_result")
+    domjudge_judging_id = models.BigIntegerField(null=True, blank=True, help_text="judgingid trong DOMjudge (để phát hiện rejudge)")
+    verdict = models.CharField(max_length=50, null=True, blank=True)
+    compile_output = models.TextField(blank=True, default="")
+    test_cases = models.JSONField(default=list, help_text="Verdict, runtime và output (đã cắt) của từng test case")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "submission_judging_results"
+
+    def __str__(self):
+        return f"Judging result of submission #{self.submission_id} ({self.verdict})"
+
+
+class EventFeedState(models.Model):
+    """Vị trí đã đọc của DOMjudge event-feed (để resume sau khi restart)"""
+    id = models.BigAutoField(primary_key=True)
+    domjudge_contest_id = models.CharField(max_length=100, unique=True, help_text="ID contest trong DOMjudge (slug)")
+    last_token = models.CharField(max_length=255, null=True, blank=True, help_text="Token của event cuối cùng đã xử lý")
+    events_processed = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "event_feed_states"
+
+    def __str__(self):
+        return f"Event feed {self.domjudge_contest_id} @ {self.last_token}"
+
+
+class JudgingSyncState(models.Model):
+    """Judging id của DOMjudge đã quét để phát hiện rejudge (để resume sau khi restart)"""
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100, unique=True, help_text="Tên watermark")
+    last_judging_id = models.BigIntegerField(null=True, blank=True, help_text="judgingid lớn nhất đã xử lý")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "judging_sync_states"
+
+    def __str__(self):
+        return f"Judging sync {self.name} @ {self.last_judging_id}"
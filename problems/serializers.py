@@ -554,18 +554,20 @@ class SubmissionDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "submitted_at"]
     
     def get_detailed_results(self, obj):
-        """Get detailed judging results from DOMjudge database"""
+        """
+        Get detailed judging results (cache local nếu đã final, DOMjudge nếu đang chấm)
+        Output của từng test chỉ được trả về khi context có include_output=True
+        """
         if not obj.domjudge_submission_id:
             return None
         
-        from .domjudge_service import DOMjudgeService
-        service = DOMjudgeService()
+        from .judging_service import JudgingResultCache
+        include_output = self.context.get('include_output', False)
         
         try:
-            results = service.get_detailed_judging_results(obj.domjudge_submission_id)
-            return results
+            return JudgingResultCache.get_detailed_results(obj, include_output=include_output)
         except Exception as e:
             return {
                 'verdict': 'error',
                 'message': str(e)
-            }
\ No newline at end of file
+            }
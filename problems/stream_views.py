@@ -0,0 +1,95 @@
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from django.db.models import Q
+
+from .models import Submissions
+from .judging_service import IN_FLIGHT_STATUSES
+from common.authentication import QueryParamJWTAuthentication
+from common.sse import EventStreamRenderer, event_stream_response, format_event
+
+
+class SubmissionStatusStreamView(APIView):
+    """
+    GET: Server-Sent Events - trạng thái submission của user hiện tại (thay cho polling list)
+    Query params:
+    - contest_id, problem_id: lọc submission (optional)
+    - token: JWT access token (EventSource không gửi được header Authorization)
+
+    Events:
+    - `submission`: {id, problem_id, contest_id, status, score, test_passed, test_total}
+      gửi khi stream bắt đầu (các submission đang chấm) và mỗi khi status thay đổi
+    - `done`: không còn submission nào đang chấm, stream đóng (client nên close EventSource)
+    Event id = id nhỏ nhất mà client còn chờ kết quả: khi kết nối lại với
+    Last-Event-ID, stream gửi lại trạng thái hiện tại của mọi submission có
+    id >= giá trị đó (kể cả các submission đã có verdict trong lúc mất kết nối).
+    Chỉ đọc bảng submissions local (verdict do background worker cập nhật).
+    Trên WSGI mỗi request chỉ poll một lần (xem common/sse.py).
+    """
+    authentication_classes = [QueryParamJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    POLL_INTERVAL = 1.0
+    MAX_STREAM_SECONDS = 300
+
+    FIELDS = ('id', 'problem_id', 'contest_id', 'status', 'score', 'test_passed', 'test_total')
+
+    def get(self, request):
+        submissions = Submissions.objects.filter(user=request.user)
+
+        contest_id = request.query_params.get('contest_id')
+        if contest_id:
+            submissions = submissions.filter(contest_id=contest_id)
+        problem_id = request.query_params.get('problem_id')
+        if problem_id:
+            submissions = submissions.filter(problem_id=problem_id)
+
+        # Kết nối lại: gửi lại mọi submission từ mốc client còn chờ
+        resume_filter = Q(status__in=IN_FLIGHT_STATUSES)
+        try:
+            resume_from = int(request.headers.get('Last-Event-ID', ''))
+            resume_filter |= Q(id__gte=resume_from)
+        except ValueError:
+            pass
+
+        # id -> status đã gửi (None = chưa gửi)
+        watching = {
+            submission_id: None
+            for submission_id in submissions.filter(resume_filter).values_list('id', flat=True)
+        }
+        latest = submissions.order_by('-id').values_list('id', flat=True).first() or 0
+        state = {'max_id': latest}
+
+        def poll():
+            # Submission đang theo dõi + submission mới tạo sau khi mở stream
+            rows = submissions.filter(
+                Q(id__in=list(watching)) | Q(id__gt=state['max_id'])
+            ).order_by('id').values(*self.FIELDS)
+
+            changed = []
+            for row in rows:
+                submission_id = row['id']
+                state['max_id'] = max(state['max_id'], submission_id)
+                if row['status'] != watching.get(submission_id):
+                    changed.append(row)
+
+                if row['status'] in IN_FLIGHT_STATUSES:
+                    watching[submission_id] = row['status']
+                else:
+                    watching.pop(submission_id, None)
+
+            # Mốc resume: submission nhỏ nhất còn chờ (hoặc sau submission mới nhất)
+            resume_id = min(watching, default=state['max_id'] + 1)
+            events = [format_event('submission', row, event_id=resume_id) for row in changed]
+            if not watching:
+                events.append(format_event('done', {'all_completed': True}, event_id=resume_id))
+                return events, True
+            return events, False
+
+        return event_stream_response(
+            request,
+            poll,
+            interval=self.POLL_INTERVAL,
+            max_seconds=self.MAX_STREAM_SECONDS
+        )
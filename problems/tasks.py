@@ -0,0 +1,48 @@
+"""
+Background tasks cho Django-Q (problems)
+"""
+import logging
+
+from django.conf import settings
+
+from .judging_service import JudgingSyncService
+from .dispatch_service import SubmissionDispatchService
+
+logger = logging.getLogger(__name__)
+
+
+def sync_judging_submissions():
+    """
+    Task đồng bộ verdict cho tất cả submission đang judging
+    Chạy định kỳ bởi qcluster (xem setup_schedules) hoặc bởi `poll_judgings`
+    Khi verdict được lấy từ event-feed (consume_event_feed): chỉ đối soát các
+    submission judging lâu hơn DOMJUDGE_RECONCILE_AFTER_SECONDS; ngược lại
+    quét thêm rejudge của các submission đã có verdict
+    """
+    older_than = None
+    if settings.DOMJUDGE_VERDICT_SOURCE == 'event-feed':
+        older_than = settings.DOMJUDGE_RECONCILE_AFTER_SECONDS
+
+    result = JudgingSyncService.sync_pending(older_than=older_than)
+    if older_than is None:
+        rejudged = JudgingSyncService.sync_rejudged()
+        if rejudged['rejudged']:
+            logger.info(f"[Judging Sync] Re-synced {rejudged['rejudged']} rejudged submissions")
+    if result['checked']:
+        logger.info(
+            f"[Judging Sync] Checked {result['checked']} submissions, resolved {result['resolved']}"
+        )
+    return result
+
+
+def dispatch_queued_submissions():
+    """
+    Task gửi các submission trong outbox (status `queued`) lên DOMjudge
+    Được enqueue ngay khi có submission mới, và chạy định kỳ (setup_schedules) để retry
+    """
+    result = SubmissionDispatchService.dispatch_queued()
+    if any(result.values()):
+        logger.info(
+            f"[Dispatch] Dispatched {result['dispatched']}, retrying {result['retrying']}, failed {result['failed']}"
+        )
+    return result
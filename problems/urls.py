@@ -6,6 +6,7 @@ from .views import (
     SubmissionCreateView, SubmissionListView, SubmissionDetailView,
     ProblemRecommendationView
 )
+from .stream_views import SubmissionStatusStreamView
 from .user_profile_views import (
     UserProblemsView, UserSubmissionsView, UserRegisteredContestsView,
     UserStatisticsView
@@ -31,6 +32,7 @@ urlpatterns = [
     path('<int:problem_id>/submissions/list/', SubmissionListView.as_view(), name='submission-list-by-problem'),
     path('submissions/', SubmissionListView.as_view(), name='submission-list-all'),
     path('submissions/<int:submission_id>/', SubmissionDetailView.as_view(), name='submission-detail'),
+    path('submissions/stream/', SubmissionStatusStreamView.as_view(), name='submission-status-stream'),
     
     # User Profile APIs
     path('user/problems/', UserProblemsView.as_view(), name='user-problems'),
@@ -1,9 +1,11 @@
 import json
+import logging
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
+from django.conf import settings
 from django.db.models import Q
 from django.utils import timezone
 
@@ -14,8 +16,10 @@ from .serializers import (
     TestCaseSerializer, TestCaseCreateSerializer
 )
 from .domjudge_service import DOMjudgeService
+from .judging_service import JudgingSyncService, IN_FLIGHT_STATUSES
 from common.authentication import CustomJWTAuthentication
 
+logger = logging.getLogger(__name__)
 
 
 class ProblemListCreateView(APIView):
@@ -528,26 +532,29 @@ class SubmissionCreateView(APIView):
             language=language,
             contest=contest,
             code_text=code,
-            status="pending"
+            status="queued" if settings.SUBMISSION_ASYNC_DISPATCH else "pending",
+            domjudge_team_id=request.data.get('team_id') or 'exteam'  # Optional
         )
         
+        # Outbox mode: trả về ngay, consumer gửi bài lên DOMjudge
+        if settings.SUBMISSION_ASYNC_DISPATCH:
+            try:
+                from django_q.tasks import async_task
+                async_task('problems.tasks.dispatch_queued_submissions')
+            except Exception as e:
+                # Schedule định kỳ vẫn sẽ gửi submission này
+                logger.warning(f"Failed to enqueue dispatch task: {str(e)}")
+            
+            result_serializer = SubmissionSerializer(submission)
+            return Response({
+                "detail": "Code submitted successfully",
+                "submission": result_serializer.data
+            }, status=status.HTTP_202_ACCEPTED)
+        
         # Submit lên DOMjudge
         try:
-            domjudge_service = DOMjudgeService()
-            contest_id = contest.slug or 'practice'  # Optional
-            team_id = request.data.get('team_id') or 'exteam'  # Optional
-            domjudge_response = domjudge_service.submit_code(
-                problem=problem,
-                language=language,
-                source_code=code,
-                contest_id=contest_id,
-                team_id=team_id
-            )
-            
-            # Lưu submission ID từ DOMjudge
-            submission.domjudge_submission_id = domjudge_response.get('id') or domjudge_response.get('submitid')
-            submission.status = "judging"
-            submission.save()
+            from .dispatch_service import SubmissionDispatchService
+            domjudge_response = SubmissionDispatchService.dispatch(submission)
             
             result_serializer = SubmissionSerializer(submission)
             
@@ -617,17 +624,20 @@ class SubmissionListView(APIView):
         if not request.user.is_staff:
             submissions = submissions.filter(user=request.user)
         
-        # Sync status from DOMjudge cho các submission đang judging
+        # Verdict được đồng bộ bởi background worker (problems.tasks / poll_judgings).
+        # Chỉ sync trong request khi bật DOMJUDGE_SYNC_IN_REQUEST (môi trường dev không chạy worker)
         sync_from_domjudge = request.query_params.get('sync', 'true').lower() == 'true'
-        if sync_from_domjudge:
-            self._sync_submissions_status(submissions)
+        if sync_from_domjudge and settings.DOMJUDGE_SYNC_IN_REQUEST:
+            JudgingSyncService.sync_submissions(
+                submissions.filter(status='judging', domjudge_submission_id__isnull=False)
+            )
         
         # Ordering
         ordering = request.query_params.get('ordering', '-submitted_at')
         submissions = submissions.order_by(ordering)
         
         # Kiểm tra xem tất cả submissions đã hoàn thành judging chưa (trước khi pagination)
-        all_completed = not submissions.filter(status__in=['judging', 'pending']).exists()
+        all_completed = not submissions.filter(status__in=IN_FLIGHT_STATUSES).exists()
         
         # Pagination
         page = int(request.query_params.get('page', 1))
@@ -648,70 +658,11 @@ class SubmissionListView(APIView):
             "total_pages": (total + page_size - 1) // page_size,
             "all_completed": all_completed  # Flag để frontend biết khi nào dừng polling
         })
-    
-    def _sync_submissions_status(self, submissions):
-        """Sync status từ DOMjudge cho các submission đang judging"""
-        domjudge_service = DOMjudgeService()
-        contest_id = None  # Có thể lấy từ settings hoặc request params
-        
-        for submission in submissions.filter(status='judging'):
-            if submission.domjudge_submission_id:
-                try:
-                    # Lấy judgement từ DOMjudge
-                    judgement = domjudge_service.get_judgement_summary(
-                        submission.domjudge_submission_id
-                    )
-                    
-                    if judgement and judgement.get('valid'):
-                        # Cập nhật status từ judgement_type_id
-                        judgement_type = judgement.get('judgement_type_id', 'unknown')
-                        submission.status = judgement_type.lower()
-                        
-                        # Lấy chi tiết test cases để tính test_passed và test_total
-                        try:
-                            detailed_results = domjudge_service.get_detailed_judging_results(
-                                submission.domjudge_submission_id
-                            )
-                            
-                            if detailed_results and 'test_cases' in detailed_results:
-                                test_cases = detailed_results['test_cases']
-                                submission.test_total = len(test_cases)
-                                submission.test_passed = sum(
-                                    1 for tc in test_cases 
-                                    if tc.get('verdict', '').lower() == 'correct'
-                                )
-                        except Exception as e:
-                            print(f"Failed to get detailed results: {str(e)}")
-                        
-                        # Cập nhật score (nếu AC thì 100, không thì 0)
-                        if judgement_type == 'AC':
-                            submission.score = 100.00
-                        else:
-                            submission.score = 0.00
-                        
-                        # Cập nhật feedback
-                        submission.feedback = f"Max run time: {judgement.get('max_run_time', 0)}s"
-                        submission.save()
-                        
-                        # Update contest ranking if submission is for a contest
-                        if submission.contest:
-                            from contests.ranking_service import ContestRankingService
-                            try:
-                                ContestRankingService.update_user_ranking(
-                                    submission.contest.id,
-                                    submission.user.id
-                                )
-                            except Exception as e:
-                                print(f"Failed to update ranking: {str(e)}")
-                
-                except Exception as e:
-                    print(f"Failed to sync submission {submission.id}: {str(e)}")
-                    continue
 
 
 class SubmissionDetailView(APIView):
     """
-    GET: Get submission detail and sync result from DOMjudge
+    GET: Get submission detail (verdict được đồng bộ bởi background worker)
     """
     authentication_classes = [CustomJWTAuthentication]
     permission_classes = [IsAuthenticated]
@@ -728,71 +679,16 @@ class SubmissionDetailView(APIView):
                 "error": "Bạn không có quyền xem submission này"
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Nếu submission đang judging, lấy kết quả mới nhất từ DOMjudge
-        if submission.status == "judging" and submission.domjudge_submission_id:
-            try:
-                domjudge_service = DOMjudgeService()
-                contest_id = request.query_params.get('contest_id')
-                
-                # Lấy judgement từ DOMjudge
-                judgement = domjudge_service.get_judgement(
-                    submission.domjudge_submission_id,
-                    contest_id=contest_id
-                )
-                
-                if judgement and judgement.get('valid'):
-                    # Cập nhật status từ judgement_type_id
-                    judgement_type = judgement.get('judgement_type_id', 'unknown')
-                    submission.status = judgement_type.lower()
-                    
-                    # Lấy chi tiết test cases để tính test_passed và test_total
-                    try:
-                        detailed_results = domjudge_service.get_detailed_judging_results(
-                            submission.domjudge_submission_id
-                        )
-                        
-                        if detailed_results and 'test_cases' in detailed_results:
-                            test_cases = detailed_results['test_cases']
-                            submission.test_total = len(test_cases)
-                            submission.test_passed = sum(
-                                1 for tc in test_cases 
-                                if tc.get('verdict', '').lower() == 'correct'
-                            )
-                    except Exception as e:
-                        print(f"Failed to get detailed results: {str(e)}")
-                    
-                    # Cập nhật score
-                    if judgement_type == 'AC':
-                        submission.score = 100.00
-                    else:
-                        submission.score = 0.00
-                    
-                    # Cập nhật feedback với chi tiết từ judgement
-                    feedback_parts = [
-                        f"Judgement: {judgement_type}",
-                        f"Max run time: {judgement.get('max_run_time', 0)}s",
-                        f"Start time: {judgement.get('start_contest_time', 'N/A')}",
-                        f"End time: {judgement.get('end_contest_time', 'N/A')}"
-                    ]
-                    submission.feedback = "\n".join(feedback_parts)
-                    submission.save()
-                    
-                    # Update contest ranking if submission is for a contest
-                    if submission.contest:
-                        from contests.ranking_service import ContestRankingService
-                        try:
-                            ContestRankingService.update_user_ranking(
-                                submission.contest.id,
-                                submission.user.id
-                            )
-                        except Exception as e:
-                            print(f"Failed to update ranking: {str(e)}")
-            
-            except Exception as e:
-                print(f"Failed to sync submission result: {str(e)}")
+        # Verdict được đồng bộ bởi background worker, view chỉ đọc dữ liệu local
+        if (settings.DOMJUDGE_SYNC_IN_REQUEST
+                and submission.status == "judging" and submission.domjudge_submission_id):
+            JudgingSyncService.sync_submissions([submission])
+        
+        # Output/diff của từng test case chỉ đọc khi client yêu cầu (?include_output=true)
+        include_output = request.query_params.get('include_output', 'false').lower() == 'true'
         
         from .serializers import SubmissionDetailSerializer
-        serializer = SubmissionDetailSerializer(submission)
+        serializer = SubmissionDetailSerializer(submission, context={'include_output': include_output})
         return Response(serializer.data)
 
 
@@ -805,9 +701,7 @@ class ProblemRecommendationView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        import pickle
-        import os
-        from django.conf import settings
+        from common.model_registry import RecommendationModelRegistry
         
         try:
             user = request.user
@@ -821,23 +715,15 @@ class ProblemRecommendationView(APIView):
                     'error': 'Invalid strategy. Use "similar" or "challenging"'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Load model
-            model_path = os.path.join(settings.BASE_DIR, 'media', 'models', 'recommendation_model.pkl')
+            # Model đã load của worker (load lại khi có model mới)
+            recommender = RecommendationModelRegistry.get()
             
-            if not os.path.exists(model_path):
+            if recommender is None:
                 return Response({
                     'error': 'Recommendation model not found. Please train the model first.',
                     'hint': 'Run: python manage.py train_recommendation'
                 }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             
-            with open(model_path, 'rb') as f:
-                model_data = pickle.load(f)
-            
-            # Khôi phục recommender
-            from common.recommender import ProductionRecommender
-            recommender = ProductionRecommender()
-            recommender.__dict__.update(model_data)
-            
             # Lấy danh sách bài đã giải của user (AC only)
             solved_submissions = Submissions.objects.filter(
                 user=user,
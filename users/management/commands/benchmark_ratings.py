@@ -0,0 +1,200 @@
+"""
+Django Management Command: Benchmark rating engine
+
+So sánh cách tính rating cũ (từng participant, O(n^2) vòng lặp Python, vài query
+mỗi user) với RatingService.update_contest_ratings (mảng NumPy, một bulk_update
+và một bulk_create):
+- compute: chỉ phần tính toán trên n rating ngẫu nhiên; cách cũ chạy trên
+  --sample participant rồi ngoại suy cho n
+- database: end-to-end trên contest seed (--db-users participant), rollback khi kết thúc
+
+Usage:
+    python manage.py benchmark_ratings
+    python manage.py benchmark_ratings --participants 10000 --db-users 2000
+    python manage.py benchmark_ratings --skip-db
+"""
+import random
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from contests.models import Contest, ContestParticipant
+from users.models import User, ContestRatingChange
+from users.rating_service import RatingService
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark tính rating bằng NumPy so với tính theo từng participant'
+
+    USER_FIELDS = ('current_rating', 'max_rating', 'rank', 'max_rank', 'contests_participated',
+                   'contests_won', 'rating_volatility', 'total_problems_solved')
+    CHANGE_FIELDS = ('old_rating', 'new_rating', 'rating_change', 'rank', 'solved_count')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participants', type=int, default=10000, help='Số participant (compute, default: 10000)')
+        parser.add_argument('--sample', type=int, default=500, help='Số participant chạy cách cũ để ngoại suy (default: 500)')
+        parser.add_argument('--db-users', type=int, default=1000, help='Số participant seed cho benchmark database (default: 1000)')
+        parser.add_argument('--skip-db', action='store_true', help='Chỉ chạy benchmark compute')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        self.benchmark_compute(options)
+        if not options['skip_db']:
+            try:
+                with transaction.atomic():
+                    contest = self.seed(options)
+                    self.benchmark_database(contest)
+                    raise Rollback()
+            except Rollback:
+                self.stdout.write('Rolled back all benchmark changes')
+
+    def random_population(self, rng, n):
+        ratings = [int(rng.gauss(1500, 350)) for _ in range(n)]
+        contests = [rng.randint(0, 40) for _ in range(n)]
+        volatilities = [rng.uniform(50, 500) for _ in range(n)]
+        return [max(0, rating) for rating in ratings], contests, volatilities
+
+    def benchmark_compute(self, options):
+        rng = random.Random(options['seed'])
+        n = options['participants']
+        ratings, contests, volatilities = self.random_population(rng, n)
+        sample = sorted(rng.sample(range(n), min(options['sample'], n)))
+
+        started = time.perf_counter()
+        new_ratings, rating_changes, new_volatilities = RatingService.calculate_rating_changes(
+            ratings, np.arange(1, n + 1), contests, volatilities
+        )
+        vectorized_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        legacy = {}
+        for index in sample:
+            expected_rank = RatingService.calculate_expected_rank(ratings[index], ratings)
+            new_rating, rating_change = RatingService.calculate_rating_change(
+                old_rating=ratings[index],
+                actual_rank=index + 1,
+                expected_rank=expected_rank,
+                contests_participated=contests[index],
+                volatility=volatilities[index]
+            )
+            legacy[index] = (new_rating, rating_change, RatingService.update_volatility(volatilities[index], rating_change))
+        legacy_seconds = (time.perf_counter() - started) * n / max(1, len(sample))
+
+        self.stdout.write(f'Compute: {n} participants (legacy extrapolated from {len(sample)})')
+        self.stdout.write(f'{"":<24}{"time (s)":>12}')
+        self.stdout.write(f'{"per participant":<24}{legacy_seconds:>12.3f}')
+        self.stdout.write(f'{"NumPy":<24}{vectorized_seconds:>12.3f}')
+        if vectorized_seconds:
+            self.stdout.write(f'Speedup: {legacy_seconds / vectorized_seconds:.1f}x')
+
+        mismatches = [
+            index for index, (new_rating, rating_change, new_volatility) in legacy.items()
+            if (new_rating, rating_change) != (int(new_ratings[index]), int(rating_changes[index]))
+            or abs(new_volatility - new_volatilities[index]) > 1e-6
+        ]
+        self.report(mismatches)
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        tag = f"ratingbench{int(time.time())}"
+        n = options['db_users']
+        ratings, contests, volatilities = self.random_population(rng, n)
+
+        self.stdout.write(f'Seeding ended contest with {n} participants')
+        contest = Contest.objects.create(
+            slug=tag,
+            title=f'Rating benchmark {tag}',
+            start_at=now - timedelta(hours=5),
+            end_at=now - timedelta(hours=1),
+        )
+        users = User.objects.bulk_create([
+            User(
+                username=f'{tag}-u{i}',
+                email=f'{tag}-u{i}@example.com',
+                password='!',
+                current_rating=ratings[i],
+                max_rating=ratings[i],
+                contests_participated=contests[i],
+                rating_volatility=volatilities[i],
+            )
+            for i in range(n)
+        ])
+        ContestParticipant.objects.bulk_create([
+            ContestParticipant(
+                contest=contest,
+                user=user,
+                solved_count=rng.randint(0, 10),
+                penalty_seconds=rng.randint(0, 20000),
+                last_submission_at=contest.start_at + timedelta(seconds=rng.randint(0, 14399)),
+            )
+            for user in users
+        ])
+        return contest
+
+    def benchmark_database(self, contest):
+        # Cách cũ chạy trong savepoint rồi rollback để cả hai cùng xuất phát từ một trạng thái
+        sid = transaction.savepoint()
+        legacy_seconds, legacy_queries = self._measure(
+            lambda: RatingService._update_contest_ratings_legacy(contest.id)
+        )
+        legacy = self._snapshot(contest)
+        transaction.savepoint_rollback(sid)
+
+        vectorized_seconds, vectorized_queries = self._measure(
+            lambda: RatingService.update_contest_ratings(contest.id)
+        )
+        vectorized = self._snapshot(contest)
+
+        self.stdout.write(f'Database: contest {contest.slug}, {len(vectorized)} participants')
+        self.stdout.write(f'{"":<24}{"time (s)":>12}{"queries":>12}')
+        self.stdout.write(f'{"per participant":<24}{legacy_seconds:>12.3f}{legacy_queries:>12}')
+        self.stdout.write(f'{"NumPy + bulk":<24}{vectorized_seconds:>12.3f}{vectorized_queries:>12}')
+        if vectorized_seconds:
+            self.stdout.write(f'Speedup: {legacy_seconds / vectorized_seconds:.1f}x')
+
+        self.report([
+            user_id for user_id in legacy
+            if legacy[user_id] != vectorized.get(user_id)
+        ])
+
+    def report(self, mismatches):
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'Results differ for {len(mismatches)} participants ({mismatches[:10]})'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Results identical'))
+
+    @staticmethod
+    def _measure(func):
+        counter = {'queries': 0}
+
+        def count_query(execute, sql, params, many, context):
+            counter['queries'] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+        return elapsed, counter['queries']
+
+    def _snapshot(self, contest):
+        changes = {
+            row['user_id']: tuple(row[field] for field in self.CHANGE_FIELDS)
+            for row in ContestRatingChange.objects.filter(contest=contest).values('user_id', *self.CHANGE_FIELDS)
+        }
+        return {
+            row['id']: (
+                tuple(round(row[field], 6) if field == 'rating_volatility' else row[field] for field in self.USER_FIELDS),
+                changes.get(row['id'])
+            )
+            for row in User.objects.filter(contest_participations__contest=contest).values('id', *self.USER_FIELDS)
+        }
@@ -0,0 +1,117 @@
+"""
+Django Management Command: Replay rating history
+
+Tính lại rating từ đầu: phát lại mọi contest đã được tính rating theo thứ tự
+thời gian bằng RatingService (NumPy, trong bộ nhớ), sau đó ghi các field rating
+của User bằng bulk_update và dựng lại ContestRatingChange bằng bulk_create.
+Dùng khi công thức rating thay đổi hoặc một contest cũ được tính lại
+(update_contest_ratings chỉ tính lại một contest, các contest sau giữ delta cũ).
+
+Usage:
+    python manage.py replay_ratings --dry-run
+    python manage.py replay_ratings --dry-run --show 50
+    python manage.py replay_ratings
+"""
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Min
+
+from users.models import User, ContestRatingChange
+from users.rating_index import RatingIndexService
+from users.rating_service import RatingService
+
+
+class Command(BaseCommand):
+    help = 'Phát lại toàn bộ lịch sử rating và ghi lại rating của user'
+
+    CHANGE_FIELDS = ('old_rating', 'new_rating', 'rating_change', 'rank', 'solved_count')
+    # last_contest_at lấy theo end_at của contest khi phát lại, không so sánh
+    DIFF_FIELDS = [field for field in RatingService.USER_RATING_FIELDS if field != 'last_contest_at']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ in khác biệt, không ghi DB')
+        parser.add_argument('--show', type=int, default=20, help='Số user thay đổi nhiều nhất được in (default: 20)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        contests, users, changes = RatingService.replay_rating_history()
+        total_changes = sum(len(records) for records in changes.values())
+        self.stdout.write(
+            f'Replayed {len(contests)} contests, {total_changes} rating changes, {len(users)} users '
+            f'in {time.perf_counter() - started:.2f}s'
+        )
+
+        self.print_diff(users, changes, options['show'])
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing written'))
+            return
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            # Giữ thời điểm tính rating ban đầu của từng contest (lịch sử sắp theo created_at)
+            rated_at = dict(
+                ContestRatingChange.objects.filter(contest__in=contests).order_by().values('contest_id').annotate(
+                    rated_at=Min('created_at')
+                ).values_list('contest_id', 'rated_at')
+            )
+            ContestRatingChange.objects.filter(contest__in=contests).delete()
+            ContestRatingChange.objects.bulk_create(
+                [record for records in changes.values() for record in records],
+                batch_size=1000
+            )
+            for contest in contests:
+                if changes[contest.id]:
+                    ContestRatingChange.objects.filter(contest=contest).update(
+                        created_at=rated_at.get(contest.id, contest.end_at)
+                    )
+            User.objects.bulk_update(list(users.values()), RatingService.USER_RATING_FIELDS, batch_size=1000)
+            RatingIndexService.refresh_on_commit()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {len(users)} users and {total_changes} rating changes in {time.perf_counter() - started:.2f}s'
+        ))
+
+    def print_diff(self, users, changes, show):
+        current_users = {
+            row['id']: row
+            for row in User.objects.filter(id__in=list(users)).values('id', 'username', *self.DIFF_FIELDS)
+        }
+        changed_users = []
+        for user_id, user in users.items():
+            current = current_users[user_id]
+            fields = [field for field in self.DIFF_FIELDS if getattr(user, field) != current[field]]
+            if fields:
+                changed_users.append((abs(user.current_rating - current['current_rating']), user, current, fields))
+
+        current_changes = defaultdict(dict)
+        for row in ContestRatingChange.objects.values('contest_id', 'user_id', *self.CHANGE_FIELDS).iterator(chunk_size=5000):
+            current_changes[row['contest_id']][row['user_id']] = tuple(row[field] for field in self.CHANGE_FIELDS)
+
+        changed_contests = 0
+        changed_records = 0
+        for contest_id, records in changes.items():
+            replayed = {
+                record.user_id: tuple(getattr(record, field) for field in self.CHANGE_FIELDS)
+                for record in records
+            }
+            existing = current_changes.get(contest_id, {})
+            differing = sum(
+                1 for user_id in replayed.keys() | existing.keys()
+                if replayed.get(user_id) != existing.get(user_id)
+            )
+            if differing:
+                changed_contests += 1
+                changed_records += differing
+
+        self.stdout.write(
+            f'{len(changed_users)} users differ, {changed_records} rating changes differ '
+            f'in {changed_contests} contests'
+        )
+        changed_users.sort(key=lambda item: (-item[0], item[1].id))
+        for _, user, current, fields in changed_users[:show]:
+            details = ', '.join(f'{field} {current[field]} -> {getattr(user, field)}' for field in fields)
+            self.stdout.write(f'  {current["username"]} (#{user.id}): {details}')
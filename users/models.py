@@ -117,6 +117,7 @@ class User(models.Model):
         db_table = "users"
         indexes = [
             models.Index(fields=["-current_rating"]),
+            models.Index(fields=["-current_rating", "-max_rating", "username"]),
             models.Index(fields=["rank"]),
         ]
 
@@ -265,4 +266,18 @@ class ContestRatingChange(models.Model):
     
     def __str__(self):
         sign = '+' if self.rating_change >= 0 else ''
-        return f"{self.user.username} - {self.contest.title}: {sign}{self.rating_change}"
\ No newline at end of file
+        return f"{self.user.username} - {self.contest.title}: {sign}{self.rating_change}"
+
+class RatingIndexVersion(models.Model):
+    """
+    Phiên bản dữ liệu rating toàn cục (một dòng): tăng khi rating được tính lại
+    hoặc có user mới / bị xóa. Chỉ mục rank trong cache được dựng lại khi khác phiên bản.
+    """
+    id = models.BigAutoField(primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "rating_index_versions"
+
+    def __str__(self):
+        return f"Rating index version {self.version}"
@@ -0,0 +1,192 @@
+"""
+Chỉ mục rank toàn cục theo rating (Fenwick tree trên histogram rating)
+
+Histogram số user theo từng giá trị rating được dựng bằng một query GROUP BY,
+lưu trong cache kèm phiên bản RatingIndexVersion (một dòng trong DB). Phiên bản tăng
+khi rating được tính lại (refresh_on_commit) hoặc có user mới / bị xóa (users.signals);
+mỗi lần đọc chỉ so phiên bản (đọc một dòng theo khóa chính) và dựng lại nếu khác, nên
+chỉ mục đúng cả khi rating được ghi bởi process khác hoặc cache không dùng chung.
+Rank của một rating, percentile, vị trí -> rating: O(log R) với R = rating lớn nhất.
+
+Nhóm user cùng rating lớn (mặc định mọi user bắt đầu ở 1500) được chia mốc mỗi
+ANCHOR_EVERY user theo (max_rating, username) để trang sâu seek tới mốc gần nhất.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+
+
+class FenwickTree:
+    """Fenwick tree (binary indexed tree) trên mảng counts[0..size-1]"""
+
+    def __init__(self, counts):
+        self.size = len(counts)
+        self.tree = [0] + list(counts)
+        for index in range(1, self.size + 1):
+            parent = index + (index & -index)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[index]
+
+    def prefix_sum(self, index):
+        """Tổng counts[0..index]"""
+        index = min(index, self.size - 1) + 1
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, k):
+        """Index nhỏ nhất có prefix_sum(index) >= k (k >= 1)"""
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            if position + step <= self.size and self.tree[position + step] < k:
+                position += step
+                k -= self.tree[position]
+            step >>= 1
+        return position
+
+
+class RatingIndex:
+    """Số user theo rating, trả lời rank / percentile / phân bố"""
+
+    ANCHOR_EVERY = 500
+
+    def __init__(self, counts, stamp=None, anchors=None):
+        self.stamp = stamp
+        self.counts = list(counts)
+        self.total = sum(self.counts)
+        self.tree = FenwickTree(self.counts or [0])
+        # {rating: [(max_rating, username) của user thứ ANCHOR_EVERY, 2 * ANCHOR_EVERY, ... trong nhóm]}
+        self.anchors = anchors or {}
+
+    @classmethod
+    def from_database(cls, stamp=None):
+        from users.models import User
+
+        histogram = dict(
+            User.objects.order_by().values('current_rating').annotate(
+                total=Count('id')
+            ).values_list('current_rating', 'total')
+        )
+        size = max(histogram, default=0) + 1
+        counts = [0] * size
+        for rating, total in histogram.items():
+            counts[max(0, rating)] += total
+
+        anchors = {}
+        for rating, total in histogram.items():
+            if rating < 0 or total <= cls.ANCHOR_EVERY:
+                continue
+            # Quét nhóm theo index (-current_rating, -max_rating, username), giữ mỗi ANCHOR_EVERY user
+            keys = User.objects.filter(current_rating=rating).order_by('-max_rating', 'username').values_list(
+                'max_rating', 'username'
+            )
+            anchors[rating] = [
+                key for position, key in enumerate(keys.iterator(chunk_size=5000))
+                if position and position % cls.ANCHOR_EVERY == 0
+            ]
+        return cls(counts, stamp, anchors)
+
+    def count_above(self, rating):
+        """Số user có rating lớn hơn `rating`"""
+        if rating < 0:
+            return self.total
+        return self.total - self.tree.prefix_sum(rating)
+
+    def rank(self, rating):
+        """Rank toàn cục (các user cùng rating có cùng rank)"""
+        return self.count_above(rating) + 1
+
+    def percentile(self, rating):
+        """Phần trăm user có rating thấp hơn `rating`"""
+        if not self.total:
+            return 0.0
+        below = self.tree.prefix_sum(rating - 1) if rating > 0 else 0
+        return round(below * 100.0 / self.total, 2)
+
+    def rating_at(self, position):
+        """Rating của user ở vị trí `position` (1 = rating cao nhất), None nếu vượt quá"""
+        if position < 1 or position > self.total:
+            return None
+        return self.tree.find(self.total - position + 1)
+
+    def anchor(self, rating, skip):
+        """
+        Mốc gần nhất trước vị trí `skip` (tính từ 0) trong nhóm rating
+
+        Returns: ((max_rating, username) hoặc None, vị trí của mốc trong nhóm)
+        """
+        anchors = self.anchors.get(rating) or []
+        slot = min(skip // self.ANCHOR_EVERY, len(anchors))
+        if not slot:
+            return None, 0
+        return anchors[slot - 1], slot * self.ANCHOR_EVERY
+
+    def distribution(self, bucket_size):
+        """[{rating_from, rating_to, count}, ...] theo khoảng bucket_size"""
+        buckets = []
+        for start in range(0, len(self.counts), bucket_size):
+            count = sum(self.counts[start:start + bucket_size])
+            if count:
+                buckets.append({'rating_from': start, 'rating_to': start + bucket_size - 1, 'count': count})
+        return buckets
+
+
+class RatingIndexService:
+    """Đọc / làm mới RatingIndex trong cache"""
+
+    CACHE_KEY = 'global_rating_index'
+    VERSION_ID = 1
+
+    @staticmethod
+    def stamp():
+        """Phiên bản rating hiện tại (RatingIndexVersion)"""
+        from users.models import RatingIndexVersion
+
+        version = RatingIndexVersion.objects.filter(
+            id=RatingIndexService.VERSION_ID
+        ).values_list('version', flat=True).first()
+        return version or 0
+
+    @staticmethod
+    def bump():
+        """Tăng phiên bản: mọi process dựng lại chỉ mục ở lần đọc kế tiếp"""
+        from users.models import RatingIndexVersion
+
+        updated = RatingIndexVersion.objects.filter(
+            id=RatingIndexService.VERSION_ID
+        ).update(version=F('version') + 1)
+        if not updated:
+            RatingIndexVersion.objects.get_or_create(id=RatingIndexService.VERSION_ID, defaults={'version': 1})
+
+    @staticmethod
+    def bump_on_commit():
+        transaction.on_commit(RatingIndexService.bump)
+
+    @staticmethod
+    def get():
+        stamp = RatingIndexService.stamp()
+        index = cache.get(RatingIndexService.CACHE_KEY)
+        if index is None or getattr(index, 'stamp', None) != stamp:
+            index = RatingIndexService.rebuild(stamp)
+        return index
+
+    @staticmethod
+    def rebuild(stamp=None):
+        # Phiên bản đọc trước histogram: ghi đồng thời chỉ làm lần đọc sau dựng lại thêm lần nữa
+        stamp = RatingIndexService.stamp() if stamp is None else stamp
+        index = RatingIndex.from_database(stamp)
+        cache.set(RatingIndexService.CACHE_KEY, index, settings.RATING_INDEX_CACHE_SECONDS)
+        return index
+
+    @staticmethod
+    def refresh_on_commit():
+        """Gọi trong transaction cập nhật rating: tăng phiên bản và dựng lại chỉ mục sau khi commit"""
+        def refresh():
+            RatingIndexService.bump()
+            RatingIndexService.rebuild()
+
+        transaction.on_commit(refresh)
@@ -1,12 +1,20 @@
 """
 Service tính rating cho user sau mỗi contest
 Sử dụng thuật toán Elo cải tiến giống Codeforces
+
+Expected rank, rating change và volatility của cả contest được tính bằng
+mảng NumPy (calculate_rating_changes); các hàm tính cho từng user bên dưới
+giữ nguyên công thức gốc (dùng cho benchmark_ratings).
 """
 import math
+import numpy as np
 from django.db import transaction
+from django.db.models import Count
 from django.utils import timezone
 from decimal import Decimal
 
+from .rating_index import RatingIndexService
+
 
 class RatingService:
     """Service để tính toán và cập nhật rating"""
@@ -92,11 +100,307 @@ class RatingService:
         
         return new_volatility
     
+    # Số rating phân biệt mỗi khối khi tính ma trận xác suất (giới hạn bộ nhớ ~ EXPECTED_RANK_CHUNK x n)
+    EXPECTED_RANK_CHUNK = 1024
+
+    USER_RATING_FIELDS = [
+        'current_rating', 'max_rating', 'rank', 'max_rank', 'contests_participated',
+        'contests_won', 'rating_volatility', 'last_contest_at', 'total_problems_solved',
+    ]
+
+    @staticmethod
+    def calculate_expected_ranks(ratings):
+        """
+        Expected rank của mọi participant (vector hóa calculate_expected_rank)
+
+        Tính trên các rating phân biệt: E(r) = 1 + sum_{v != r} count(v) / (1 + 10^((r - v) / 400))
+
+        Args:
+            ratings: mảng rating của tất cả participants
+
+        Returns:
+            np.ndarray expected rank (cùng thứ tự với ratings)
+        """
+        ratings = np.asarray(ratings, dtype=np.float64)
+        values, inverse, counts = np.unique(ratings, return_inverse=True, return_counts=True)
+        expected = np.empty(len(values), dtype=np.float64)
+
+        chunk = RatingService.EXPECTED_RANK_CHUNK
+        for start in range(0, len(values), chunk):
+            block = values[start:start + chunk]
+            probability = 1.0 / (1.0 + np.power(10.0, (block[:, None] - values[None, :]) / 400.0))
+            # Bỏ các participant có cùng rating (kể cả chính mình)
+            probability[np.arange(len(block)), np.arange(start, start + len(block))] = 0.0
+            expected[start:start + len(block)] = 1.0 + probability @ counts
+        return expected[inverse]
+
+    @staticmethod
+    def calculate_rating_changes(old_ratings, actual_ranks, contests_participated, volatilities):
+        """
+        Vector hóa calculate_rating_change + update_volatility cho cả contest
+
+        Returns:
+            (new_ratings, rating_changes, new_volatilities) dạng np.ndarray
+        """
+        old_ratings = np.asarray(old_ratings, dtype=np.int64)
+        actual_ranks = np.asarray(actual_ranks, dtype=np.float64)
+        contests_participated = np.asarray(contests_participated)
+        volatilities = np.asarray(volatilities, dtype=np.float64)
+
+        expected_ranks = RatingService.calculate_expected_ranks(old_ratings)
+
+        # K-factor theo số contest đã tham gia, điều chỉnh theo volatility
+        k_factor = np.select(
+            [contests_participated <= 5, contests_participated <= 10, contests_participated <= 20],
+            [200.0, 100.0, 64.0],
+            default=32.0
+        )
+        k_factor = k_factor * (volatilities / 350.0)
+
+        rating_changes = np.trunc(k_factor * (expected_ranks - actual_ranks) / expected_ranks).astype(np.int64)
+        rating_changes = np.clip(rating_changes, -300, 300)
+        new_ratings = np.maximum(0, old_ratings + rating_changes)
+
+        new_volatilities = volatilities + np.abs(rating_changes) * 0.5
+        new_volatilities = new_volatilities * 0.95 + 350 * 0.05
+        new_volatilities = np.clip(new_volatilities, 50, 500)
+
+        return new_ratings, rating_changes, new_volatilities
+
+    @staticmethod
+    def apply_contest_ratings(contest, participants, users, rated_at):
+        """
+        Áp dụng kết quả một contest lên các User trong bộ nhớ (không ghi DB)
+        
+        Args:
+            contest: Contest
+            participants: [{'user_id', 'solved_count'}, ...] theo thứ hạng
+            users: {user_id: User}
+            rated_at: giá trị last_contest_at
+            
+        Returns:
+            List ContestRatingChange (chưa lưu)
+        """
+        from users.models import ContestRatingChange
+        
+        participant_users = [users[row['user_id']] for row in participants]
+        old_ratings = [user.current_rating for user in participant_users]
+        new_ratings, rating_changes, new_volatilities = RatingService.calculate_rating_changes(
+            old_ratings=old_ratings,
+            actual_ranks=np.arange(1, len(participants) + 1),
+            contests_participated=[user.contests_participated for user in participant_users],
+            volatilities=[user.rating_volatility for user in participant_users]
+        )
+        
+        rating_change_records = []
+        for index, (row, user) in enumerate(zip(participants, participant_users)):
+            actual_rank = index + 1
+            new_rating = int(new_ratings[index])
+            
+            user.current_rating = new_rating
+            user.max_rating = max(user.max_rating, new_rating)
+            user.contests_participated += 1
+            user.rating_volatility = float(new_volatilities[index])
+            user.last_contest_at = rated_at
+            user.update_rank()
+            if actual_rank == 1:
+                user.contests_won += 1
+            
+            rating_change_records.append(ContestRatingChange(
+                user=user,
+                contest=contest,
+                old_rating=old_ratings[index],
+                new_rating=new_rating,
+                rating_change=int(rating_changes[index]),
+                rank=actual_rank,
+                solved_count=row['solved_count']
+            ))
+        return rating_change_records
+    
+    @staticmethod
+    def get_solved_totals(user_ids):
+        """Số bài khác nhau đã AC của từng user: {user_id: total} (một query)"""
+        from problems.models import Submissions
+        
+        return dict(Submissions.objects.filter(
+            user_id__in=user_ids,
+            status__in=['AC', 'correct', 'Correct']
+        ).order_by().values('user_id').annotate(
+            total=Count('problem', distinct=True)
+        ).values_list('user_id', 'total'))
+    
+    @staticmethod
+    def replay_rating_history():
+        """
+        Tính lại toàn bộ lịch sử rating trong bộ nhớ (không ghi DB)
+        
+        Các contest đã được tính rating (có ContestRatingChange) được phát lại theo
+        thứ tự thời gian kết thúc, xuất phát từ rating mặc định của mọi user liên quan.
+        
+        Returns:
+            (contests, users, changes)
+            contests: list Contest đã phát lại (theo thứ tự)
+            users: {user_id: User} với các field rating mới
+            changes: {contest_id: [ContestRatingChange chưa lưu]}
+        """
+        from contests.models import Contest, ContestParticipant
+        from users.models import User, ContestRatingChange
+        
+        contests = list(Contest.objects.filter(
+            id__in=ContestRatingChange.objects.values('contest_id')
+        ).exclude(slug='practice').order_by('end_at', 'start_at', 'id'))
+        
+        participants = {contest.id: [] for contest in contests}
+        for row in ContestParticipant.objects.filter(
+            contest_id__in=participants.keys(),
+            is_active=True
+        ).order_by(
+            'contest_id',
+            '-solved_count',
+            'penalty_seconds',
+            'last_submission_at'
+        ).values('contest_id', 'user_id', 'solved_count').iterator(chunk_size=5000):
+            participants[row['contest_id']].append(row)
+        
+        # Mọi user từng có rating change hoặc tham gia contest được phát lại
+        user_ids = set(ContestRatingChange.objects.values_list('user_id', flat=True).distinct())
+        for rows in participants.values():
+            user_ids.update(row['user_id'] for row in rows)
+        users = User.objects.in_bulk(user_ids)
+        
+        defaults = {
+            field: User._meta.get_field(field).get_default()
+            for field in RatingService.USER_RATING_FIELDS
+        }
+        for user in users.values():
+            for field, value in defaults.items():
+                setattr(user, field, value)
+        
+        changes = {}
+        for contest in contests:
+            rows = participants[contest.id]
+            # Cần ít nhất 2 người để tính rating
+            changes[contest.id] = (
+                RatingService.apply_contest_ratings(contest, rows, users, contest.end_at)
+                if len(rows) >= 2 else []
+            )
+        
+        solved_totals = RatingService.get_solved_totals(list(users))
+        for user in users.values():
+            user.total_problems_solved = solved_totals.get(user.id, 0)
+        
+        return contests, users, changes
+    
+    @staticmethod
+    def predict_contest_ratings(contest, standings):
+        """
+        Dự đoán rating change nếu contest kết thúc với bảng xếp hạng hiện tại
+        
+        Args:
+            contest: Contest
+            standings: [{'user_id', 'solved_count'}, ...] theo thứ hạng (như update_contest_ratings)
+            
+        Returns:
+            Payload dict (predictions theo thứ hạng)
+        """
+        from users.models import User
+        
+        users = {
+            row['id']: row
+            for row in User.objects.filter(id__in=[row['user_id'] for row in standings]).values(
+                'id', 'username', 'full_name', 'current_rating', 'contests_participated', 'rating_volatility'
+            )
+        }
+        standings = [row for row in standings if row['user_id'] in users]
+        
+        predictions = []
+        if len(standings) >= 2:
+            participant_users = [users[row['user_id']] for row in standings]
+            new_ratings, rating_changes, _ = RatingService.calculate_rating_changes(
+                old_ratings=[user['current_rating'] for user in participant_users],
+                actual_ranks=np.arange(1, len(standings) + 1),
+                contests_participated=[user['contests_participated'] for user in participant_users],
+                volatilities=[user['rating_volatility'] for user in participant_users]
+            )
+            for index, (row, user) in enumerate(zip(standings, participant_users)):
+                new_rating = int(new_ratings[index])
+                predictions.append({
+                    'rank': index + 1,
+                    'user_id': user['id'],
+                    'username': user['username'],
+                    'full_name': user['full_name'] or user['username'],
+                    'solved_count': row['solved_count'],
+                    'old_rating': user['current_rating'],
+                    'predicted_rating': new_rating,
+                    'predicted_change': int(rating_changes[index]),
+                    'predicted_rank_title': User.get_rank_from_rating(new_rating),
+                })
+        
+        return {
+            'contest_id': contest.id,
+            'contest_slug': contest.slug,
+            'computed_at': timezone.now(),
+            'total_participants': len(predictions),
+            'predictions': predictions,
+        }
+    
+    @staticmethod
+    def get_rating_prediction(contest, include_frozen=False):
+        """
+        Dự đoán rating change từ bảng xếp hạng mà viewer đang thấy
+        Tính một lần cho mỗi phiên bản leaderboard (cache theo ETag), mọi request dùng chung
+        
+        Returns:
+            (payload, positions {user_id: index trong predictions}, etag)
+        """
+        from django.conf import settings
+        from django.core.cache import cache
+        from contests.models import ContestParticipant
+        from contests.freeze_service import ContestFreezeService
+        from contests.ranking_service import ContestRankingService
+        
+        # Freeze: user thường chỉ thấy snapshot chụp lúc freeze
+        snapshot = None if include_frozen else ContestFreezeService.get_public_snapshot(contest)
+        if snapshot is not None:
+            etag = f"{contest.id}-frozen-{snapshot.id}"
+        else:
+            etag = ContestRankingService.leaderboard_etag(contest)
+        
+        cache_key = f"contest_rating_prediction:{etag}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached[0], cached[1], etag
+        
+        if snapshot is not None:
+            # Cùng thứ tự với update_contest_ratings (last_submission_at NULL đứng trước)
+            standings = sorted(snapshot.payload['leaderboard'], key=lambda entry: (
+                -entry['solved_count'],
+                entry['penalty_seconds'],
+                entry['last_submission_at'] is not None,
+                entry['last_submission_at'] or ''
+            ))
+        else:
+            standings = ContestParticipant.objects.filter(
+                contest=contest,
+                is_active=True
+            ).order_by(
+                '-solved_count',
+                'penalty_seconds',
+                'last_submission_at'
+            ).values('user_id', 'solved_count')
+        
+        payload = RatingService.predict_contest_ratings(contest, list(standings))
+        payload['etag'] = etag
+        positions = {entry['user_id']: index for index, entry in enumerate(payload['predictions'])}
+        cache.set(cache_key, (payload, positions), settings.LEADERBOARD_CACHE_SECONDS)
+        return payload, positions, etag
+    
     @staticmethod
     @transaction.atomic
     def update_contest_ratings(contest_id):
         """
         Update rating cho tất cả participants sau khi contest kết thúc
+        Tính toán bằng NumPy, lưu bằng một bulk_update (users) và một bulk_create (rating changes)
         
         Args:
             contest_id: ID của contest
@@ -107,6 +411,73 @@ class RatingService:
         from contests.models import Contest, ContestParticipant
         from users.models import User, ContestRatingChange
         
+        try:
+            contest = Contest.objects.get(id=contest_id)
+        except Contest.DoesNotExist:
+            return 0
+        
+        # Chỉ tính rating cho contest rated (không phải practice)
+        if contest.slug == 'practice':
+            return 0
+        
+        # Lấy danh sách participants theo thứ hạng
+        participants = list(ContestParticipant.objects.filter(
+            contest=contest,
+            is_active=True
+        ).order_by(
+            '-solved_count',
+            'penalty_seconds',
+            'last_submission_at'
+        ).values('user_id', 'solved_count'))
+        existing_changes = list(ContestRatingChange.objects.filter(contest=contest).values(
+            'user_id', 'old_rating', 'rank'
+        ))
+        
+        users = User.objects.in_bulk(
+            {row['user_id'] for row in participants} | {change['user_id'] for change in existing_changes}
+        )
+        
+        # Contest đã được tính rating: rollback rating về trạng thái trước đó
+        for change in existing_changes:
+            user = users[change['user_id']]
+            user.current_rating = change['old_rating']
+            user.contests_participated = max(0, user.contests_participated - 1)
+            if change['rank'] == 1:
+                user.contests_won = max(0, user.contests_won - 1)
+            user.update_rank()
+        if existing_changes:
+            ContestRatingChange.objects.filter(contest=contest).delete()
+        
+        if len(participants) < 2:
+            # Cần ít nhất 2 người để tính rating
+            if existing_changes:
+                User.objects.bulk_update(list(users.values()), RatingService.USER_RATING_FIELDS, batch_size=1000)
+                RatingIndexService.refresh_on_commit()
+            return 0
+        
+        rating_change_records = RatingService.apply_contest_ratings(contest, participants, users, timezone.now())
+        
+        # Tổng số bài đã solve của mọi participant (một query)
+        solved_totals = RatingService.get_solved_totals([row['user_id'] for row in participants])
+        for row in participants:
+            users[row['user_id']].total_problems_solved = solved_totals.get(row['user_id'], 0)
+        
+        User.objects.bulk_update(list(users.values()), RatingService.USER_RATING_FIELDS, batch_size=1000)
+        ContestRatingChange.objects.bulk_create(rating_change_records, batch_size=1000)
+        RatingIndexService.refresh_on_commit()
+        
+        return len(rating_change_records)
+    
+    @staticmethod
+    @transaction.atomic
+    def _update_contest_ratings_legacy(contest_id):
+        """
+        Cách tính cũ: từng participant một (O(n^2) Python + query cho mỗi user)
+        Chỉ giữ lại để so sánh trong benchmark_ratings
+        """
+        from contests.models import Contest, ContestParticipant
+        from users.models import User, ContestRatingChange
+        
         try:
             contest = Contest.objects.get(id=contest_id)
         except Contest.DoesNotExist:
@@ -228,6 +599,75 @@ class RatingService:
         
         return updated_count
     
+    GLOBAL_ORDERING = ('-current_rating', '-max_rating', 'username')
+    
+    @staticmethod
+    def get_global_leaderboard_after(limit=100, after=None):
+        """
+        Bảng xếp hạng global phân trang theo keyset (không dùng OFFSET)
+        
+        Args:
+            limit: Số lượng user trả về
+            after: (current_rating, max_rating, username) của user cuối trang trước
+            
+        Returns:
+            QuerySet of User
+        """
+        from django.db.models import Q
+        from users.models import User
+        
+        users = User.objects.order_by(*RatingService.GLOBAL_ORDERING)
+        if after is not None:
+            rating, max_rating, username = after
+            users = users.filter(
+                Q(current_rating__lt=rating)
+                | Q(current_rating=rating, max_rating__lt=max_rating)
+                | Q(current_rating=rating, max_rating=max_rating, username__gt=username)
+            )
+        return users[:limit]
+    
+    @staticmethod
+    def get_global_leaderboard_page(limit=100, offset=0, index=None):
+        """
+        Bảng xếp hạng global theo vị trí, không quét OFFSET từ đầu bảng:
+        chỉ mục rating cho biết rating của user ở vị trí offset + 1, query bắt đầu
+        từ rating đó; trong nhóm cùng rating seek theo (max_rating, username) tới mốc
+        gần nhất của chỉ mục rồi chỉ bỏ qua dưới ANCHOR_EVERY user
+        index: RatingIndex đã đọc trong request (optional)
+        """
+        from django.db.models import Q
+        from users.models import User
+        
+        index = index or RatingIndexService.get()
+        rating = index.rating_at(offset + 1)
+        if rating is None:
+            return User.objects.none()
+        skip = offset - index.count_above(rating)
+        anchor, anchor_position = index.anchor(rating, skip)
+        users = User.objects.filter(current_rating__lte=rating)
+        if anchor is not None:
+            max_rating, username = anchor
+            users = users.filter(
+                Q(current_rating__lt=rating)
+                | Q(current_rating=rating, max_rating__lt=max_rating)
+                | Q(current_rating=rating, max_rating=max_rating, username__gte=username)
+            )
+            skip -= anchor_position
+        return users.order_by(*RatingService.GLOBAL_ORDERING)[skip:skip + limit]
+    
+    @staticmethod
+    def get_global_rank(user):
+        """Rank toàn cục, percentile của user (chỉ mục rating, O(log R))"""
+        index = RatingIndexService.get()
+        return {
+            'user_id': user.id,
+            'username': user.username,
+            'current_rating': user.current_rating,
+            'global_rank': index.rank(user.current_rating),
+            'percentile': index.percentile(user.current_rating),
+            'total_users': index.total,
+        }
+    
     @staticmethod
     def get_global_leaderboard(limit=100, offset=0):
         """
@@ -242,11 +682,7 @@ class RatingService:
         """
         from users.models import User
         
-        return User.objects.order_by(
-            '-current_rating',
-            '-max_rating',
-            'username'
-        )[offset:offset + limit]
+        return User.objects.order_by(*RatingService.GLOBAL_ORDERING)[offset:offset + limit]
     
     @staticmethod
     def get_user_rating_info(user_id):
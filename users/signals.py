@@ -0,0 +1,19 @@
+"""
+Signal của app users: user mới / bị xóa làm đổi histogram rating toàn cục
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User
+from .rating_index import RatingIndexService
+
+
+@receiver(post_save, sender=User)
+def bump_rating_index_on_create(sender, instance, created, **kwargs):
+    if created:
+        RatingIndexService.bump_on_commit()
+
+
+@receiver(post_delete, sender=User)
+def bump_rating_index_on_delete(sender, instance, **kwargs):
+    RatingIndexService.bump_on_commit()
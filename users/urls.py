@@ -27,6 +27,9 @@ from .views import (
     UserRatingDetailView,
     UserRatingHistoryView,
     UpdateContestRatingsView,
+    ContestRatingPredictionView,
+    GlobalRankView,
+    RatingDistributionView,
 )
 
 # Public Profile Views
@@ -95,12 +98,20 @@ urlpatterns = [
     path('rating/me/', UserRatingDetailView.as_view(), name='my-rating'),
     path('rating/<int:user_id>/', UserRatingDetailView.as_view(), name='user-rating'),
     
+    # Global rank / percentile, phân bố rating
+    path('rating/rank/me/', GlobalRankView.as_view(), name='my-global-rank'),
+    path('rating/rank/<int:user_id>/', GlobalRankView.as_view(), name='user-global-rank'),
+    path('rating/distribution/', RatingDistributionView.as_view(), name='rating-distribution'),
+    
     # User rating history
     path('rating/history/me/', UserRatingHistoryView.as_view(), name='my-rating-history'),
     path('rating/history/<int:user_id>/', UserRatingHistoryView.as_view(), name='user-rating-history'),
     
     # Admin: update contest ratings
     path('rating/contest/<int:contest_id>/update/', UpdateContestRatingsView.as_view(), name='update-contest-ratings'),
+    
+    # Dự đoán rating change từ bảng xếp hạng hiện tại
+    path('rating/contest/<int:contest_id>/predict/', ContestRatingPredictionView.as_view(), name='contest-rating-prediction'),
 
     # ============= USER REPORTS ENDPOINTS (ADMIN) =============
     # Statistics overview
@@ -708,27 +708,52 @@ class GlobalRankingView(APIView):
     """
     GET: Lấy bảng xếp hạng global
     Query params:
+    - cursor: next_cursor của trang trước (keyset pagination, ưu tiên hơn page)
     - page: số trang (default=1)
     - limit: số user mỗi trang (default=50, max=100)
+    rank lấy từ chỉ mục rating (các user cùng rating có cùng rank)
     """
     
     def get(self, request):
+        import base64
+        import json
+        from .rating_index import RatingIndexService
         from .rating_service import RatingService
         from .models import User
         
         # Get pagination params
-        page = int(request.query_params.get('page', 1))
-        limit = min(int(request.query_params.get('limit', 50)), 100)  # Max 100
-        offset = (page - 1) * limit
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            limit = max(1, min(int(request.query_params.get('limit', 50)), 100))  # Max 100
+            cursor = request.query_params.get('cursor')
+            after = None
+            if cursor:
+                rating, max_rating, username = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+                after = (int(rating), int(max_rating), str(username))
+        except (TypeError, ValueError):
+            return Response({"detail": "Invalid pagination parameters"}, status=status.HTTP_400_BAD_REQUEST)
         
         # Get leaderboard
-        users = RatingService.get_global_leaderboard(limit=limit, offset=offset)
+        index = RatingIndexService.get()
+        if after is not None:
+            users = list(RatingService.get_global_leaderboard_after(limit=limit, after=after))
+        else:
+            users = list(RatingService.get_global_leaderboard_page(
+                limit=limit, offset=(page - 1) * limit, index=index
+            ))
+        
+        next_cursor = None
+        if len(users) == limit:
+            last = users[-1]
+            next_cursor = base64.urlsafe_b64encode(
+                json.dumps([last.current_rating, last.max_rating, last.username]).encode()
+            ).decode()
         
         # Format data with ranking
         ranking_data = []
-        for idx, user in enumerate(users, start=offset + 1):
+        for user in users:
             ranking_data.append({
-                'rank': idx,
+                'rank': index.rank(user.current_rating),
                 'user_id': user.id,
                 'username': user.username,
                 'full_name': user.full_name or user.username,
@@ -744,20 +769,69 @@ class GlobalRankingView(APIView):
         
         serializer = GlobalRankingSerializer(ranking_data, many=True)
         
-        # Get total count for pagination
-        total_count = User.objects.count()
+        # Total count từ chỉ mục rating (không COUNT(*) mỗi request)
+        total_count = index.total
         
         return Response({
             'rankings': serializer.data,
             'pagination': {
-                'page': page,
+                'page': None if after is not None else page,
                 'limit': limit,
                 'total': total_count,
-                'total_pages': (total_count + limit - 1) // limit
+                'total_pages': (total_count + limit - 1) // limit,
+                'next_cursor': next_cursor
             }
         }, status=status.HTTP_200_OK)
 
 
+class GlobalRankView(APIView):
+    """
+    GET: Rank toàn cục và percentile của user (O(log R) trên chỉ mục rating)
+    """
+    authentication_classes = [CustomJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, user_id=None):
+        from .rating_service import RatingService
+        
+        # Nếu không có user_id, lấy user hiện tại
+        target_user_id = user_id if user_id else request.user.id
+        
+        user = RatingService.get_user_rating_info(target_user_id)
+        if not user:
+            return Response(
+                {"detail": "User not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response(RatingService.get_global_rank(user), status=status.HTTP_200_OK)
+
+
+class RatingDistributionView(APIView):
+    """
+    GET: Phân bố rating của toàn bộ user
+    Query params:
+    - bucket: độ rộng mỗi khoảng rating (default=100, min=10)
+    """
+    authentication_classes = [CustomJWTAuthentication]
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        from .rating_index import RatingIndexService
+        
+        try:
+            bucket = max(10, int(request.query_params.get('bucket', 100)))
+        except ValueError:
+            return Response({"detail": "Invalid bucket"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        index = RatingIndexService.get()
+        return Response({
+            'bucket': bucket,
+            'total_users': index.total,
+            'distribution': index.distribution(bucket)
+        }, status=status.HTTP_200_OK)
+
+
 class UserRatingDetailView(APIView):
     authentication_classes = [CustomJWTAuthentication]
     permission_classes = [IsAuthenticated]
@@ -807,6 +881,80 @@ class UserRatingHistoryView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class ContestRatingPredictionView(APIView):
+    """
+    GET: Dự đoán rating change của participants nếu contest kết thúc với bảng xếp hạng hiện tại
+    Contest đang diễn ra hoặc vừa kết thúc (chưa tính rating)
+    Query params:
+    - user_id: chỉ trả về dự đoán của một user
+    - me=true: chỉ trả về dự đoán của user hiện tại
+    Tính một lần cho mỗi phiên bản leaderboard; hỗ trợ ETag / If-None-Match (304)
+    """
+    authentication_classes = [CustomJWTAuthentication]
+    permission_classes = [AllowAny]
+    
+    def get(self, request, contest_id):
+        from django.utils.cache import quote_etag
+        from django.utils.http import parse_etags
+        from contests.models import Contest
+        from contests.freeze_service import ContestFreezeService
+        from .models import ContestRatingChange
+        from .rating_service import RatingService
+        
+        contest = Contest.objects.filter(id=contest_id).first()
+        if contest is None:
+            return Response({"detail": "Contest not found"}, status=status.HTTP_404_NOT_FOUND)
+        if contest.slug == 'practice':
+            return Response({"detail": "Practice contest is not rated"}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.now() < contest.start_at:
+            return Response({"detail": "Contest has not started yet"}, status=status.HTTP_400_BAD_REQUEST)
+        if ContestRatingChange.objects.filter(contest=contest).exists():
+            return Response(
+                {"detail": "Contest ratings have already been updated, see rating history"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        user_id = request.query_params.get('user_id')
+        if request.query_params.get('me') == 'true':
+            if not request.user.is_authenticated:
+                return Response({"detail": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+            user_id = request.user.id
+        try:
+            user_id = int(user_id) if user_id is not None else None
+        except ValueError:
+            return Response({"detail": "Invalid user_id"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        include_frozen = request.user.is_authenticated and request.user.has_role('admin')
+        if not include_frozen and ContestFreezeService.request_unfreeze(contest):
+            # Mở băng đang chạy nền: chưa có ranking cuối để dự đoán
+            return Response(
+                {"detail": "Final rankings are being calculated, retry shortly"},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Retry-After': str(ContestFreezeService.UNFREEZE_RETRY_SECONDS)}
+            )
+        
+        payload, positions, etag = RatingService.get_rating_prediction(contest, include_frozen)
+        etag = quote_etag(etag if user_id is None else f"{etag}-{user_id}")
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and etag in parse_etags(if_none_match):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        if user_id is None:
+            return Response(payload, status=status.HTTP_200_OK, headers=headers)
+        
+        position = positions.get(user_id)
+        if position is None:
+            return Response({"detail": "User is not a participant of this contest"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'contest_id': payload['contest_id'],
+            'computed_at': payload['computed_at'],
+            'total_participants': payload['total_participants'],
+            'prediction': payload['predictions'][position],
+        }, status=status.HTTP_200_OK, headers=headers)
+
+
 class UpdateContestRatingsView(APIView):
     """
     POST: Update rating cho tất cả participants của một contest